@@ -0,0 +1,17 @@
+#!/bin/bash
+# Runs the benchmark suite in tests/benchmark.
+#
+# The first run saves a baseline in .benchmarks. Later runs are compared to
+# the baseline and fail if the median time of a benchmark regresses by more than
+# the threshold. Run with --update to save a new baseline.
+
+threshold=${BENCHMARK_THRESHOLD:-20%}
+baseline=$(find .benchmarks -name "*_baseline.json" 2>/dev/null | sort | tail -1)
+
+if [ -z "$baseline" ] || [ "$1" == "--update" ]; then
+    python -m pytest tests/benchmark --benchmark-save=baseline
+else
+    run_id=$(basename "$baseline" | cut -d_ -f1)
+    python -m pytest tests/benchmark --benchmark-compare="$run_id" \
+        --benchmark-compare-fail="median:$threshold"
+fi
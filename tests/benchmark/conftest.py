@@ -0,0 +1,15 @@
+"""Fixtures for the benchmark suite.
+
+Run with scripts/benchmark.sh, which saves a baseline on the first run and
+fails later runs that regress with respect to it.
+"""
+
+import pytest
+from synthetic import write_ranking_tsv
+
+
+@pytest.fixture(scope="session")
+def ranking_tsv(tmp_path_factory) -> str:
+    path = str(tmp_path_factory.mktemp("rankings") / "ranking.tsv")
+    write_ranking_tsv(path)
+    return path
@@ -0,0 +1,119 @@
+"""Synthetic data for the benchmark suite."""
+
+import csv
+import random
+from typing import List
+
+from treccast.core.base import ScoredDocument
+
+# Number of queries and passages per query of synthetic rankings.
+NUM_QUERIES = 50
+NUM_PASSAGES = 1000
+
+_WORDS = [
+    "atomic",
+    "bomb",
+    "research",
+    "project",
+    "manhattan",
+    "science",
+    "energy",
+    "nuclear",
+    "physics",
+    "war",
+    "history",
+    "scientist",
+    "laboratory",
+    "uranium",
+    "government",
+    "secret",
+]
+
+
+def get_passage(rng: random.Random, length: int = 60) -> str:
+    """Returns a random passage of words.
+
+    Args:
+        rng: Random number generator.
+        length (optional): Number of words. Defaults to 60.
+
+    Returns:
+        Passage text.
+    """
+    return " ".join(rng.choice(_WORDS) for _ in range(length))
+
+
+def get_scored_docs(num_docs: int, seed: int = 0) -> List[ScoredDocument]:
+    """Returns scored documents with random scores and some repeated IDs.
+
+    Args:
+        num_docs: Number of documents.
+        seed (optional): Random seed. Defaults to 0.
+
+    Returns:
+        List of scored documents.
+    """
+    rng = random.Random(seed)
+    return [
+        ScoredDocument(
+            f"MARCO_{rng.randrange(num_docs * 2)}", "passage", rng.random()
+        )
+        for _ in range(num_docs)
+    ]
+
+
+def write_ranking_tsv(
+    path: str,
+    num_queries: int = NUM_QUERIES,
+    num_passages: int = NUM_PASSAGES,
+    seed: int = 0,
+) -> None:
+    """Writes a first-pass retrieval TSV file with random passages.
+
+    Args:
+        path: Path to the TSV file.
+        num_queries (optional): Number of queries. Defaults to 50.
+        num_passages (optional): Number of passages per query. Defaults to
+          1000.
+        seed (optional): Random seed. Defaults to 0.
+    """
+    rng = random.Random(seed)
+    passages = [get_passage(rng) for _ in range(500)]
+    with open(path, "w") as f_out:
+        writer = csv.writer(f_out, delimiter="\t")
+        writer.writerow(["query_id", "query", "passage_id", "passage"])
+        for query in range(num_queries):
+            for _ in range(num_passages):
+                passage_id = rng.randrange(num_passages * 2)
+                writer.writerow(
+                    [
+                        f"{query}_1",
+                        f"query {query}",
+                        f"MARCO_{passage_id}",
+                        passages[passage_id % len(passages)],
+                    ]
+                )
+
+
+def write_trecweb(path: str, num_docs: int = 1000, seed: int = 0) -> None:
+    """Writes a trecweb file with random documents of three passages.
+
+    Args:
+        path: Path to the trecweb file.
+        num_docs (optional): Number of documents. Defaults to 1000.
+        seed (optional): Random seed. Defaults to 0.
+    """
+    rng = random.Random(seed)
+    with open(path, "w") as f_out:
+        for doc in range(num_docs):
+            f_out.write(
+                f"<DOC>\n<DOCNO>MARCO_D{doc}</DOCNO>\n<DOCHDR>\n</DOCHDR>\n"
+                f"<HTML>\n<TITLE>{get_passage(rng, 8)}</TITLE>\n"
+                f"<URL>https://example.com/{doc}</URL>\n<BODY>\n"
+            )
+            for passage in range(3):
+                f_out.write(
+                    f"<passage id={passage}>\n{get_passage(rng, 120)} "
+                    "x < y & 3 > 2\n</passage>\n"
+                )
+            f_out.write("</BODY>\n</HTML>\n</DOC>\n")
@@ -0,0 +1,126 @@
+"""Benchmarks Elasticsearch-bound operations against an in-process stand-in.
+
+The stand-in delays each request by a fixed latency and each returned
+document by a small transfer cost, so that these benchmarks capture the
+number of round trips and the size of responses.
+"""
+
+import itertools
+import random
+from typing import Dict, Iterator
+
+import pytest
+from synthetic import get_passage
+from treccast.core.base import Query
+from treccast.core.collection import ElasticSearchIndex
+from treccast.core.util.analyzer import Analyzer
+from treccast.core.util.fake_elasticsearch import FakeElasticsearchServer
+from treccast.core.util.passage_loader import PassageLoader
+from treccast.expander.prf import RM3
+from treccast.indexer.indexer import Indexer
+from treccast.retriever.bm25_retriever import BM25Retriever
+
+STOPWORDS = ["a", "an", "and", "are", "in", "is", "of", "on", "the", "to"]
+INDEX_NAME = "benchmark"
+NUM_DOCS = 2000
+
+# Latency per request and per returned document (in seconds).
+LATENCY = 0.002
+LATENCY_PER_DOC = 0.00001
+
+QUESTIONS = [
+    "atomic research project",
+    "manhattan project history",
+    "nuclear energy science",
+    "secret government laboratory",
+]
+QUERIES = [Query(f"81_{i}", question) for i, question in enumerate(QUESTIONS)]
+
+_index_names = (f"{INDEX_NAME}_{i}" for i in itertools.count())
+
+
+def _get_documents(num_docs: int = NUM_DOCS) -> Iterator[Dict[str, str]]:
+    rng = random.Random(0)
+    for i in range(num_docs):
+        yield {"_id": f"MARCO_{i}", "body": get_passage(rng)}
+
+
+@pytest.fixture(scope="module")
+def server() -> FakeElasticsearchServer:
+    server = FakeElasticsearchServer(
+        latency=LATENCY,
+        latency_per_doc=LATENCY_PER_DOC,
+        analyzer=Analyzer(STOPWORDS),
+    )
+    with server.patch():
+        indexer = Indexer(INDEX_NAME)
+        indexer.create_index(use_analyzer=False)
+        indexer.batch_index(indexer.process_documents(_get_documents()))
+        yield server
+
+
+def test_batch_index(benchmark, server: FakeElasticsearchServer):
+    def setup():
+        # A new index per round, as documents would be overwritten.
+        indexer = Indexer(next(_index_names))
+        indexer.create_index(use_analyzer=False)
+        return (indexer, indexer.process_documents(_get_documents())), {}
+
+    # Number of bulk requests sent by each round.
+    bulk_requests = []
+
+    def batch_index(indexer: Indexer, documents: Iterator[dict]) -> None:
+        num_requests = server.request_counts["bulk"]
+        indexer.batch_index(documents)
+        bulk_requests.append(server.request_counts["bulk"] - num_requests)
+
+    with server.patch():
+        benchmark.pedantic(batch_index, setup=setup, rounds=3)
+    # All documents fit into a single chunk of parallel_bulk.
+    assert bulk_requests and set(bulk_requests) == {1}
+
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_retrieve(benchmark, server: FakeElasticsearchServer, batch: bool):
+    with server.patch():
+        retriever = BM25Retriever(ElasticSearchIndex(INDEX_NAME))
+    if batch:
+        rankings = benchmark(retriever.batch_retrieve, QUERIES)
+    else:
+        rankings = benchmark(
+            lambda: [retriever.retrieve(query) for query in QUERIES]
+        )
+    assert len(rankings) == len(QUERIES)
+
+
+@pytest.mark.parametrize("num_docs", [100, 1000])
+def test_mget(benchmark, server: FakeElasticsearchServer, num_docs: int):
+    doc_ids = [f"MARCO_{i}" for i in range(num_docs)]
+
+    def setup():
+        # A new loader per round, as passages are cached.
+        with server.patch():
+            return (PassageLoader(index=INDEX_NAME),), {}
+
+    passages = benchmark.pedantic(
+        lambda passage_loader: passage_loader.mget(doc_ids),
+        setup=setup,
+        rounds=5,
+    )
+    assert None not in passages
+
+
+@pytest.mark.parametrize("prf_num_documents", [10, 100])
+def test_rm3(
+    benchmark, server: FakeElasticsearchServer, prf_num_documents: int
+):
+    def setup():
+        # A new RM3 instance per round, as term vectors are cached.
+        with server.patch():
+            retriever = BM25Retriever(ElasticSearchIndex(INDEX_NAME))
+        return (RM3(retriever, prf_num_documents=prf_num_documents),), {}
+
+    expanded_queries = benchmark.pedantic(
+        lambda rm3: rm3.get_expanded_queries(QUERIES), setup=setup, rounds=5
+    )
+    assert len(expanded_queries) == len(QUERIES)
@@ -0,0 +1,47 @@
+"""Benchmarks combining first-pass rankings of several models."""
+
+import pytest
+from synthetic import NUM_PASSAGES, write_ranking_tsv
+from treccast.core.ensemble import Ensemble
+
+# Number of turns of the TREC CAsT 2021 topics.
+FULL_YEAR_NUM_QUERIES = 239
+
+
+@pytest.fixture(scope="module")
+def ranking_tsvs(tmp_path_factory) -> list:
+    paths = []
+    for seed in range(3):
+        path = str(tmp_path_factory.mktemp("ensemble") / f"model_{seed}.tsv")
+        write_ranking_tsv(path, num_queries=10, num_passages=100, seed=seed)
+        paths.append(path)
+    return paths
+
+
+@pytest.fixture(scope="module")
+def full_year_ranking_tsvs(tmp_path_factory) -> list:
+    paths = []
+    for seed in range(3):
+        path = str(tmp_path_factory.mktemp("ensemble") / f"model_{seed}.tsv")
+        write_ranking_tsv(path, num_queries=FULL_YEAR_NUM_QUERIES, seed=seed)
+        paths.append(path)
+    return paths
+
+
+def test_combine_rankings(benchmark, ranking_tsvs: list):
+    ensemble = Ensemble(ranking_tsvs, rank_thresholds=[100, 50, 50])
+    combined = benchmark.pedantic(ensemble.combine_rankings, rounds=3)
+    assert len({row[0] for row in combined}) == 10
+
+
+def test_write_to_tsv_full_year(
+    benchmark, full_year_ranking_tsvs: list, tmp_path
+):
+    path = str(tmp_path / "ensemble.tsv")
+    ensemble = Ensemble(
+        full_year_ranking_tsvs,
+        rank_thresholds=[NUM_PASSAGES, NUM_PASSAGES // 2, NUM_PASSAGES // 2],
+    )
+    benchmark.pedantic(ensemble.write_to_tsv, args=(path,), rounds=3)
+    with open(path, "r") as f_in:
+        assert sum(1 for _ in f_in) > FULL_YEAR_NUM_QUERIES * NUM_PASSAGES // 2
@@ -0,0 +1,13 @@
+"""Benchmarks parsing of trecweb files."""
+
+from synthetic import write_trecweb
+from treccast.core.util.file_parser import FileParser
+
+
+def test_parse_trecweb(benchmark, tmp_path):
+    path = str(tmp_path / "collection.trecweb")
+    write_trecweb(path)
+    passages = benchmark.pedantic(
+        lambda: list(FileParser.parse(path)), rounds=5
+    )
+    assert len(passages) == 3000
@@ -0,0 +1,41 @@
+"""Benchmarks the import time of the command line application."""
+
+import os
+import subprocess
+import sys
+from typing import Dict
+
+# Upper bound on the cumulative import time of treccast.main (in seconds).
+_MAX_IMPORT_TIME = 1.0
+
+
+def _get_import_times(module: str) -> Dict[str, float]:
+    """Imports a module in a new interpreter with `-X importtime`.
+
+    Args:
+        module: Module name.
+
+    Returns:
+        Cumulative import time in seconds of each imported module.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONPATH": os.getcwd()},
+    )
+    import_times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        import_times[name.strip()] = int(cumulative) / 1e6
+    return import_times
+
+
+def test_main_import_time(benchmark):
+    import_times = benchmark.pedantic(
+        _get_import_times, args=("treccast.main",), rounds=5
+    )
+    assert import_times["treccast.main"] < _MAX_IMPORT_TIME
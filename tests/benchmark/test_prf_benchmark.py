@@ -0,0 +1,45 @@
+"""Benchmarks RM3 relevance model computation on a local index."""
+
+import pytest
+from treccast.core.base import Query
+from treccast.core.collection import InvertedIndex
+from treccast.core.util.analyzer import Analyzer
+from treccast.core.util.data_generator import DataGeneratorMixin
+from treccast.expander.prf import RM3
+from treccast.retriever.bm25_retriever import BM25Retriever
+
+MS_MARCO_PASSAGE_DATASET = "tests/data/ms_marco_passage_sample.tsv"
+STOPWORDS = ["a", "an", "and", "are", "in", "is", "of", "on", "the", "to"]
+
+QUESTIONS = [
+    "atomic research project",
+    "what is the manhattan project",
+    "success of the scientists",
+    "communication amid scientific minds",
+]
+
+
+@pytest.fixture(scope="module")
+def retriever(tmp_path_factory) -> BM25Retriever:
+    index = InvertedIndex.build(
+        str(tmp_path_factory.mktemp("index") / "index.npz"),
+        DataGeneratorMixin().generate_data_marco(
+            "indexing", MS_MARCO_PASSAGE_DATASET
+        ),
+        analyzer=Analyzer(STOPWORDS),
+    )
+    return BM25Retriever(index)
+
+
+@pytest.mark.parametrize("prf_num_documents", [10, 100])
+def test_get_expanded_queries(
+    benchmark, retriever: BM25Retriever, prf_num_documents: int
+):
+    queries = [
+        Query(f"81_{i}", question) for i, question in enumerate(QUESTIONS)
+    ]
+    rm3 = RM3(retriever, prf_num_documents=prf_num_documents, prf_num_terms=10)
+    # Term vectors are cached after the first round, so the benchmark
+    # measures feedback retrieval and relevance model computation.
+    expanded_queries = benchmark(rm3.get_expanded_queries, queries)
+    assert len(expanded_queries) == len(queries)
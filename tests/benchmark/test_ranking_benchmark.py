@@ -0,0 +1,34 @@
+"""Benchmarks operations on rankings."""
+
+import pytest
+from synthetic import get_scored_docs
+from treccast.core.ranking import Ranking
+
+
+@pytest.mark.parametrize("num_docs", [1000, 5000, 20000])
+@pytest.mark.parametrize("unique", [False, True])
+def test_fetch_topk_docs(benchmark, num_docs: int, unique: bool):
+    ranking = Ranking("81_1", get_scored_docs(num_docs))
+    docs = benchmark(ranking.fetch_topk_docs, 1000, unique=unique)
+    assert len(docs) <= 1000
+
+
+@pytest.mark.parametrize("num_docs", [1000, 5000, 20000])
+def test_update(benchmark, num_docs: int):
+    docs = get_scored_docs(num_docs)
+    new_docs = get_scored_docs(num_docs, seed=1)
+
+    def update():
+        ranking = Ranking("81_1", list(docs))
+        ranking.update(new_docs)
+        return ranking
+
+    ranking = benchmark(update)
+    assert len(ranking) > num_docs
+
+
+def test_load_rankings_from_tsv_file(benchmark, ranking_tsv: str):
+    queries, rankings = benchmark.pedantic(
+        Ranking.load_rankings_from_tsv_file, args=(ranking_tsv,), rounds=3
+    )
+    assert len(queries) == len(rankings) == 50
@@ -0,0 +1,111 @@
+"""Tests local emulation of the Elasticsearch analyzer."""
+
+import re
+from unittest import mock
+
+import pytest
+from treccast.core.util.analyzer import (
+    Analyzer,
+    get_index_terms,
+    stem,
+    tokenize,
+    verify_analyzer,
+)
+
+with pytest.helpers.mock_expensive_imports():
+    from treccast.core.collection import ElasticSearchIndex
+
+STOPWORDS = ["a", "an", "and", "is", "of", "the", "to"]
+INDEX_STEMS = {"running": "run", "cities": "city", "churches": "church"}
+
+
+def _es_analyze(body, index):
+    """Mimics the analyze API with a stemmer that differs from ours."""
+    tokens = []
+    for match in re.finditer(r"\w+(?:'\w+)*", body["text"]):
+        token = match.group().lower()
+        if token not in STOPWORDS:
+            tokens.append(
+                {
+                    "token": INDEX_STEMS.get(token, token),
+                    "start_offset": match.start(),
+                }
+            )
+    return {"tokens": tokens}
+
+
+@pytest.fixture
+def collection() -> ElasticSearchIndex:
+    collection = ElasticSearchIndex("test_index")
+    collection._es = mock.MagicMock()
+    collection.es.indices.analyze.side_effect = _es_analyze
+    return collection
+
+
+@pytest.mark.parametrize(
+    "text,tokens",
+    [
+        ("The U.S. economy", ["The", "U.S", "economy"]),
+        ("Don't pay $1,000.50 now", ["Don't", "pay", "1,000.50", "now"]),
+        ("foo:bar, baz. 3.x", ["foo:bar", "baz", "3", "x"]),
+        ("snake_case and ___", ["snake_case", "and"]),
+        ("東京 tower", ["東", "京", "tower"]),
+        ("a" * 300, ["a" * 255, "a" * 45]),
+    ],
+)
+def test_tokenize(text, tokens):
+    assert tokenize(text) == tokens
+
+
+@pytest.mark.parametrize(
+    "token,term",
+    [
+        ("cities", "city"),
+        ("boxes", "box"),
+        ("analysis", "analysis"),
+        ("u.s", "u.s"),
+        ("covid19s", "covid19s"),
+        ("cafés", "cafés"),
+    ],
+)
+def test_stem(token, term):
+    assert stem(token) == term
+
+
+def test_analyzer_terms():
+    analyzer = Analyzer(STOPWORDS, terms={"running": "run", "is": "is"})
+    assert analyzer.analyze("Running is the answer") == [
+        "run",
+        "is",
+        "answer",
+    ]
+
+
+def test_collection_uses_local_analyzer(collection: ElasticSearchIndex):
+    collection._analyzer = Analyzer(STOPWORDS)
+    assert collection.analyze("The Cities") == ["city"]
+    collection.es.indices.analyze.assert_not_called()
+    assert collection.request_count == 0
+
+
+def test_get_index_terms(collection: ElasticSearchIndex):
+    assert get_index_terms(collection, ["running", "the", "cities"]) == {
+        "running": "run",
+        "the": "",
+        "cities": "city",
+    }
+    collection.es.indices.analyze.assert_called_once()
+
+
+def test_verify_analyzer(collection: ElasticSearchIndex):
+    texts = ["Running to the churches", "Cities of the world"]
+    mismatches, terms = verify_analyzer(collection, texts, Analyzer(STOPWORDS))
+    assert mismatches == [
+        ("Running to the churches", ["run", "church"], ["running", "church"])
+    ]
+    assert terms == {"running": "run"}
+
+    mismatches, _ = verify_analyzer(
+        collection, texts, Analyzer(STOPWORDS, terms=terms)
+    )
+    assert mismatches == []
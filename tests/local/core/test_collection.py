@@ -0,0 +1,204 @@
+"""Tests BM25 parameter handling of ElasticSearchIndex."""
+
+from unittest import mock
+
+import pytest
+
+with pytest.helpers.mock_expensive_imports():
+    from treccast.core.collection import (
+        ElasticSearchIndex,
+        get_bm25_similarity_name,
+    )
+    from treccast.retriever.bm25_retriever import BM25Retriever
+
+INDEX_NAME = "test_index"
+
+
+@pytest.fixture
+def collection() -> ElasticSearchIndex:
+    collection = ElasticSearchIndex(INDEX_NAME)
+    collection._es = mock.MagicMock()
+    collection.es.indices.get_settings.return_value = {
+        INDEX_NAME: {
+            "settings": {
+                "index": {
+                    "similarity": {
+                        "default": {"type": "BM25", "b": "0.75", "k1": "1.2"}
+                    }
+                }
+            }
+        }
+    }
+    collection.es.indices.get_mapping.return_value = {
+        INDEX_NAME: {
+            "mappings": {
+                "properties": {
+                    "body": {
+                        "type": "text",
+                        "fields": {"bm25_b0_4_k10_9": {"type": "text"}},
+                    }
+                }
+            }
+        }
+    }
+    return collection
+
+
+def test_get_bm25_similarity_name():
+    assert get_bm25_similarity_name(0.75, 1.2) == "bm25_b0_75_k11_2"
+    assert get_bm25_similarity_name(0.4, 2) == "bm25_b0_4_k12"
+
+
+def test_get_bm25_field(collection: ElasticSearchIndex):
+    assert collection.get_bm25_field("body") == "body"
+    assert collection.get_bm25_field("body", b=0.4, k1=0.9) == (
+        "body.bm25_b0_4_k10_9"
+    )
+    assert collection.get_bm25_field("body", b=0.5, k1=0.9) is None
+
+
+def test_create_index_bm25_fields(collection: ElasticSearchIndex):
+    collection.es.indices.exists.return_value = False
+    collection.create_index(use_analyzer=False, bm25_parameters=[(0.4, 0.9)])
+    _, body = collection.es.indices.create.call_args[0]
+    assert body["settings"]["index"]["similarity"]["bm25_b0_4_k10_9"] == {
+        "type": "BM25",
+        "b": 0.4,
+        "k1": 0.9,
+    }
+    for field in ["body", "catch_all"]:
+        assert body["mappings"]["properties"][field]["fields"] == {
+            "bm25_b0_4_k10_9": {
+                "type": "text",
+                "similarity": "bm25_b0_4_k10_9",
+            }
+        }
+
+
+def test_create_index_bm25_fields_of_given_fields(
+    collection: ElasticSearchIndex,
+):
+    collection.es.indices.exists.return_value = False
+    collection.create_index(
+        use_analyzer=False, bm25_parameters=[(0.4, 0.9)], bm25_fields=["title"]
+    )
+    _, body = collection.es.indices.create.call_args[0]
+    assert body["mappings"]["properties"].keys() == {"title"}
+
+
+def test_retriever_does_not_close_index(collection: ElasticSearchIndex):
+    default_retriever = BM25Retriever(collection)
+    retriever = BM25Retriever(collection, b=0.4, k1=0.9)
+    collection.es.indices.close.assert_not_called()
+    assert default_retriever.match_query("query") == {
+        "match": {"body": {"query": "query", "boost": 1.0}}
+    }
+    assert retriever.match_query("query") == {
+        "match": {"body.bm25_b0_4_k10_9": {"query": "query", "boost": 1.0}}
+    }
+
+
+def test_catch_all_retriever_does_not_close_index(
+    collection: ElasticSearchIndex,
+):
+    collection.es.indices.exists.return_value = False
+    collection.create_index(use_analyzer=False, bm25_parameters=[(0.4, 0.9)])
+    _, body = collection.es.indices.create.call_args[0]
+    collection.es.indices.get_mapping.return_value = {
+        INDEX_NAME: {"mappings": body["mappings"]}
+    }
+    retriever = BM25Retriever(collection, field="catch_all", b=0.4, k1=0.9)
+    collection.es.indices.close.assert_not_called()
+    collection.es.indices.put_settings.assert_not_called()
+    assert retriever.match_query("query") == {
+        "match": {"catch_all.bm25_b0_4_k10_9": {"query": "query", "boost": 1.0}}
+    }
+
+
+def test_retriever_updates_missing_parameters(collection: ElasticSearchIndex):
+    retriever = BM25Retriever(collection, b=0.5, k1=0.9)
+    collection.es.indices.close.assert_called_once_with(INDEX_NAME)
+    collection.es.indices.open.assert_called_once_with(INDEX_NAME)
+    assert retriever.match_query("query")["match"].keys() == {"body"}
+
+
+def test_get_term_vectors(collection: ElasticSearchIndex):
+    collection.es.mtermvectors.return_value = {
+        "docs": [
+            {
+                "_id": "d1",
+                "term_vectors": {
+                    "body": {"terms": {"atomic": {"term_freq": 2}}}
+                },
+            },
+            {"_id": "d2", "found": False},
+        ]
+    }
+    assert collection.get_term_vectors(["d1", "d2"]) == [{"atomic": 2}, {}]
+    collection.es.mtermvectors.assert_called_once()
+    assert collection.es.mtermvectors.call_args[1]["body"] == {
+        "ids": ["d1", "d2"]
+    }
+
+
+def test_analyze_and_get_term_vectors(collection: ElasticSearchIndex):
+    collection.es.mtermvectors.return_value = {
+        "docs": [
+            {
+                "_id": "d1",
+                "term_vectors": {
+                    "body": {"terms": {"atomic": {"term_freq": 2}}}
+                },
+            },
+            {
+                "term_vectors": {
+                    "body": {
+                        "terms": {
+                            "atomic": {
+                                "term_freq": 2,
+                                "tokens": [{"position": 0}, {"position": 3}],
+                            },
+                            "research": {
+                                "term_freq": 1,
+                                "tokens": [{"position": 1}],
+                            },
+                        }
+                    }
+                }
+            },
+        ]
+    }
+    analyzed_texts, term_vectors = collection.analyze_and_get_term_vectors(
+        ["atomic research of atomic"], ["d1"]
+    )
+    assert analyzed_texts == [["atomic", "research", "atomic"]]
+    assert term_vectors == [{"atomic": 2}]
+    assert collection.request_count == 1
+    docs = collection.es.mtermvectors.call_args[1]["body"]["docs"]
+    assert docs == [
+        {"_id": "d1"},
+        {"doc": {"body": "atomic research of atomic"}, "positions": True},
+    ]
+
+
+def test_batch_search(collection: ElasticSearchIndex):
+    collection.es.msearch.return_value = {
+        "responses": [
+            {"hits": {"hits": [{"_id": "d1", "_score": 2.0}]}},
+            {"hits": {"hits": []}},
+        ]
+    }
+    queries = [{"match": {"body": "atomic"}}, {"match": {"body": "unknown"}}]
+    results = collection.batch_search(queries, num_results=10, source=False)
+    assert [[doc.doc_id for doc in docs] for docs in results] == [["d1"], []]
+    assert collection.request_count == 1
+    assert collection.es.msearch.call_args[1]["body"] == [
+        {},
+        {"query": queries[0], "size": 10, "_source": False},
+        {},
+        {"query": queries[1], "size": 10, "_source": False},
+    ]
+
+    collection.es.msearch.return_value = {"responses": [{"error": "failed"}]}
+    with pytest.raises(RuntimeError):
+        collection.batch_search(queries[:1])
@@ -1,7 +1,16 @@
 """Tests Ensemble class from Ensemble"""
 
+import csv
+
+import pytest
 from treccast.core.ensemble import Ensemble
 
+FILEPATHS = [
+    "tests/data/ranking_sample_1.tsv",
+    "tests/data/ranking_sample_2.tsv",
+    "tests/data/ranking_sample_3.tsv",
+]
+
 
 def test_ensemble_ranking_no_thresholds():
     filepaths = [
@@ -19,11 +28,11 @@ def test_ensemble_ranking_no_thresholds():
         ["001", "test query 1", "003", "test passage 3"],
         ["001", "test query 1", "004", "test passage 4"],
         ["001", "test query 1", "005", "test passage 5"],
-        ["002", "test query 2", "001", "test passage 1"],
         ["002", "test query 2", "002", "test passage 2"],
-        ["002", "test query 2", "003", "test passage 3"],
         ["002", "test query 2", "004", "test passage 4"],
         ["002", "test query 2", "005", "test passage 5"],
+        ["002", "test query 2", "003", "test passage 3"],
+        ["002", "test query 2", "001", "test passage 1"],
     ]
     assert rankings == expected
 
@@ -41,13 +50,38 @@ def test_ensemble_ranking_thresholds():
 
     expected = [
         ["001", "test query 1", "001", "test passage 1"],
-        ["001", "test query 1", "002", "test passage 2"],
-        ["001", "test query 1", "003", "test passage 3"],
         ["001", "test query 1", "004", "test passage 4"],
+        ["001", "test query 1", "003", "test passage 3"],
         ["001", "test query 1", "005", "test passage 5"],
+        ["001", "test query 1", "002", "test passage 2"],
         ["002", "test query 2", "002", "test passage 2"],
         ["002", "test query 2", "003", "test passage 3"],
         ["002", "test query 2", "004", "test passage 4"],
         ["002", "test query 2", "005", "test passage 5"],
     ]
     assert rankings == expected
+
+
+def test_write_to_tsv(tmp_path):
+    path = str(tmp_path / "ensemble.tsv")
+    Ensemble(filepaths=FILEPATHS, rank_thresholds=[1, 2, 3]).write_to_tsv(path)
+    with open(path, "r") as f_in:
+        rows = list(csv.reader(f_in, delimiter="\t"))
+    assert rows[0] == ["query_id", "query", "passage_id", "passage"]
+    assert (
+        rows[1:]
+        == Ensemble(
+            filepaths=FILEPATHS, rank_thresholds=[1, 2, 3]
+        ).combine_rankings()
+    )
+
+
+def test_ensemble_unaligned_rankings(tmp_path):
+    path = tmp_path / "ranking.tsv"
+    path.write_text(
+        "query_id\tquery\tpassage_id\tpassage\n"
+        "002\ttest query 2\t002\ttest passage 2\n"
+    )
+    ensemble = Ensemble(filepaths=[FILEPATHS[0], str(path)])
+    with pytest.raises(ValueError):
+        ensemble.combine_rankings()
@@ -0,0 +1,80 @@
+"""Tests in-process evaluation against hand-computed values."""
+
+import math
+
+import pytest
+from treccast.core.base import ScoredDocument
+from treccast.core.qrel import Qrel
+from treccast.core.ranking import Ranking
+from treccast.core.util.evaluation import Evaluator, parse_metric
+
+
+@pytest.fixture
+def evaluator():
+    qrel_1 = Qrel("q1")
+    for doc_id, rel in [("d1", 3), ("d2", 1), ("d3", 2), ("d4", 0)]:
+        qrel_1.add_doc(doc_id, rel)
+    qrel_2 = Qrel("q2")
+    qrel_2.add_doc("d1", 2)
+    return Evaluator({"q1": qrel_1, "q2": qrel_2})
+
+
+@pytest.fixture
+def rankings():
+    ranking_1 = Ranking("q1")
+    ranking_1.add_docs(
+        [
+            ScoredDocument("d2", score=3),
+            ScoredDocument("d1", score=2),
+            ScoredDocument("d5", score=1),
+            ScoredDocument("d3", score=0.5),
+        ]
+    )
+    ranking_2 = Ranking("q2")
+    ranking_2.add_docs(
+        [ScoredDocument("d1", score=1), ScoredDocument("d2", score=1)]
+    )
+    ranking_3 = Ranking("q3")
+    ranking_3.add_doc(ScoredDocument("d1", score=1))
+    return {"q1": ranking_1, "q2": ranking_2, "q3": ranking_3}
+
+
+def test_parse_metric():
+    assert parse_metric("ndcg_cut.3") == ("ndcg_cut", 3)
+    assert parse_metric("recip_rank") == ("recip_rank", None)
+    with pytest.raises(ValueError):
+        parse_metric("P.10")
+
+
+def test_evaluate(evaluator, rankings):
+    results = evaluator.evaluate(
+        rankings,
+        ["recall.2", "recall.1000", "map_cut.2", "map_cut.1000", "recip_rank"],
+    )
+    assert results["recall.2"]["q1"] == pytest.approx(0.5)
+    assert results["recall.1000"]["q1"] == pytest.approx(1.0)
+    assert results["map_cut.2"]["q1"] == pytest.approx(0.25)
+    assert results["map_cut.1000"]["q1"] == pytest.approx(0.5)
+    assert results["recip_rank"]["q1"] == pytest.approx(0.5)
+    # Queries without judgments are not evaluated.
+    assert all(
+        set(per_query.keys()) == {"q1", "q2"} for per_query in results.values()
+    )
+
+
+def test_evaluate_ndcg_graded(evaluator, rankings):
+    results = evaluator.evaluate(rankings, ["ndcg_cut.3"])
+    dcg = 1 + 3 / math.log2(3)
+    idcg = 3 + 2 / math.log2(3) + 1 / 2
+    assert results["ndcg_cut.3"]["q1"] == pytest.approx(dcg / idcg)
+
+
+def test_evaluate_ties(evaluator, rankings):
+    # Equal scores are ranked by decreasing document ID, i.e., d2 before d1.
+    results = evaluator.evaluate(rankings, ["recip_rank"])
+    assert results["recip_rank"]["q2"] == pytest.approx(0.5)
+
+
+def test_mean(evaluator, rankings):
+    results = evaluator.evaluate(rankings, ["recip_rank"])
+    assert Evaluator.mean(results) == {"recip_rank": pytest.approx(0.5)}
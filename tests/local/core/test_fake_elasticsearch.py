@@ -0,0 +1,121 @@
+"""Tests the in-process Elasticsearch stand-in."""
+
+import time
+
+import pytest
+from treccast.core.base import Query
+from treccast.core.collection import ElasticSearchIndex, InvertedIndex
+from treccast.core.util.analyzer import Analyzer
+from treccast.core.util.data_generator import DataGeneratorMixin
+from treccast.core.util.fake_elasticsearch import FakeElasticsearchServer
+from treccast.core.util.passage_loader import PassageLoader
+from treccast.expander.prf import RM3
+from treccast.indexer.indexer import Indexer
+from treccast.retriever.bm25_retriever import BM25Retriever
+
+MS_MARCO_PASSAGE_DATASET = "tests/data/ms_marco_passage_sample.tsv"
+STOPWORDS = ["a", "an", "and", "are", "in", "is", "of", "on", "the", "to"]
+INDEX_NAME = "test_index"
+QUERY = Query("q1", "atomic research project")
+
+
+def _get_documents():
+    return DataGeneratorMixin().generate_data_marco(
+        "indexing", MS_MARCO_PASSAGE_DATASET
+    )
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory) -> InvertedIndex:
+    return InvertedIndex.build(
+        str(tmp_path_factory.mktemp("index") / "index.npz"),
+        _get_documents(),
+        analyzer=Analyzer(STOPWORDS),
+    )
+
+
+@pytest.fixture
+def server() -> FakeElasticsearchServer:
+    server = FakeElasticsearchServer(analyzer=Analyzer(STOPWORDS))
+    with server.patch():
+        indexer = Indexer(INDEX_NAME)
+        indexer.create_index(use_analyzer=False, bm25_parameters=[(0.4, 0.9)])
+        indexer.batch_index(indexer.process_documents(_get_documents()))
+        yield server
+
+
+@pytest.mark.parametrize("b,k1", [(0.75, 1.2), (0.4, 0.9)])
+def test_search(
+    server: FakeElasticsearchServer, index: InvertedIndex, b: float, k1: float
+):
+    retriever = BM25Retriever(ElasticSearchIndex(INDEX_NAME), b=b, k1=k1)
+    ranking = retriever.retrieve(QUERY, num_results=10)
+    expected = BM25Retriever(index, b=b, k1=k1).retrieve(QUERY, num_results=10)
+    assert [
+        (doc.doc_id, doc.content, pytest.approx(doc.score))
+        for doc in ranking.fetch_topk_docs(10)
+    ] == [
+        (doc.doc_id, doc.content, doc.score)
+        for doc in expected.fetch_topk_docs(10)
+    ]
+    batch_rankings = retriever.batch_retrieve([QUERY, QUERY], num_results=10)
+    assert [doc.doc_id for doc in batch_rankings[1].fetch_topk_docs(10)] == [
+        doc.doc_id for doc in ranking.fetch_topk_docs(10)
+    ]
+    assert server.request_counts["msearch"] == 1
+
+
+def test_passage_loader(server: FakeElasticsearchServer, index: InvertedIndex):
+    passage_loader = PassageLoader(index=INDEX_NAME)
+    assert passage_loader.mget(["MARCO_1", "MARCO_x", "MARCO_7"]) == [
+        index.get_content("MARCO_1"),
+        None,
+        index.get_content("MARCO_7"),
+    ]
+    assert passage_loader.get("MARCO_y") is None
+    assert passage_loader.get("MARCO_1") == index.get_content("MARCO_1")
+    assert server.request_counts["mget"] == 1
+    assert server.request_counts["get"] == 1
+
+
+def test_term_vectors(server: FakeElasticsearchServer, index: InvertedIndex):
+    collection = ElasticSearchIndex(INDEX_NAME)
+    texts, term_vectors = collection.analyze_and_get_term_vectors(
+        ["The atomic bombs of the project"], ["MARCO_2", "MARCO_x"]
+    )
+    assert texts == [["atomic", "bomb", "project"]]
+    assert term_vectors == index.get_term_vectors(["MARCO_2", "MARCO_x"])
+    assert collection.analyze("The atomic bombs") == ["atomic", "bomb"]
+    assert collection.request_count == 2
+    assert collection.response_bytes > 0
+
+
+def test_rm3(server: FakeElasticsearchServer, index: InvertedIndex):
+    rm3 = RM3(BM25Retriever(ElasticSearchIndex(INDEX_NAME)), prf_num_terms=5)
+    expected = RM3(BM25Retriever(index), prf_num_terms=5)
+    assert str(rm3.get_expanded_query(QUERY)) == str(
+        expected.get_expanded_query(QUERY)
+    )
+
+
+def test_latency(index: InvertedIndex):
+    server = FakeElasticsearchServer(latency=0.05, latency_per_doc=0.01)
+    server.add_index(INDEX_NAME, index)
+    with server.patch():
+        collection = ElasticSearchIndex(INDEX_NAME)
+    start = time.perf_counter()
+    collection.search({"match": {"body": "atomic"}}, num_results=5)
+    assert time.perf_counter() - start >= 0.1
+    assert server.request_counts == {"search": 1}
+
+
+def test_read_only_index(index: InvertedIndex):
+    server = FakeElasticsearchServer()
+    server.add_index(INDEX_NAME, index)
+    response = server.client().bulk(
+        '{"index": {"_index": "test_index", "_id": "d1"}}\n{"body": "text"}\n'
+    )
+    assert response["errors"]
+    assert server.client().mget({"ids": ["d1"]}, index=INDEX_NAME) == {
+        "docs": [{"_index": INDEX_NAME, "_id": "d1", "found": False}]
+    }
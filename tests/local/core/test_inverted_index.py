@@ -0,0 +1,173 @@
+"""Tests local inverted index backend."""
+
+import math
+from collections import Counter
+
+import numpy as np
+import pytest
+from treccast.core.base import Query
+from treccast.core.collection import InvertedIndex
+from treccast.core.util.analyzer import Analyzer
+from treccast.core.util.data_generator import DataGeneratorMixin
+from treccast.retriever.bm25_retriever import BM25Retriever
+
+MS_MARCO_PASSAGE_DATASET = "tests/data/ms_marco_passage_sample.tsv"
+STOPWORDS = ["a", "an", "and", "are", "in", "is", "of", "on", "the", "to"]
+
+
+@pytest.fixture(scope="module")
+def documents():
+    return list(
+        DataGeneratorMixin().generate_data_marco(
+            "indexing", MS_MARCO_PASSAGE_DATASET
+        )
+    )
+
+
+@pytest.fixture(scope="module")
+def index(documents, tmp_path_factory) -> InvertedIndex:
+    return InvertedIndex.build(
+        str(tmp_path_factory.mktemp("index") / "index.npz"),
+        documents,
+        analyzer=Analyzer(STOPWORDS),
+    )
+
+
+def _bm25_scores(documents, weighted_terms, b=0.75, k1=1.2):
+    """Computes BM25 scores of all documents exhaustively."""
+    analyzer = Analyzer(STOPWORDS)
+    term_freqs = [
+        Counter(analyzer.analyze(document["body"])) for document in documents
+    ]
+    avg_doc_length = sum(sum(tf.values()) for tf in term_freqs) / len(documents)
+    scores = {}
+    for document, tfs in zip(documents, term_freqs):
+        score = 0
+        for term, weight in weighted_terms.items():
+            df = sum(term in other for other in term_freqs)
+            if tfs[term] == 0:
+                continue
+            idf = math.log(1 + (len(documents) - df + 0.5) / (df + 0.5))
+            norm = k1 * (1 - b + b * sum(tfs.values()) / avg_doc_length)
+            score += weight * idf * tfs[term] / (tfs[term] + norm)
+        if score > 0:
+            scores[document["_id"]] = score
+    return scores
+
+
+def test_analyzer():
+    analyzer = Analyzer(STOPWORDS)
+    assert analyzer.analyze("The U.S. Cities and their Churches") == [
+        "u.s",
+        "city",
+        "their",
+        "church",
+    ]
+
+
+def test_build(index, documents):
+    assert len(index) == len(documents)
+    assert index.get_content("MARCO_0") == documents[0]["body"]
+    assert index.get_content("unknown") is None
+
+
+@pytest.mark.parametrize(
+    "weighted_terms,num_results",
+    [
+        ({"manhattan": 1.0}, 10),
+        ({"project": 1.0, "atomic": 2.0, "research": 0.5}, 3),
+        ({"success": 1.0, "project": 1.0, "water": 1.0}, 1),
+        ({"success": 1.0, "project": 1.0, "water": 1.0}, 1000),
+    ],
+)
+def test_search(index, documents, weighted_terms, num_results):
+    query = {
+        "bool": {
+            "should": [
+                {"term": {"body": {"value": term, "boost": weight}}}
+                for term, weight in weighted_terms.items()
+            ]
+        }
+    }
+    expected = sorted(
+        _bm25_scores(documents, weighted_terms).items(),
+        key=lambda item: -item[1],
+    )[:num_results]
+    results = index.search(query, num_results=num_results, source=False)
+    assert [doc.doc_id for doc in results] == [doc_id for doc_id, _ in expected]
+    assert [doc.score for doc in results] == pytest.approx(
+        [score for _, score in expected]
+    )
+
+
+def test_search_unsupported_query(index):
+    with pytest.raises(ValueError):
+        index.search({"match_phrase": {"body": {"query": "atomic research"}}})
+
+
+def test_bm25_retriever(index, documents):
+    default_retriever = BM25Retriever(index)
+    retriever = BM25Retriever(index, k1=0.9, b=0.4)
+    query = Query("q1", "The success of the atomic research")
+    ranking = retriever.retrieve(query, num_results=5)
+    expected = sorted(
+        _bm25_scores(
+            documents, Counter(index.analyze(query.question)), b=0.4, k1=0.9
+        ).items(),
+        key=lambda item: -item[1],
+    )[:5]
+    doc_ids, contents = ranking.documents()
+    assert doc_ids == [doc_id for doc_id, _ in expected]
+    assert contents[0] == index.get_content(doc_ids[0])
+    # Parameters of one retriever do not affect others.
+    default_ranking = default_retriever.retrieve(query, num_results=5)
+    assert default_ranking.scores() != ranking.scores()
+
+
+@pytest.fixture(scope="module")
+def large_index(tmp_path_factory) -> InvertedIndex:
+    """Index with Zipf-distributed terms whose posting lists span blocks."""
+    rng = np.random.default_rng(0)
+    probabilities = 1 / np.arange(1, 501)
+    documents = [
+        {
+            "_id": f"doc{i}",
+            "body": " ".join(
+                f"t{term}"
+                for term in rng.choice(
+                    500,
+                    size=rng.integers(5, 50),
+                    p=probabilities / probabilities.sum(),
+                )
+            ),
+        }
+        for i in range(3000)
+    ]
+    return InvertedIndex.build(
+        str(tmp_path_factory.mktemp("index") / "large_index.npz"),
+        documents,
+        analyzer=Analyzer([]),
+    )
+
+
+@pytest.mark.parametrize("num_terms", [1, 10, 100])
+@pytest.mark.parametrize("num_results", [1, 10, 1000])
+def test_search_dynamic_pruning(large_index, num_terms, num_results):
+    rng = np.random.default_rng(num_terms)
+    query = {
+        "bool": {
+            "should": [
+                {"term": {"body": {"value": f"t{term}", "boost": weight}}}
+                for term, weight in zip(
+                    rng.choice(500, size=num_terms, replace=False),
+                    rng.random(num_terms),
+                )
+            ]
+        }
+    }
+    results = large_index.search(query, num_results, source=False)
+    large_index.dynamic_pruning = False
+    expected = large_index.search(query, num_results, source=False)
+    large_index.dynamic_pruning = True
+    assert len(results) == min(num_results, len(expected))
+    assert results == expected
@@ -0,0 +1,59 @@
+"""Tests Qrel class."""
+
+import numpy as np
+import pytest
+from treccast.core.qrel import Qrel
+
+
+@pytest.fixture
+def qrels():
+    return Qrel.load_qrels_from_file("data/qrels/2021.txt")
+
+
+def test_load_qrels(qrels):
+    qrel = qrels["106_1"]
+    assert len(qrel) == len(qrel.documents())
+    assert len(qrel.doc_ids()) == len(qrel.relevances()) == len(qrel)
+
+
+def test_get_relevance():
+    qrel = Qrel("q1")
+    qrel.add_doc("d1", 4)
+    qrel.add_doc("d2", 1)
+    qrel.add_doc("d3", 2, "content 3")
+    assert qrel.get_relevance("d1") == 4
+    assert qrel.get_relevance("d1", binarized=True) == 1
+    assert qrel.get_relevance("d2", binarized=True) == 0
+    assert qrel.get_relevance("unjudged") == 0
+    assert "d3" in qrel and "unjudged" not in qrel
+    np.testing.assert_array_equal(
+        qrel.get_relevances(["d3", "unjudged", "d2"]), [2, 0, 1]
+    )
+    np.testing.assert_array_equal(
+        qrel.get_relevances(["d3", "unjudged", "d2"], binarized=True),
+        [1, 0, 0],
+    )
+
+
+def test_get_docs():
+    qrel = Qrel("q1")
+    qrel.add_doc("d1", 4)
+    qrel.add_doc("d2", 1)
+    qrel.add_doc("d3", 2, "content 3")
+    assert [doc["doc_id"] for doc in qrel.get_docs(1)] == ["d1", "d3"]
+    assert [doc["doc_id"] for doc in qrel.get_docs(1, binarized=False)] == [
+        "d2"
+    ]
+    assert qrel.get_docs(2, binarized=False)[0]["content"] == "content 3"
+    assert len(qrel.get_docs()) == len(qrel.get_docs(0)) == 3
+    assert [doc["rel"] for doc in qrel.get_docs()] == [1, 0, 1]
+    assert [doc["rel"] for doc in qrel.get_docs(binarized=False)] == [4, 1, 2]
+
+
+def test_relevances_arrays_updated():
+    qrel = Qrel("q1")
+    qrel.add_doc("d1", 3)
+    np.testing.assert_array_equal(qrel.relevances(), [3])
+    qrel.add_doc("d2", 0)
+    np.testing.assert_array_equal(qrel.doc_ids(), ["d1", "d2"])
+    np.testing.assert_array_equal(qrel.relevances(binarized=True), [1, 0])
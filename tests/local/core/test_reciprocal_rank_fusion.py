@@ -0,0 +1,109 @@
+"""Tests in-memory rank fusion."""
+
+from unittest import mock
+
+import numpy as np
+import pytest
+from treccast.core.base import ScoredDocument
+from treccast.core.ranking import Ranking
+from treccast.core.util.reciprocal_rank_fusion import ReciprocalRankFusion
+from trectools import TrecRun, fusion
+
+
+def _random_ranking(seed: int, num_docs: int) -> Ranking:
+    """Ranking with overlapping document IDs, duplicates, and tied scores."""
+    rng = np.random.default_rng(seed)
+    return Ranking(
+        "q1",
+        [
+            ScoredDocument(f"d{doc}", f"content {doc}", float(score))
+            for doc, score in zip(
+                rng.integers(0, 2 * num_docs, size=num_docs),
+                rng.integers(0, num_docs // 2, size=num_docs) / 4,
+            )
+        ],
+    )
+
+
+@pytest.mark.parametrize("num_docs", [10, 1500])
+def test_reciprocal_rank_fusion_equals_trectools(tmp_path, num_docs):
+    rankings = [
+        (f"run{seed}", _random_ranking(seed, num_docs)) for seed in range(3)
+    ]
+    runs = []
+    for name, ranking in rankings:
+        with open(tmp_path / f"{name}.trec", "w") as trec_out:
+            ranking.write_to_trec_file(trec_out, run_id=name, k=num_docs)
+        runs.append(TrecRun(str(tmp_path / f"{name}.trec")))
+    expected = fusion.reciprocal_rank_fusion(runs).run_data
+
+    ranking = ReciprocalRankFusion().reciprocal_rank_fusion(rankings)
+    assert ranking.query_id == "q1"
+    assert ranking.documents()[0] == list(expected["docid"])
+    assert ranking.scores() == list(expected["score"])
+    assert ranking.documents()[1] == [
+        f"content {doc_id[1:]}" for doc_id in expected["docid"]
+    ]
+
+
+def test_missing_content_is_loaded():
+    ploader = mock.Mock()
+    ploader.mget.return_value = ["loaded"]
+    rankings = [
+        ("sparse", Ranking("q1", [ScoredDocument("d1", None, 2.0)])),
+        ("dense", Ranking("q1", [ScoredDocument("d2", "content", 1.0)])),
+    ]
+    ranking = ReciprocalRankFusion(ploader).reciprocal_rank_fusion(rankings)
+    assert ranking.documents() == (["d1", "d2"], ["loaded", "content"])
+    ploader.mget.assert_called_once_with(["d1"])
+
+
+@pytest.fixture
+def rankings():
+    return [
+        (
+            "sparse",
+            Ranking(
+                "q1",
+                [
+                    ScoredDocument("d1", None, 10.0),
+                    ScoredDocument("d2", None, 6.0),
+                    ScoredDocument("d3", None, 2.0),
+                ],
+            ),
+        ),
+        (
+            "dense",
+            Ranking(
+                "q1",
+                [
+                    ScoredDocument("d3", None, 0.8),
+                    ScoredDocument("d4", None, 0.5),
+                ],
+            ),
+        ),
+    ]
+
+
+def test_weighted_reciprocal_rank_fusion(rankings):
+    ranking = ReciprocalRankFusion(k=0).weighted_reciprocal_rank_fusion(
+        rankings, [1.0, 2.0]
+    )
+    assert ranking.documents()[0] == ["d3", "d1", "d4", "d2"]
+    assert ranking.scores() == pytest.approx([2 + 1 / 3, 1, 1, 0.5])
+
+
+def test_comb_sum(rankings):
+    ranking = ReciprocalRankFusion().comb_sum(rankings)
+    assert ranking.documents()[0] == ["d1", "d2", "d3", "d4"]
+    assert ranking.scores() == pytest.approx([10.0, 6.0, 2.8, 0.5])
+
+    ranking = ReciprocalRankFusion().comb_sum(rankings, normalize=True)
+    assert ranking.documents()[0] == ["d1", "d3", "d2", "d4"]
+    assert ranking.scores() == pytest.approx([1.0, 1.0, 0.5, 0.0])
+
+
+def test_comb_mnz(rankings):
+    ranking = ReciprocalRankFusion().comb_mnz(rankings)
+    assert ranking.documents()[0] == ["d1", "d2", "d3", "d4"]
+    assert ranking.scores() == pytest.approx([10.0, 6.0, 5.6, 0.5])
@@ -1,9 +1,19 @@
 """Tests for Topic."""
 
+import json
 from typing import List
+from unittest import mock
 
 import pytest
-from treccast.core.topic import Context, Document, QueryRewrite, Topic
+from treccast.core.topic import (
+    Context,
+    Document,
+    Query,
+    QueryRewrite,
+    Topic,
+    extend_with_passages,
+)
+from treccast.core.util.passage_loader import DEFAULT_MGET_BATCH_SIZE
 
 
 @pytest.mark.parametrize(
@@ -120,3 +130,111 @@ def test_get_context(year, query_rewrite):
     context_3.history = context_2.history
     context_3.history.append((query_2, [Document(None, canonical_response_2)]))
     assert contexts[2] == context_3
+
+
+def test_extend_with_passages(tmp_path):
+    raw_topics = [
+        {
+            "number": 1,
+            "turn": [
+                {
+                    "number": 1,
+                    "raw_utterance": "First question?",
+                    "canonical_result_id": "MARCO_D1",
+                    "passage_id": 2,
+                    "provenance": ["MARCO_D1-2", "MARCO_D3"],
+                },
+                {
+                    "number": 2,
+                    "raw_utterance": "Second question?",
+                    "canonical_result_id": "MARCO_D4",
+                    "passage_id": 1,
+                },
+            ],
+        }
+    ]
+    filepath = str(tmp_path / "topics.json")
+    with open(filepath, "w", encoding="utf8") as f_out:
+        json.dump(raw_topics, f_out)
+
+    passages = {
+        "MARCO_D1-2": "passage 1",
+        "MARCO_D3-1": "passage 3",
+        "MARCO_D4-1": "passage 4",
+    }
+    with mock.patch.object(
+        Topic, "get_filepath", return_value=filepath
+    ), mock.patch("treccast.core.topic.PassageLoader") as mock_loader:
+        mock_loader.return_value.mget.side_effect = lambda ids, _: [
+            passages.get(doc_id) for doc_id in ids
+        ]
+        extend_with_passages("localhost", {"2021": "index"}, [None])
+
+    # All passage IDs are fetched in a single bulk request.
+    mock_loader.return_value.mget.assert_called_once_with(
+        sorted(passages), DEFAULT_MGET_BATCH_SIZE
+    )
+    with open(str(tmp_path / "topics_extended.json"), encoding="utf8") as f:
+        turns = json.load(f)[0]["turn"]
+    assert turns[0]["canonical_passage"] == "passage 1"
+    assert turns[0]["provenance_passages"] == ["passage 1", "passage 3"]
+    assert turns[1]["canonical_passage"] == "passage 4"
+    assert "provenance_passages" not in turns[1]
+
+
+def test_load_topics_from_file_cached():
+    topics = Topic.load_topics_from_file("2021", QueryRewrite.MANUAL)
+    with mock.patch("treccast.core.topic.json.load") as mock_json_load:
+        queries = Topic.load_queries_from_file("2021", QueryRewrite.MANUAL)
+        contexts = Topic.load_contexts_from_file("2021", QueryRewrite.MANUAL)
+        assert Topic.load_topics_from_file("2021", QueryRewrite.MANUAL) == (
+            topics
+        )
+    mock_json_load.assert_not_called()
+    assert len(queries) == len(contexts) == sum(len(t.turns) for t in topics)
+
+
+def test_get_contexts_shared_history():
+    topic = Topic.load_topics_from_file("2021", QueryRewrite.MANUAL)[0]
+    contexts = topic.get_contexts("2021", QueryRewrite.MANUAL)
+    queries = topic.get_queries(QueryRewrite.MANUAL)
+    assert [len(context) for context in contexts[1:]] == list(
+        range(1, len(topic.turns))
+    )
+    last_context = contexts[-1]
+    assert [query for query, _ in last_context.last_turns()] == queries[:-1]
+    assert last_context.last_turns(2) == last_context.history[-2:]
+    assert last_context.last_responses(1) == [
+        [Document(None, topic.turns[-2].canonical_passage)]
+    ]
+    # Extending a context leaves the original context unchanged.
+    extended = contexts[1].extend(queries[-1], [])
+    assert len(contexts[1]) == 1
+    assert extended.last_turns(1) == [(queries[-1], [])]
+    assert extended.last_turns(2)[0] == contexts[1].history[0]
+
+
+def test_extended_context_is_independent_of_history_changes():
+    turns = [(Query(f"81_{i}", f"question {i}"), []) for i in range(4)]
+    context = Context(turns[:2])
+    extended = context.extend(*turns[2])
+    further_extended = extended.extend(*turns[3])
+    context.history.append(turns[3])
+    context.history = []
+    extended.history.clear()
+    assert len(further_extended) == len(further_extended.last_turns()) == 4
+    assert further_extended.last_turns() == turns
+    assert len(extended) == len(extended.last_turns()) == 0
+
+
+def test_load_topics_from_file_returns_copies():
+    topics = Topic.load_topics_from_file("2021", QueryRewrite.MANUAL)
+    utterance = topics[0].turns[0].manual_rewritten_utterance
+    topics[0].turns[0].manual_rewritten_utterance = "changed"
+    topics[0].turns.clear()
+    reloaded = Topic.load_topics_from_file("2021", QueryRewrite.MANUAL)
+    assert reloaded[0].turns[0].manual_rewritten_utterance == utterance
+    assert (
+        Topic.load_queries_from_file("2021", QueryRewrite.MANUAL)[0].question
+        == utterance
+    )
@@ -0,0 +1,63 @@
+"""Tests stage-level timing of the pipeline."""
+
+import json
+import pstats
+
+from treccast.core.util.tracer import Tracer
+
+
+def test_trace(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    tracer = Tracer(str(path))
+    with tracer.stage("rewrite"):
+        pass
+    tracer.start_turn("81_1")
+    with tracer.stage("sparse"):
+        pass
+    tracer.add_time("dense", 0.5)
+    tracer.count("es_requests", 2)
+    tracer.end_turn()
+    tracer.start_turn("81_2")
+    tracer.add_time("dense", 0.25)
+    tracer.count("es_requests")
+    tracer.end_turn()
+    summary = tracer.close()
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [record["query_id"] for record in records] == [None, "81_1", "81_2"]
+    assert set(records[0]["stages"]) == {"rewrite"}
+    assert "total" not in records[0]
+    assert set(records[1]["stages"]) == {"sparse", "dense"}
+    assert records[1]["stages"]["dense"] == 0.5
+    assert records[1]["counters"] == {"es_requests": 2}
+    assert records[2]["counters"] == {"es_requests": 1}
+    assert records[2]["total"] >= 0
+
+    lines = summary.splitlines()
+    assert lines[0].startswith("stage")
+    dense = next(line for line in lines if line.startswith("dense"))
+    assert dense.split()[1:3] == ["2", "0.75"]
+    assert next(line for line in lines if line.startswith("es_requests"))
+    assert lines[-1].startswith("total")
+
+
+def test_throughput():
+    tracer = Tracer()
+    tracer.add_time("t5", 2.0)
+    tracer.count("t5_pairs", 1000)
+    t5 = next(
+        line for line in tracer.close().splitlines() if line.startswith("t5 ")
+    )
+    assert t5.split()[-1] == "500.0"
+
+
+def test_profile_stage(tmp_path):
+    path = tmp_path / "t5.prof"
+    tracer = Tracer(profile_stage="t5", profile_path=str(path))
+    with tracer.stage("t5"):
+        sorted(range(1000))
+    tracer.close()
+    stats = pstats.Stats(str(path))
+    assert any(
+        func[2] == "<built-in method builtins.sorted>" for func in stats.stats
+    )
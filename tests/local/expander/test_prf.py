@@ -0,0 +1,146 @@
+"""Tests RM3 pseudo-relevance feedback."""
+
+from collections import Counter, defaultdict
+from unittest import mock
+
+import pytest
+from treccast.core.base import Query
+from treccast.core.collection import InvertedIndex
+from treccast.core.util.analyzer import Analyzer
+from treccast.core.util.data_generator import DataGeneratorMixin
+from treccast.expander.prf import RM3
+from treccast.retriever.bm25_retriever import BM25Retriever
+
+MS_MARCO_PASSAGE_DATASET = "tests/data/ms_marco_passage_sample.tsv"
+STOPWORDS = ["a", "an", "and", "are", "in", "is", "of", "on", "the", "to"]
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory) -> InvertedIndex:
+    return InvertedIndex.build(
+        str(tmp_path_factory.mktemp("index") / "index.npz"),
+        DataGeneratorMixin().generate_data_marco(
+            "indexing", MS_MARCO_PASSAGE_DATASET
+        ),
+        analyzer=Analyzer(STOPWORDS),
+    )
+
+
+@pytest.fixture
+def retriever(index: InvertedIndex) -> BM25Retriever:
+    retriever = BM25Retriever(index)
+    retriever._collection = mock.Mock(wraps=index)
+    return retriever
+
+
+@pytest.mark.parametrize("prf_num_documents", [3, 100])
+def test_get_expanded_query(
+    retriever: BM25Retriever, index: InvertedIndex, prf_num_documents: int
+):
+    query = Query("q1", "atomic research project")
+    rm3 = RM3(retriever, prf_num_documents=prf_num_documents, prf_num_terms=5)
+    expanded_query = rm3.get_expanded_query(query)
+
+    feedback_weights = defaultdict(float)
+    for doc in retriever.retrieve(
+        query, num_results=prf_num_documents
+    ).fetch_topk_docs(prf_num_documents):
+        term_freqs = Counter(index.analyze(doc.content))
+        for term, term_freq in term_freqs.items():
+            feedback_weights[term] += (
+                term_freq / sum(term_freqs.values()) * doc.score
+            )
+    top_terms = sorted(
+        feedback_weights.items(), key=lambda item: item[1], reverse=True
+    )[:5]
+    total_weight = sum(weight for _, weight in top_terms)
+    assert list(rm3._get_top_collection_terms([query])[0].items()) == [
+        (term, weight / total_weight) for term, weight in top_terms
+    ]
+    expected = {term: 0.5 * weight / total_weight for term, weight in top_terms}
+    for term in index.analyze(query.question):
+        expected[term] = expected.get(term, 0) + 0.5
+    assert expanded_query.weighted_terms == pytest.approx(expected)
+
+
+def test_term_vectors_batched_and_cached(retriever: BM25Retriever):
+    rm3 = RM3(retriever, prf_num_documents=5)
+    query = Query("q1", "atomic research project")
+    rm3.get_expanded_query(query)
+    collection = retriever._collection
+    collection.analyze_and_get_term_vectors.assert_called_once()
+    texts, doc_ids = collection.analyze_and_get_term_vectors.call_args[0]
+    assert texts == [query.question]
+    assert len(doc_ids) == 5
+    collection.analyze.assert_not_called()
+
+    # Feedback documents and the analysis of a repeated query are cached.
+    rm3.get_expanded_query(Query("q2", query.question))
+    collection.analyze_and_get_term_vectors.assert_called_once()
+    collection.analyze.assert_not_called()
+
+
+def test_term_vector_cache_is_bounded(retriever: BM25Retriever):
+    rm3 = RM3(retriever, prf_num_documents=5, term_vector_cache_size=3)
+    rm3.get_expanded_query(Query("q1", "atomic research project"))
+    assert len(rm3._term_vectors) == 3
+    ranking = retriever.retrieve(Query("q1", "atomic research project"), 5)
+    assert (
+        list(rm3._term_vectors)
+        == [doc.doc_id for doc in ranking.fetch_topk_docs(5)][2:]
+    )
+
+
+def test_get_expanded_queries(retriever: BM25Retriever, index: InvertedIndex):
+    queries = [
+        Query("q1", "atomic research project"),
+        Query("q2", "manhattan project success"),
+        Query("q3", "atomic research project"),
+    ]
+    expanded_queries = RM3(retriever).get_expanded_queries(queries)
+    collection = retriever._collection
+    collection.batch_search.assert_called_once()
+    collection.analyze_and_get_term_vectors.assert_called_once()
+    texts, _ = collection.analyze_and_get_term_vectors.call_args[0]
+    assert texts == ["atomic research project", "manhattan project success"]
+
+    rm3 = RM3(BM25Retriever(index))
+    assert [query.query_id for query in expanded_queries] == ["q1", "q2", "q3"]
+    assert [query.weighted_terms for query in expanded_queries] == [
+        rm3.get_expanded_query(query).weighted_terms for query in queries
+    ]
+
+
+def test_vocabulary_is_compacted(
+    retriever: BM25Retriever, index: InvertedIndex
+):
+    rm3 = RM3(retriever, prf_num_documents=5, term_vector_cache_size=3)
+    expected = RM3(BM25Retriever(index), prf_num_documents=5)
+    questions = [
+        "atomic research project",
+        "manhattan project success",
+        "communication amid scientific minds",
+        "innocent lives obliterated",
+        "musical career of the son",
+    ]
+    for i, question in enumerate(questions * 2):
+        query = Query(f"q{i}", question)
+        assert (
+            rm3.get_expanded_query(query).weighted_terms
+            == expected.get_expanded_query(query).weighted_terms
+        )
+    assert rm3._compacted_vocabulary_size > 0
+    assert len(rm3._vocabulary_terms) < len(expected._vocabulary_terms)
+
+    rm3._compact_vocabulary()
+    cached_terms = [
+        [rm3._vocabulary_terms[term_id] for term_id in ids]
+        for ids, _, _ in rm3._term_vectors.values()
+    ]
+    assert set(rm3._vocabulary_terms) == {
+        term for terms in cached_terms for term in terms
+    }
+    assert cached_terms == [
+        list(index.get_term_vectors([doc_id])[0])
+        for doc_id in rm3._term_vectors
+    ]
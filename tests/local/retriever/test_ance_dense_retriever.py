@@ -0,0 +1,89 @@
+"""Tests ANCE dense retrieval with a mocked ANCE model."""
+
+from unittest import mock
+
+import pandas as pd
+import pytest
+from treccast.core.base import Query
+
+with pytest.helpers.mock_expensive_imports():
+    from treccast.retriever import ance_dense_retriever
+    from treccast.retriever.ance_dense_retriever import ANCEDenseRetriever
+
+
+@pytest.fixture
+def retriever() -> ANCEDenseRetriever:
+    # Model and index loading are skipped.
+    retriever = ANCEDenseRetriever.__new__(ANCEDenseRetriever)
+    retriever._ance_retriever = mock.MagicMock()
+    retriever.ance_retriever.__mod__.return_value.transform.return_value = (
+        pd.DataFrame(
+            {
+                "qid": ["0", "0", "1", "2"],
+                "docid": [3, 1, 2, 3],
+                "docno": ["d3", "d1", "d2", "d3"],
+                "score": [0.9, 0.5, 0.7, 0.2],
+                "rank": [0, 1, 0, 0],
+            }
+        )
+    )
+    retriever._passage_loader = mock.MagicMock()
+    retriever._passage_loader.mget.side_effect = lambda doc_ids: [
+        None if doc_id == "d1" else f"content {doc_id}" for doc_id in doc_ids
+    ]
+    return retriever
+
+
+def test_batch_retrieve(retriever: ANCEDenseRetriever):
+    queries = [
+        Query("q1", "first"),
+        Query("q2", "second"),
+        Query("q1", "again"),
+    ]
+    rankings = retriever.batch_retrieve(queries, num_results=10)
+
+    retriever.ance_retriever.__mod__.assert_called_once_with(10)
+    transform = retriever.ance_retriever.__mod__.return_value.transform
+    transform.assert_called_once()
+    topics = transform.call_args[0][0]
+    assert topics["qid"].tolist() == ["0", "1", "2"]
+    assert topics["query"].tolist() == ["first", "second", "again"]
+    retriever._passage_loader.mget.assert_called_once_with(
+        ["d3", "d1", "d2", "d3"]
+    )
+
+    assert [ranking.query_id for ranking in rankings] == ["q1", "q2", "q1"]
+    # Passages missing from the index are left out.
+    assert rankings[0].documents() == (["d3"], ["content d3"])
+    assert rankings[0].scores() == [0.9]
+    assert rankings[1].documents() == (["d2"], ["content d2"])
+    assert rankings[2].scores() == [0.2]
+
+
+def test_retrieve(retriever: ANCEDenseRetriever):
+    transform = retriever.ance_retriever.__mod__.return_value.transform
+    transform.return_value = pd.DataFrame(
+        {"qid": ["0"], "docno": ["d3"], "score": [0.9]}
+    )
+    ranking = retriever.retrieve(Query("q1", "first"), num_results=10)
+    assert ranking.query_id == "q1"
+    assert ranking.documents()[0] == ["d3"]
+
+
+@mock.patch.object(ance_dense_retriever, "PassageLoader")
+@mock.patch.object(ance_dense_retriever, "get_collection_iter")
+@mock.patch.object(ance_dense_retriever, "_init_pyterrier")
+def test_lazy_initialization(
+    mock_init_pyterrier, mock_get_collection_iter, _, tmp_path
+):
+    retriever = ANCEDenseRetriever(index_path=str(tmp_path))
+    # The index exists, so the collection is not loaded, and the model and
+    # index are only loaded on first access.
+    mock_get_collection_iter.assert_not_called()
+    mock_init_pyterrier.assert_not_called()
+    assert retriever._ance_retriever is None
+
+    with pytest.helpers.mock_expensive_imports():
+        ance_retriever = retriever.ance_retriever
+    mock_init_pyterrier.assert_called_once()
+    assert retriever.ance_retriever is ance_retriever
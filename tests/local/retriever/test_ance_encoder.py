@@ -0,0 +1,33 @@
+"""Tests loading of the ANCE encoder with a mocked model."""
+
+from unittest import mock
+
+import pytest
+
+with pytest.helpers.mock_expensive_imports():
+    from treccast.retriever import ance_encoder
+
+
+@pytest.fixture
+def model() -> mock.MagicMock:
+    with mock.patch.object(ance_encoder, "torch"), mock.patch.object(
+        ance_encoder, "RobertaTokenizer"
+    ), mock.patch.object(ance_encoder, "RobertaConfig"), mock.patch.object(
+        ance_encoder, "_RobertaDot"
+    ) as model_class:
+        yield model_class.return_value
+
+
+def test_load_checkpoint(model: mock.MagicMock):
+    model.load_state_dict.return_value.missing_keys = []
+    ance_encoder.ANCEEncoder("checkpoint", device="cpu")
+    model.eval.assert_called_once()
+
+
+def test_load_checkpoint_missing_keys(model: mock.MagicMock):
+    model.load_state_dict.return_value.missing_keys = [
+        "embeddingHead.weight",
+        "norm.weight",
+    ]
+    with pytest.raises(RuntimeError, match="embeddingHead.weight"):
+        ance_encoder.ANCEEncoder("checkpoint", device="cpu")
@@ -0,0 +1,143 @@
+"""Tests in-memory BM25 parameter tuning."""
+
+import math
+from unittest import mock
+
+import numpy as np
+import pytest
+from treccast.core.base import Query
+from treccast.core.qrel import Qrel
+from treccast.core.topic import QueryRewrite
+from treccast.retriever.bm25_tuning import (
+    get_query_statistics,
+    lucene_doc_lengths,
+    main,
+    score_bm25_grid,
+    tune_bm25_parameters,
+)
+
+# Term vectors of three documents in a collection of 10 documents with an
+# average length of 5 terms.
+_TERM_VECTORS = {
+    "d1": {"cat": (1, 2), "dog": (3, 5)},
+    "d2": {"cat": (2, 2), "mouse": (8, 1)},
+    "d3": {"dog": (1, 5), "bird": (1, 3)},
+}
+
+
+def _term_vector_response(body, **kwargs):
+    return {
+        "docs": [
+            {
+                "_id": doc_id,
+                "term_vectors": {
+                    "body": {
+                        "field_statistics": {"doc_count": 10, "sum_ttf": 50},
+                        "terms": {
+                            term: {"term_freq": tf, "doc_freq": df}
+                            for term, (tf, df) in _TERM_VECTORS[doc_id].items()
+                        },
+                    }
+                },
+            }
+            for doc_id in body["ids"]
+        ]
+    }
+
+
+@pytest.fixture
+def collection():
+    collection = mock.MagicMock()
+    collection.es.indices.analyze.return_value = {
+        "tokens": [{"token": "cat"}, {"token": "dog"}]
+    }
+    collection.es.search.return_value = {
+        "hits": {"hits": [{"_id": "d1"}, {"_id": "d2"}, {"_id": "d3"}]}
+    }
+    collection.es.mtermvectors.side_effect = _term_vector_response
+    return collection
+
+
+def _bm25(tf, df, dl, b, k1):
+    idf = math.log(1 + (10 - df + 0.5) / (df + 0.5))
+    return idf * tf / (tf + k1 * (1 - b + b * dl / 5))
+
+
+def test_lucene_doc_lengths():
+    assert list(lucene_doc_lengths([0, 5, 23, 24, 31, 40, 41, 100])) == [
+        0,
+        5,
+        23,
+        24,
+        31,
+        40,
+        40,
+        96,
+    ]
+
+
+def test_score_bm25_grid(collection):
+    stats = get_query_statistics(collection, Query("q1", "cat dog"))
+    assert stats.doc_ids == ["d1", "d2", "d3"]
+    assert list(stats.doc_lengths) == [4, 10, 2]
+
+    scores = score_bm25_grid(stats, [0.4, 0.75], [0.9, 1.2, 1.5])
+    assert scores.shape == (2, 3, 3)
+    assert scores[1, 1, 0] == pytest.approx(
+        _bm25(1, 2, 4, 0.75, 1.2) + _bm25(3, 5, 4, 0.75, 1.2)
+    )
+    assert scores[0, 2, 1] == pytest.approx(_bm25(2, 2, 10, 0.4, 1.5))
+    assert scores[0, 0, 2] == pytest.approx(_bm25(1, 5, 2, 0.4, 0.9))
+
+
+def test_tune_bm25_parameters(collection):
+    qrel = Qrel("q1")
+    qrel.add_doc("d3", 2)
+    results_df = tune_bm25_parameters(
+        collection,
+        [Query("q1", "cat dog"), Query("q2", "unjudged")],
+        {"q1": qrel},
+        b_values=np.array([0.4, 0.75]),
+        k1_values=np.array([0.9, 1.2, 1.5]),
+        num_results=1,
+    )
+    assert list(results_df.columns) == ["b", "k1", "recall_1000"]
+    assert len(results_df) == 6
+    # d3 only contains the less discriminative term, hence it is never first.
+    assert (results_df["recall_1000"] == 0).all()
+    # Candidates are only collected for judged queries.
+    assert collection.es.search.call_count == 1
+
+
+@pytest.mark.parametrize(
+    "year,index_name,field",
+    [
+        ("2020", "ms_marco_trec_car_clean", "body"),
+        ("2021", "ms_marco_kilt_wapo_clean", "catch_all"),
+    ],
+)
+def test_main_uses_index_of_year(year: str, index_name: str, field: str):
+    args = mock.Mock(
+        year=year,
+        query_rewrite="automatic",
+        host_name="localhost:9204",
+        index_name=None,
+        field=None,
+        num_candidates=10,
+        output_dir="unused",
+    )
+    with mock.patch(
+        "treccast.retriever.bm25_tuning.ElasticSearchIndex"
+    ) as es_index, mock.patch(
+        "treccast.retriever.bm25_tuning.tune_bm25_parameters"
+    ) as tune, mock.patch(
+        "treccast.retriever.bm25_tuning.save_bm25_parameters_ranking"
+    ), mock.patch(
+        "treccast.retriever.bm25_tuning.plot_results_on_heatmap"
+    ), mock.patch(
+        "treccast.retriever.bm25_tuning.Topic.load_queries_from_file"
+    ) as load_queries:
+        main(args)
+    es_index.assert_called_once_with(index_name, hostname="localhost:9204")
+    assert tune.call_args[1]["field"] == field
+    load_queries.assert_called_once_with(year, QueryRewrite.AUTOMATIC)
@@ -0,0 +1,116 @@
+"""Tests resumable, multi-process corpus encoding with a fake encoder."""
+
+import os
+from typing import Dict, Iterator, List
+
+import numpy as np
+import pytest
+from treccast.retriever.corpus_encoding import encode_corpus, get_batches
+
+_DIM = 4
+
+
+class _FakeEncoder:
+    """Encodes a passage "t{i}" as [i, i, i, i]."""
+
+    def __init__(self, fail_on: str = None) -> None:
+        self.encoded: List[str] = []
+        self._fail_on = fail_on
+
+    def count_passage_tokens(self, passages: List[str]) -> List[int]:
+        return [len(passage) for passage in passages]
+
+    def encode_passages(self, passages: List[str]) -> np.ndarray:
+        if self._fail_on in passages:
+            raise RuntimeError("Encoding failed")
+        self.encoded.extend(passages)
+        return np.array(
+            [[float(passage[1:])] * _DIM for passage in passages],
+            dtype=np.float32,
+        )
+
+
+def _get_collection_iter(size: int = 10) -> Iterator[Dict[str, str]]:
+    return iter({"docno": f"d{i}", "text": f"t{i}"} for i in range(size))
+
+
+def test_get_batches():
+    batches = get_batches([5, 1, 3, 1, 5], tokens_per_batch=10)
+    assert batches == [[1, 3, 2], [0, 4]]
+
+
+def test_encode_corpus(tmp_path):
+    encoder = _FakeEncoder()
+    index = encode_corpus(
+        _get_collection_iter(),
+        str(tmp_path),
+        encoder_factory=lambda: encoder,
+        shard_size=4,
+        tokens_per_batch=6,
+    )
+    assert len(index) == 10
+    assert index.doc_ids == [f"d{i}" for i in range(10)]
+    np.testing.assert_array_equal(
+        index.get_embeddings(np.arange(10))[:, 0], np.arange(10)
+    )
+    assert not [name for name in os.listdir(tmp_path) if "tmp" in name]
+
+
+def test_encode_corpus_resumes(tmp_path):
+    with pytest.raises(RuntimeError):
+        encode_corpus(
+            _get_collection_iter(),
+            str(tmp_path),
+            encoder_factory=lambda: _FakeEncoder(fail_on="t5"),
+            shard_size=4,
+        )
+    assert os.path.exists(tmp_path / "shard_0.npy.ids")
+    assert not os.path.exists(tmp_path / "shard_1.npy.ids")
+
+    encoder = _FakeEncoder()
+    index = encode_corpus(
+        _get_collection_iter(),
+        str(tmp_path),
+        encoder_factory=lambda: encoder,
+        shard_size=4,
+    )
+    assert sorted(encoder.encoded) == sorted(f"t{i}" for i in range(4, 10))
+    assert index.doc_ids == [f"d{i}" for i in range(10)]
+    np.testing.assert_array_equal(
+        index.get_embeddings(np.arange(10))[:, 0], np.arange(10)
+    )
+
+
+def test_encode_corpus_resume_with_other_shard_size(tmp_path):
+    with pytest.raises(RuntimeError):
+        encode_corpus(
+            _get_collection_iter(),
+            str(tmp_path),
+            encoder_factory=lambda: _FakeEncoder(fail_on="t5"),
+            shard_size=4,
+        )
+    encoder = _FakeEncoder()
+    with pytest.raises(ValueError):
+        encode_corpus(
+            _get_collection_iter(),
+            str(tmp_path),
+            encoder_factory=lambda: encoder,
+            shard_size=3,
+        )
+    assert encoder.encoded == []
+    assert not os.path.exists(tmp_path / "shard_2.npy.ids")
+
+
+def test_encode_corpus_multi_process(tmp_path, capsys):
+    index = encode_corpus(
+        _get_collection_iter(),
+        str(tmp_path),
+        encoder_factory=_FakeEncoder,
+        num_workers=2,
+        shard_size=3,
+    )
+    assert index.doc_ids == [f"d{i}" for i in range(10)]
+    np.testing.assert_array_equal(
+        index.get_embeddings(np.arange(10))[:, 0], np.arange(10)
+    )
+    assert "passages/sec" in capsys.readouterr().out
@@ -0,0 +1,168 @@
+"""Tests the memory-mapped sharded dense index."""
+
+import os
+from unittest import mock
+
+import numpy as np
+import pytest
+from treccast.core.base import Query
+from treccast.retriever.dense_index import (
+    AnnType,
+    DenseIndex,
+    encode_collection,
+    recall_at_k,
+)
+from treccast.retriever.dense_retriever import DenseRetriever
+
+_DIM = 8
+
+
+@pytest.fixture
+def embeddings() -> np.ndarray:
+    return (
+        np.random.default_rng(0)
+        .standard_normal((50, _DIM))
+        .astype(np.float16)
+        .astype(np.float32)
+    )
+
+
+@pytest.fixture
+def index(tmp_path, embeddings: np.ndarray) -> DenseIndex:
+    doc_ids = [f"d{i}" for i in range(len(embeddings))]
+    batches = [
+        (doc_ids[start : start + 7], embeddings[start : start + 7])
+        for start in range(0, len(embeddings), 7)
+    ]
+    return DenseIndex.build(str(tmp_path), batches, shard_size=16)
+
+
+def test_build(tmp_path, index: DenseIndex, embeddings: np.ndarray):
+    assert len(index) == 50
+    assert index.doc_ids[:2] == ["d0", "d1"]
+    assert sorted(os.listdir(tmp_path)) == [
+        "doc_ids.txt",
+        "meta.json",
+        "shard_0.npy",
+        "shard_1.npy",
+        "shard_2.npy",
+        "shard_3.npy",
+    ]
+    shard = np.load(tmp_path / "shard_3.npy", mmap_mode="r")
+    assert shard.dtype == np.float16
+    assert shard.shape == (2, _DIM)
+    np.testing.assert_array_equal(
+        index.get_embeddings(np.array([49, 0, 17])), embeddings[[49, 0, 17]]
+    )
+
+
+def test_search_exhaustive(index: DenseIndex, embeddings: np.ndarray):
+    queries = embeddings[[3, 30]] + 0.1
+    scores, positions = index.search(queries, k=10)
+    expected_scores = queries @ embeddings.T
+    expected_positions = np.argsort(-expected_scores, axis=1)[:, :10]
+    np.testing.assert_array_equal(positions, expected_positions)
+    np.testing.assert_allclose(
+        scores,
+        np.take_along_axis(expected_scores, expected_positions, axis=1),
+        rtol=1e-5,
+    )
+
+
+def test_search_fewer_than_k(index: DenseIndex, embeddings: np.ndarray):
+    scores, positions = index.search(embeddings[:1], k=60)
+    assert (positions[0, :50] >= 0).all()
+    assert (positions[0, 50:] == -1).all()
+    assert np.isneginf(scores[0, 50:]).all()
+    assert len(index.get_doc_ids(positions)[0]) == 50
+
+
+def test_recall_at_k_exhaustive(index: DenseIndex, embeddings: np.ndarray):
+    results = recall_at_k(index, embeddings[:5], AnnType.FLAT, k=10)
+    assert results["recall@10"] == 1.0
+
+
+# Small ANN parameters for the 50 embeddings of the test index.
+ANN_PARAMS = {
+    AnnType.IVFPQ: {"nlist": 4, "m": 4, "nbits": 4, "nprobe": 4},
+    AnnType.HNSW: {"M": 8, "efConstruction": 40, "efSearch": 64},
+}
+
+
+@pytest.mark.parametrize(
+    "ann_type,min_recall", [(AnnType.IVFPQ, 0.8), (AnnType.HNSW, 1.0)]
+)
+def test_recall_at_k_ann(
+    tmp_path,
+    index: DenseIndex,
+    embeddings: np.ndarray,
+    ann_type: AnnType,
+    min_recall: float,
+):
+    pytest.importorskip("faiss")
+    index.build_ann(ann_type, ANN_PARAMS[ann_type])
+    assert os.path.exists(tmp_path / f"{ann_type.value}.faiss")
+    # Reopened, so that the saved structure is loaded.
+    results = recall_at_k(
+        DenseIndex(str(tmp_path)), embeddings[:5] + 0.1, ann_type, k=10
+    )
+    assert results["recall@10"] >= min_recall
+
+
+@pytest.mark.parametrize("ann_type", [AnnType.IVFPQ, AnnType.HNSW])
+def test_search_ann_rerank(
+    index: DenseIndex, embeddings: np.ndarray, ann_type: AnnType
+):
+    pytest.importorskip("faiss")
+    index.build_ann(ann_type, ANN_PARAMS[ann_type])
+    queries = embeddings[[3, 30]] + 0.1
+    scores, positions = index.search(queries, k=10, ann_type=ann_type)
+    assert (positions >= 0).all()
+    np.testing.assert_allclose(
+        scores,
+        np.einsum("ij,ikj->ik", queries, embeddings[positions]),
+        rtol=1e-5,
+    )
+    assert (np.diff(scores, axis=1) <= 0).all()
+    _, approximate_positions = index.search(
+        queries, k=10, ann_type=ann_type, rerank=False
+    )
+    np.testing.assert_array_equal(
+        np.sort(positions, axis=1), np.sort(approximate_positions, axis=1)
+    )
+
+
+def test_encode_collection():
+    encoder = mock.Mock()
+    encoder.encode_passages.side_effect = lambda texts: np.zeros(
+        (len(texts), _DIM)
+    )
+    passages = iter({"docno": f"d{i}", "text": f"t{i}"} for i in range(5))
+    batches = list(encode_collection(encoder, passages, batch_size=2))
+    assert [doc_ids for doc_ids, _ in batches] == [
+        ["d0", "d1"],
+        ["d2", "d3"],
+        ["d4"],
+    ]
+    encoder.encode_passages.assert_called_with(["t4"])
+
+
+def test_dense_retriever(index: DenseIndex, embeddings: np.ndarray):
+    encoder = mock.Mock()
+    encoder.encode_queries.return_value = embeddings[[3, 30]]
+    passage_loader = mock.Mock()
+    passage_loader.mget.side_effect = lambda doc_ids: [
+        None if doc_id == "d30" else f"content {doc_id}" for doc_id in doc_ids
+    ]
+    retriever = DenseRetriever(index, encoder, passage_loader)
+    rankings = retriever.batch_retrieve(
+        [Query("1_1", "first"), Query("1_2", "second")], num_results=3
+    )
+    passage_loader.mget.assert_called_once()
+    assert rankings[0].query_id == "1_1"
+    expected = np.argsort(-(embeddings[3] @ embeddings.T))[:3]
+    doc_ids, contents = rankings[0].documents()
+    assert doc_ids == [f"d{i}" for i in expected]
+    assert contents[0] == f"content d{expected[0]}"
+    assert len(rankings[1]) == 2
+    assert "d30" not in rankings[1].documents()[0]
@@ -1,4 +1,5 @@
 import os
+import time
 from typing import Callable, List
 from unittest import mock
 
@@ -37,7 +38,8 @@ class MockBM25Retriever(mock.MagicMock):
 @pytest.fixture
 def mock_retriever() -> MockBM25Retriever:
     with mock.patch(
-        "treccast.main.BM25Retriever", new_callable=MockBM25Retriever
+        "treccast.retriever.bm25_retriever.BM25Retriever",
+        new_callable=MockBM25Retriever,
     ) as mock_bm25:
         yield mock_bm25
 
@@ -80,6 +82,19 @@ def test_main_load_retriever(
     )
 
 
+@pytest.mark.parametrize("local_analyzer", [False, True])
+def test_get_retriever_unverified_analyzer(
+    mock_retriever: MockBM25Retriever,
+    default_config: confuse.Configuration,
+    local_analyzer: bool,
+):
+    default_config["es"]["local_analyzer"] = local_analyzer
+    with mock.patch("treccast.core.collection.ElasticSearchIndex") as esi:
+        main._get_retriever(default_config)
+    # Without verified index terms, queries are analyzed by Elasticsearch.
+    assert esi.call_args[1]["analyzer"] is None
+
+
 @mock.patch("treccast.main.Topic.load_queries_from_file")
 @mock.patch("treccast.main.run")
 def test_main(
@@ -107,6 +122,7 @@ def test_main(
         ranking_cache=None,
         dense_retriever=None,
         rrf=None,
+        tracer=mock.ANY,
     )
 
 
@@ -223,3 +239,27 @@ def test_run_save_to_files(
         mock.call("002 Q0 005 1 5 BM25\n"),
         mock.call("002 Q0 002 2 2 BM25\n"),
     ]
+
+
+def test_run_retrieval_hybrid_is_concurrent():
+    class SlowRetriever(mock.MagicMock):
+        def retrieve(self, query: Query, num_results: int) -> Ranking:
+            time.sleep(0.2)
+            return Ranking(query.query_id)
+
+    rrf = mock.MagicMock()
+    start = time.perf_counter()
+    main.run_retrieval(
+        sparse_query=Query("001", "sparse query"),
+        dense_query=Query("001", "dense query"),
+        k=10,
+        output_name="test",
+        retriever=SlowRetriever(),
+        dense_retriever=SlowRetriever(),
+        rrf=rrf,
+        ranking_cache=None,
+    )
+    # Both arms take 0.2s, so sequential retrieval would take at least 0.4s.
+    assert time.perf_counter() - start < 0.35
+    rankings = rrf.reciprocal_rank_fusion.call_args[0][0]
+    assert [name for name, _ in rankings] == ["test_sparse", "test_dense"]
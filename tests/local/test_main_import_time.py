@@ -0,0 +1,45 @@
+"""Guards the imports of the command line application.
+
+The import time itself is measured by the benchmark suite (see
+`tests/benchmark/test_import_time_benchmark.py`).
+"""
+
+import os
+import subprocess
+import sys
+from typing import Set
+
+import pytest
+
+# Modules that are only needed by some configurations.
+_LAZY_MODULES = [
+    "elasticsearch",
+    "nltk",
+    "pandas",
+    "pyterrier",
+    "pyterrier_ance",
+    "torch",
+    "transformers",
+    "trectools",
+]
+
+
+@pytest.fixture(scope="module")
+def imported_modules() -> Set[str]:
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, treccast.main; print('\\n'.join(sys.modules))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONPATH": os.getcwd()},
+    )
+    return set(result.stdout.splitlines())
+
+
+@pytest.mark.parametrize("module", _LAZY_MODULES)
+def test_main_does_not_import(imported_modules: Set[str], module: str):
+    assert module not in imported_modules
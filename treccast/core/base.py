@@ -1,7 +1,10 @@
-"""Query and Document classes as representation of """
+"""Query and Document classes as representation of"""
+
+from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Dict, List, Tuple
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 
 
 @dataclass
@@ -68,11 +71,135 @@ class ScoredDocument(Document):
     score: float = 0
 
 
-@dataclass
-class Context:
-    """Represents conversation context. It is a list of previous query-document
-    tuples where document is either the canonical answer or the top-ranked
-    system response.
-    """
+class _TurnNode:
+    __slots__ = ("previous", "turn")
+
+    def __init__(
+        self,
+        previous: Union[_TurnNode, Tuple[Tuple[Query, List[Document]], ...]],
+        turn: Tuple[Query, List[Document]],
+    ) -> None:
+        """Immutable node of a history shared between contexts.
 
-    history: List[Tuple[Query, List[Document]]] = field(default_factory=list)
+        Args:
+            previous: Node of the previous turn or a tuple of all previous
+              turns.
+            turn: Query-document tuple.
+        """
+        self.previous = previous
+        self.turn = turn
+
+
+class Context:
+    def __init__(
+        self, history: List[Tuple[Query, List[Document]]] = None
+    ) -> None:
+        """Represents conversation context. It is a list of previous
+        query-document tuples where document is either the canonical answer or
+        the top-ranked system response.
+
+        Contexts are persistent: `extend` returns a new context that shares all
+        previous turns with the context it was created from instead of copying
+        them, so building the contexts of a whole conversation takes linear
+        time and memory. Shared turns are immutable, hence changing the
+        history of a context does not affect contexts extended from it. The
+        full history is only materialized when the `history` attribute is
+        accessed.
+
+        Args:
+            history (optional): List of query-document tuples. Defaults to an
+              empty history.
+        """
+        self._history = [] if history is None else history
+        self._node: Optional[_TurnNode] = None
+        self._length = 0
+
+    @property
+    def history(self) -> List[Tuple[Query, List[Document]]]:
+        if self._history is None:
+            # Materialize shared turns into a list owned by this context.
+            self._history = self.last_turns()
+            self._node = None
+        return self._history
+
+    @history.setter
+    def history(self, history: List[Tuple[Query, List[Document]]]) -> None:
+        self._history = history
+        self._node = None
+
+    def __len__(self) -> int:
+        if self._history is not None:
+            return len(self._history)
+        return self._length
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Context):
+            return NotImplemented
+        return len(self) == len(other) and self.last_turns() == (
+            other.last_turns()
+        )
+
+    def __repr__(self) -> str:
+        return f"Context(history={self.last_turns()!r})"
+
+    def extend(self, query: Query, documents: List[Document]) -> Context:
+        """Returns a new context with an additional turn appended.
+
+        The new context shares its history prefix with this context. If the
+        history of this context is materialized, it is copied once into an
+        immutable snapshot.
+
+        Args:
+            query: Query of the new turn.
+            documents: Documents answering the query of the new turn.
+
+        Returns:
+            Extended context.
+        """
+        context = Context()
+        context._history = None
+        context._node = _TurnNode(
+            self._node if self._history is None else tuple(self._history),
+            (query, documents),
+        )
+        context._length = len(self) + 1
+        return context
+
+    def _iter_turns_reversed(self) -> Iterator[Tuple[Query, List[Document]]]:
+        """Iterates over turns starting from the most recent one.
+
+        Yields:
+            Query-document tuples.
+        """
+        if self._history is not None:
+            yield from reversed(self._history)
+            return
+        node = self._node
+        while isinstance(node, _TurnNode):
+            yield node.turn
+            node = node.previous
+        yield from reversed(node)
+
+    def last_turns(self, n: int = None) -> List[Tuple[Query, List[Document]]]:
+        """Returns the last n turns of the conversation.
+
+        Args:
+            n (optional): Number of turns. Defaults to None (i.e., all turns).
+
+        Returns:
+            List of query-document tuples in chronological order.
+        """
+        turns = list(islice(self._iter_turns_reversed(), n))
+        turns.reverse()
+        return turns
+
+    def last_responses(self, n: int = None) -> List[List[Document]]:
+        """Returns responses of the last n turns of the conversation.
+
+        Args:
+            n (optional): Number of turns. Defaults to None (i.e., all turns).
+
+        Returns:
+            List of documents for each turn in chronological order.
+        """
+        return [documents for _, documents in self.last_turns(n)]
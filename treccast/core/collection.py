@@ -1,9 +1,46 @@
 """Interfaces for collections."""
 
-from abc import ABC
-from typing import Any, Dict
+from abc import ABC, abstractmethod
+from array import array
+from collections import Counter, defaultdict
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
 
-from elasticsearch.client import Elasticsearch
+import numpy as np
+
+from treccast.core.base import ScoredDocument
+from treccast.core.util.analyzer import Analyzer
+
+if TYPE_CHECKING:
+    from elasticsearch.client import Elasticsearch
+
+_ESquery = Dict[str, Any]
+
+# Number of postings per block of the local inverted index.
+_BLOCK_SIZE = 128
+
+# Defaults of the Elasticsearch BM25 similarity.
+_DEFAULT_B = 0.75
+_DEFAULT_K1 = 1.2
+
+# Fields that get BM25 multi-fields with named similarities by default. Runs
+# query body (2019/2020) or catch_all (2021, see config/defaults).
+DEFAULT_BM25_FIELDS = ["body", "catch_all"]
+
+
+def get_bm25_similarity_name(b: float, k1: float) -> str:
+    """Returns name of the named BM25 similarity for given parameters.
+
+    The name is also used for the multi-field that is scored with the
+    similarity, hence it does not contain dots.
+
+    Args:
+        b: b parameter for BM25.
+        k1: k1 parameter for BM25.
+
+    Returns:
+        Similarity name, e.g., "bm25_b0_75_k11_2".
+    """
+    return f"bm25_b{b:g}_k1{k1:g}".replace(".", "_")
 
 
 class Collection(ABC):
@@ -11,10 +48,134 @@ class Collection(ABC):
         """Initializes collection (abstract) superclass."""
         pass
 
+    @abstractmethod
+    def search(
+        self, query: _ESquery, num_results: int = 1000, source: bool = True
+    ) -> List[ScoredDocument]:
+        """Performs retrieval for an Elasticsearch query.
+
+        Args:
+            query: Elasticsearch query.
+            num_results: Number of documents to return (defaults to 1000).
+            source: Whether to include document content (defaults to True).
+
+        Raises:
+            NotImplementedError: Raised if the method is not overwritten.
+
+        Returns:
+            List of scored documents.
+        """
+        raise NotImplementedError
+
+    def batch_search(
+        self,
+        queries: List[_ESquery],
+        num_results: int = 1000,
+        source: bool = True,
+    ) -> List[List[ScoredDocument]]:
+        """Performs retrieval for a list of Elasticsearch queries.
+
+        Collections served remotely may override this to send all queries in
+        a single request.
+
+        Args:
+            queries: Elasticsearch queries.
+            num_results: Number of documents to return per query (defaults to
+              1000).
+            source: Whether to include document content (defaults to True).
+
+        Returns:
+            List of scored documents for each query.
+        """
+        return [
+            self.search(query, num_results=num_results, source=source)
+            for query in queries
+        ]
+
+    @abstractmethod
+    def analyze(self, text: str, field: str = "body") -> List[str]:
+        """Parses text into a list of index terms.
+
+        Args:
+            text: String to analyze.
+            field: Field whose analyzer is used (defaults to "body").
+
+        Raises:
+            NotImplementedError: Raised if the method is not overwritten.
+
+        Returns:
+            A list of terms.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_term_vectors(
+        self, doc_ids: List[str], field: str = "body"
+    ) -> List[Dict[str, int]]:
+        """Returns term frequencies of documents.
+
+        Args:
+            doc_ids: Document IDs.
+            field: Field to get term frequencies for (defaults to "body").
+
+        Raises:
+            NotImplementedError: Raised if the method is not overwritten.
+
+        Returns:
+            List of dictionaries with terms as keys and frequencies as values,
+            parallel to doc_ids (empty for documents not in the index).
+        """
+        raise NotImplementedError
+
+    def analyze_and_get_term_vectors(
+        self, texts: List[str], doc_ids: List[str], field: str = "body"
+    ) -> Tuple[List[List[str]], List[Dict[str, int]]]:
+        """Analyzes texts and returns term frequencies of documents.
+
+        Collections served remotely may override this to combine both into a
+        single request.
+
+        Args:
+            texts: Strings to analyze.
+            doc_ids: Document IDs.
+            field: Field whose analyzer and term frequencies are used
+              (defaults to "body").
+
+        Returns:
+            Tuple with a list of terms for each text and a dictionary of term
+            frequencies for each document.
+        """
+        return (
+            [self.analyze(text, field=field) for text in texts],
+            self.get_term_vectors(doc_ids, field=field),
+        )
+
+
+class _CountingDeserializer:
+    def __init__(self, deserializer: Any) -> None:
+        """Wraps the deserializer of an Elasticsearch client to count the
+        size of responses.
+
+        Args:
+            deserializer: Deserializer of the client transport.
+        """
+        self._deserializer = deserializer
+        self.response_bytes = 0
+
+    def loads(self, s: Any, mimetype: str = None) -> Any:
+        self.response_bytes += len(
+            s.encode("utf-8") if isinstance(s, str) else s
+        )
+        return self._deserializer.loads(s, mimetype)
+
 
 class ElasticSearchIndex(Collection):
     def __init__(
-        self, index_name: str, hostname: str = "localhost:9200", **kwargs
+        self,
+        index_name: str,
+        hostname: str = "localhost:9200",
+        analyzer: Analyzer = None,
+        **kwargs,
     ) -> None:
         """Initializes an Elasticsearch instance on a given host.
 
@@ -22,38 +183,77 @@ class ElasticSearchIndex(Collection):
             index_name: Index name.
             hostname: Host name and port (defaults to
                 "localhost:9200").
+            analyzer (optional): Local analyzer emulating the analyzer of the
+              index (see `treccast.core.util.analyzer`). If provided, texts
+              are analyzed without sending requests. Defaults to None.
             **kwargs: Additional keyword arguments to be provided to the
                 Elasticsearch instance.
         """
+        # Imported here to keep the import of this module fast.
+        from elasticsearch.client import Elasticsearch
+
         super().__init__()
         self._index_name = index_name
         self._es = Elasticsearch(hostname, **kwargs)
+        self._deserializer = _CountingDeserializer(
+            self._es.transport.deserializer
+        )
+        self._es.transport.deserializer = self._deserializer
+        self._analyzer = analyzer
+        # Number of search, analyze, and term vector requests sent.
+        self.request_count = 0
 
     @property
-    def es(self) -> Elasticsearch:
+    def es(self) -> "Elasticsearch":
         return self._es
 
+    @property
+    def response_bytes(self) -> int:
+        """Total size of the responses received from Elasticsearch."""
+        return self._deserializer.response_bytes
+
     @property
     def index_name(self) -> str:
         return self._index_name
 
-    def create_index(self, use_analyzer: bool = True) -> None:
+    def create_index(
+        self,
+        use_analyzer: bool = True,
+        bm25_parameters: List[Tuple[float, float]] = None,
+        bm25_fields: List[str] = None,
+    ) -> None:
         """Create new index if it does not exist.
 
+        For each (b, k1) pair in bm25_parameters, a named BM25 similarity and
+        a multi-field of each of bm25_fields scored with it are added. These
+        allow querying with different BM25 parameters concurrently without
+        changing index settings (see `get_bm25_field()`).
 
         Args:
             use_analyzer (optional): If True, use analyser to index and search
                 documents. Defaults to True.
+            bm25_parameters (optional): List of (b, k1) pairs to create
+                additional BM25 fields for. Defaults to None.
+            bm25_fields (optional): Fields to add the BM25 multi-fields to.
+                Defaults to body and catch_all.
         """
         if not self._es.indices.exists(self._index_name):
             settings = self._get_default_settings()
+            mappings = self._get_default_mappings()
             if use_analyzer:
                 settings.update(self._get_analysis_settings())
+            if bm25_parameters:
+                self._add_bm25_fields(
+                    settings,
+                    mappings,
+                    bm25_parameters,
+                    bm25_fields or DEFAULT_BM25_FIELDS,
+                )
             self._es.indices.create(
                 self._index_name,
                 {
                     "settings": settings,
-                    "mappings": self._get_default_mappings(),
+                    "mappings": mappings,
                 },
             )
             print(
@@ -68,10 +268,245 @@ class ElasticSearchIndex(Collection):
         if self._es.indices.exists(self._index_name):
             self._es.indices.delete(self._index_name)
 
+    def search(
+        self, query: _ESquery, num_results: int = 1000, source: bool = True
+    ) -> List[ScoredDocument]:
+        """Performs retrieval for an Elasticsearch query.
+
+        Args:
+            query: Elasticsearch query.
+            num_results: Number of documents to return (defaults to 1000).
+            source: Whether to include document content (defaults to True).
+
+        Returns:
+            List of scored documents.
+        """
+        self.request_count += 1
+        res = self._es.search(
+            body={"query": query},
+            index=self._index_name,
+            _source=source,
+            size=num_results,
+        )
+        return self._get_scored_documents(res, source)
+
+    def batch_search(
+        self,
+        queries: List[_ESquery],
+        num_results: int = 1000,
+        source: bool = True,
+    ) -> List[List[ScoredDocument]]:
+        """Performs retrieval for a list of queries using a single request.
+
+        Args:
+            queries: Elasticsearch queries.
+            num_results: Number of documents to return per query (defaults to
+              1000).
+            source: Whether to include document content (defaults to True).
+
+        Raises:
+            RuntimeError: If a search fails.
+
+        Returns:
+            List of scored documents for each query.
+        """
+        if not queries:
+            return []
+        body = []
+        for query in queries:
+            body.append({})
+            body.append(
+                {"query": query, "size": num_results, "_source": source}
+            )
+        self.request_count += 1
+        responses = self._es.msearch(body=body, index=self._index_name)[
+            "responses"
+        ]
+        for response in responses:
+            if "error" in response:
+                raise RuntimeError(f"Search failed: {response['error']}")
+        return [
+            self._get_scored_documents(response, source)
+            for response in responses
+        ]
+
+    def _get_scored_documents(
+        self, response: Dict[str, Any], source: bool
+    ) -> List[ScoredDocument]:
+        """Returns scored documents of a search response.
+
+        Args:
+            response: Search response.
+            source: Whether document content was requested.
+
+        Returns:
+            List of scored documents.
+        """
+        return [
+            ScoredDocument(
+                doc_id=hit["_id"],
+                content=hit["_source"]["body"] if source else None,
+                score=hit["_score"],
+            )
+            for hit in response["hits"]["hits"]
+        ]
+
+    def analyze(self, text: str, field: str = "body") -> List[str]:
+        """Parses text into a list of tokens using the analyzer of the index
+        or its local emulation.
+
+        Args:
+            text: String to analyze.
+            field: Field whose analyzer is used (defaults to "body").
+
+        Returns:
+            A list of tokens.
+        """
+        if self._analyzer is not None:
+            return self._analyzer.analyze(text)
+        self.request_count += 1
+        return [
+            token["token"]
+            for token in self._es.indices.analyze(
+                body={"text": text, "field": field},
+                index=self._index_name,
+            )["tokens"]
+        ]
+
+    def get_term_vectors(
+        self, doc_ids: List[str], field: str = "body"
+    ) -> List[Dict[str, int]]:
+        """Returns term frequencies of documents using a single request.
+
+        Args:
+            doc_ids: Document IDs.
+            field: Field to get term frequencies for (defaults to "body").
+
+        Returns:
+            List of dictionaries with terms as keys and frequencies as values,
+            parallel to doc_ids (empty for documents not in the index).
+        """
+        if not doc_ids:
+            return []
+        return [
+            {term: stats["term_freq"] for term, stats in terms.items()}
+            for terms in self._mtermvectors({"ids": doc_ids}, field)
+        ]
+
+    def analyze_and_get_term_vectors(
+        self, texts: List[str], doc_ids: List[str], field: str = "body"
+    ) -> Tuple[List[List[str]], List[Dict[str, int]]]:
+        """Analyzes texts and returns term frequencies of documents using a
+        single request.
+
+        Texts are sent as artificial documents, for which term positions are
+        requested to restore the order of their terms, unless a local analyzer
+        is used.
+
+        Args:
+            texts: Strings to analyze.
+            doc_ids: Document IDs.
+            field: Field whose analyzer and term frequencies are used
+              (defaults to "body").
+
+        Returns:
+            Tuple with a list of terms for each text and a dictionary of term
+            frequencies for each document.
+        """
+        if self._analyzer is not None:
+            return (
+                [self._analyzer.analyze(text) for text in texts],
+                self.get_term_vectors(doc_ids, field=field),
+            )
+        if not texts and not doc_ids:
+            return [], []
+        docs = [{"_id": doc_id} for doc_id in doc_ids] + [
+            {"doc": {field: text}, "positions": True} for text in texts
+        ]
+        term_vectors = self._mtermvectors({"docs": docs}, field)
+        analyzed_texts = []
+        for terms in term_vectors[len(doc_ids) :]:
+            positions = [
+                (token["position"], term)
+                for term, stats in terms.items()
+                for token in stats["tokens"]
+            ]
+            analyzed_texts.append([term for _, term in sorted(positions)])
+        return analyzed_texts, [
+            {term: stats["term_freq"] for term, stats in terms.items()}
+            for terms in term_vectors[: len(doc_ids)]
+        ]
+
+    def _mtermvectors(
+        self, body: Dict[str, Any], field: str
+    ) -> List[Dict[str, Any]]:
+        """Sends a multi term vectors request.
+
+        Args:
+            body: Request body with document IDs or documents.
+            field: Field to get term vectors for.
+
+        Returns:
+            Term statistics for each requested document (empty for documents
+            not in the index).
+        """
+        self.request_count += 1
+        response = self._es.mtermvectors(
+            body=body,
+            index=self._index_name,
+            fields=field,
+            field_statistics=False,
+            offsets=False,
+            payloads=False,
+            positions=False,
+            term_statistics=False,
+        )
+        return [
+            doc.get("term_vectors", {}).get(field, {}).get("terms", {})
+            for doc in response["docs"]
+        ]
+
+    def get_bm25_field(
+        self, field: str, b: float = _DEFAULT_B, k1: float = _DEFAULT_K1
+    ) -> Optional[str]:
+        """Returns the field to query for BM25 scores with given parameters.
+
+        This is the field itself if the default similarity of the index uses
+        the parameters, or its multi-field with a named similarity using them
+        (see `create_index()`).
+
+        Args:
+            field: Index field.
+            b (optional): b parameter for BM25. Defaults to 0.75.
+            k1 (optional): k1 parameter for BM25. Defaults to 1.2.
+
+        Returns:
+            Field name or None if the index has no field scored with the
+            parameters.
+        """
+        if self._get_default_similarity_parameters() == (b, k1):
+            return field
+        mappings = self._es.indices.get_mapping(index=self._index_name)[
+            self._index_name
+        ]["mappings"]
+        name = get_bm25_similarity_name(b, k1)
+        multi_fields = (
+            mappings.get("properties", {}).get(field, {}).get("fields", {})
+        )
+        return f"{field}.{name}" if name in multi_fields else None
+
     def update_similarity_parameters(self, **kwargs) -> None:
         """Updates similarity metric for an existing index with a custom
         configuration. Currently only works with BM25.
+
+        As similarity settings are static, the index is closed for the update
+        (which blocks all other readers). This is skipped if the default
+        similarity already uses the given parameters.
         """
+        b = kwargs.get("b", _DEFAULT_B)
+        k1 = kwargs.get("k1", _DEFAULT_K1)
+        if self._get_default_similarity_parameters() == (b, k1):
+            return
         self._es.indices.close(self._index_name)
         self._es.indices.put_settings(
             {"index": self._get_BM25_similarity(**kwargs)},
@@ -79,6 +514,46 @@ class ElasticSearchIndex(Collection):
         )
         self._es.indices.open(self._index_name)
 
+    def _get_default_similarity_parameters(self) -> Tuple[float, float]:
+        """Returns parameters of the default BM25 similarity of the index.
+
+        Returns:
+            Tuple with b and k1.
+        """
+        settings = self._es.indices.get_settings(index=self._index_name)[
+            self._index_name
+        ]["settings"]["index"]
+        similarity = settings.get("similarity", {}).get("default", {})
+        return (
+            float(similarity.get("b", _DEFAULT_B)),
+            float(similarity.get("k1", _DEFAULT_K1)),
+        )
+
+    def _add_bm25_fields(
+        self,
+        settings: Dict[str, Any],
+        mappings: Dict[str, Any],
+        bm25_parameters: List[Tuple[float, float]],
+        fields: List[str],
+    ) -> None:
+        """Adds named BM25 similarities and multi-fields using them.
+
+        Args:
+            settings: Index settings to update.
+            mappings: Field mappings to update.
+            bm25_parameters: List of (b, k1) pairs.
+            fields: Fields to add multi-fields to.
+        """
+        similarities = settings["index"]["similarity"]
+        multi_fields = {}
+        for b, k1 in bm25_parameters:
+            name = get_bm25_similarity_name(b, k1)
+            similarities[name] = {"type": "BM25", "b": b, "k1": k1}
+            multi_fields[name] = {"type": "text", "similarity": name}
+        properties = mappings.setdefault("properties", {})
+        for field in fields:
+            properties[field] = {"type": "text", "fields": dict(multi_fields)}
+
     def _get_default_settings(self) -> Dict[str, Any]:
         """Returns default index properties. This can be overridden with custom
         properties if needed.
@@ -100,7 +575,7 @@ class ElasticSearchIndex(Collection):
         return {"_source": {"includes": ["body"]}}
 
     def _get_BM25_similarity(
-        self, b: float = 0.75, k1: float = 1.2
+        self, b: float = _DEFAULT_B, k1: float = _DEFAULT_K1
     ) -> Dict[str, Any]:
         """Get dictionary containing settings for the default similarity with
         custom configuration.
@@ -126,3 +601,667 @@ class ElasticSearchIndex(Collection):
         """
 
         return {"analysis": {}}
+
+
+class InvertedIndex(Collection):
+    def __init__(
+        self,
+        index_path: str,
+        b: float = _DEFAULT_B,
+        k1: float = _DEFAULT_K1,
+        dynamic_pruning: bool = True,
+    ) -> None:
+        """Loads a local inverted index built with `InvertedIndex.build()`.
+
+        The index is a drop-in replacement of ElasticSearchIndex for BM25
+        retrieval that does not need a running Elasticsearch instance. It
+        supports the term, match, and bool queries created by BM25Retriever
+        and scores them with Lucene's BM25 formula. BM25 parameters are
+        applied at query time, hence any number of parameterizations can be
+        used concurrently (see `get_bm25_field()`).
+
+        Args:
+            index_path: Path to the index file.
+            b (optional): Default b parameter for BM25. Defaults to 0.75.
+            k1 (optional): Default k1 parameter for BM25. Defaults to 1.2.
+            dynamic_pruning (optional): Whether top-k retrieval uses Block-Max
+              MaxScore instead of exhaustive scoring (both give the same
+              results). Defaults to True.
+        """
+        super().__init__()
+        self._index_path = index_path
+        self._similarity = (b, k1)
+        self._named_similarities: Dict[str, Tuple[float, float]] = {}
+        with np.load(index_path) as data:
+            self._analyzer = Analyzer(_split_strings(data["stopwords"]))
+            terms = _split_strings(data["terms"])
+            self._doc_ids = _split_strings(data["doc_ids"])
+            self._doc_lengths = data["doc_lengths"]
+            self._postings_offsets = data["postings_offsets"]
+            self._postings_docs = _decode_gaps(
+                data["postings_gaps"], self._postings_offsets
+            )
+            self._postings_tfs = data["postings_tfs"]
+            self._block_offsets = data["block_offsets"]
+            self._block_max_tfs = data["block_max_tfs"]
+            self._block_min_doc_lengths = data["block_min_doc_lengths"]
+            self._block_last_docs = data["block_last_docs"]
+            self._contents = data["contents"].tobytes()
+            self._content_offsets = data["content_offsets"]
+        self._term_ids = {term: i for i, term in enumerate(terms)}
+        self._doc_indices = None
+        self.dynamic_pruning = dynamic_pruning
+        self._avg_doc_length = (
+            self._doc_lengths.mean() if len(self._doc_lengths) else 1.0
+        )
+
+    @property
+    def index_name(self) -> str:
+        return self._index_path
+
+    def __len__(self) -> int:
+        return len(self._doc_ids)
+
+    @staticmethod
+    def build(
+        index_path: str,
+        documents: Iterable[Dict[str, str]],
+        analyzer: Analyzer = None,
+        field: str = "body",
+    ) -> "InvertedIndex":
+        """Builds a local inverted index and saves it to file.
+
+        Postings are stored as compressed document ID gaps and term
+        frequencies. Posting lists are split into blocks of fixed size; for
+        each block, the maximum term frequency and the minimum length of its
+        documents are stored too, which give score upper bounds for any BM25
+        parameters.
+
+        Args:
+            index_path: Path to the index file.
+            documents: Documents as generated by DataGeneratorMixin for
+              indexing, i.e., dictionaries with _id and field keys.
+            analyzer (optional): Analyzer. Defaults to Analyzer with NLTK
+              stopwords.
+            field (optional): Field to index. Defaults to "body".
+
+        Returns:
+            The built index.
+        """
+        analyzer = analyzer or Analyzer()
+        postings = defaultdict(lambda: (array("I"), array("I")))
+        doc_ids = []
+        doc_lengths = array("I")
+        contents = []
+        for doc_index, document in enumerate(documents):
+            terms = analyzer.analyze(document[field])
+            doc_ids.append(document["_id"])
+            doc_lengths.append(len(terms))
+            contents.append(document[field].encode("utf-8"))
+            for term, term_freq in Counter(terms).items():
+                docs, tfs = postings[term]
+                docs.append(doc_index)
+                tfs.append(term_freq)
+
+        terms = sorted(postings)
+        postings_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        postings_offsets[1:] = np.cumsum([len(postings[t][0]) for t in terms])
+        postings_docs = np.array(
+            [doc for term in terms for doc in postings[term][0]],
+            dtype=np.uint32,
+        )
+        postings_tfs = np.array(
+            [tf for term in terms for tf in postings[term][1]],
+            dtype=np.uint32,
+        )
+        doc_lengths = np.array(doc_lengths, dtype=np.uint32)
+        content_offsets = np.zeros(len(contents) + 1, dtype=np.int64)
+        content_offsets[1:] = np.cumsum([len(content) for content in contents])
+
+        with open(index_path, "wb") as f_out:
+            np.savez_compressed(
+                f_out,
+                stopwords=_join_strings(analyzer.stopwords),
+                terms=_join_strings(terms),
+                doc_ids=_join_strings(doc_ids),
+                doc_lengths=doc_lengths,
+                postings_offsets=postings_offsets,
+                postings_gaps=_encode_gaps(postings_docs, postings_offsets),
+                postings_tfs=postings_tfs,
+                **_get_block_statistics(
+                    postings_offsets, postings_docs, postings_tfs, doc_lengths
+                ),
+                contents=np.frombuffer(b"".join(contents), dtype=np.uint8),
+                content_offsets=content_offsets,
+            )
+        return InvertedIndex(index_path)
+
+    def analyze(self, text: str, field: str = "body") -> List[str]:
+        """Parses text into a list of index terms.
+
+        Args:
+            text: String to analyze.
+            field: Ignored, as a single field is indexed (defaults to "body").
+
+        Returns:
+            A list of terms.
+        """
+        return self._analyzer.analyze(text)
+
+    def get_content(self, doc_id: str) -> Optional[str]:
+        """Returns content of a document.
+
+        Args:
+            doc_id: Document ID.
+
+        Returns:
+            Document content or None if the document is not in the index.
+        """
+        if self._doc_indices is None:
+            self._doc_indices = {
+                doc_id: i for i, doc_id in enumerate(self._doc_ids)
+            }
+        doc_index = self._doc_indices.get(doc_id)
+        return None if doc_index is None else self._get_content(doc_index)
+
+    def get_term_vectors(
+        self, doc_ids: List[str], field: str = "body"
+    ) -> List[Dict[str, int]]:
+        """Returns term frequencies of documents.
+
+        Term frequencies are obtained by analyzing the stored contents.
+
+        Args:
+            doc_ids: Document IDs.
+            field: Ignored, as a single field is indexed (defaults to "body").
+
+        Returns:
+            List of dictionaries with terms as keys and frequencies as values,
+            parallel to doc_ids (empty for documents not in the index).
+        """
+        return [
+            dict(
+                Counter(self._analyzer.analyze(self.get_content(doc_id) or ""))
+            )
+            for doc_id in doc_ids
+        ]
+
+    def get_bm25_field(
+        self, field: str, b: float = _DEFAULT_B, k1: float = _DEFAULT_K1
+    ) -> str:
+        """Returns the field to query for BM25 scores with given parameters.
+
+        Parameters are applied at query time, hence a (virtual) multi-field
+        is available for any parameters.
+
+        Args:
+            field: Index field.
+            b (optional): b parameter for BM25. Defaults to 0.75.
+            k1 (optional): k1 parameter for BM25. Defaults to 1.2.
+
+        Returns:
+            Field name.
+        """
+        if self._similarity == (b, k1):
+            return field
+        name = get_bm25_similarity_name(b, k1)
+        self._named_similarities[name] = (b, k1)
+        return f"{field}.{name}"
+
+    def update_similarity_parameters(self, **kwargs) -> None:
+        """Updates default BM25 parameters of the index."""
+        self._similarity = (
+            kwargs.get("b", _DEFAULT_B),
+            kwargs.get("k1", _DEFAULT_K1),
+        )
+
+    def search(
+        self, query: _ESquery, num_results: int = 1000, source: bool = True
+    ) -> List[ScoredDocument]:
+        """Performs BM25 retrieval for an Elasticsearch query.
+
+        Supported are term and match queries and bool queries combining them
+        with should clauses. Boosts are applied as term weights.
+
+        Args:
+            query: Elasticsearch query.
+            num_results: Number of documents to return (defaults to 1000).
+            source: Whether to include document content (defaults to True).
+
+        Raises:
+            ValueError: If query is not supported or targets multiple fields.
+
+        Returns:
+            List of scored documents.
+        """
+        weighted_terms = defaultdict(float)
+        fields = set()
+        self._collect_weighted_terms(query, weighted_terms, fields)
+        if len(fields) > 1:
+            raise ValueError(f"Query targets multiple fields: {fields}")
+        _, _, similarity = (fields.pop() if fields else "").partition(".")
+        b, k1 = self._named_similarities.get(similarity, self._similarity)
+        docs, scores = self._get_top_k(weighted_terms, num_results, b, k1)
+        return [
+            ScoredDocument(
+                doc_id=self._doc_ids[doc],
+                content=self._get_content(doc) if source else None,
+                score=float(score),
+            )
+            for doc, score in zip(docs, scores)
+        ]
+
+    def _collect_weighted_terms(
+        self,
+        query: _ESquery,
+        weighted_terms: Dict[str, float],
+        fields: set,
+        boost: float = 1.0,
+    ) -> None:
+        """Collects terms of an Elasticsearch query with their weights.
+
+        Args:
+            query: Elasticsearch query.
+            weighted_terms: Dictionary to add weights of terms to.
+            fields: Set to add queried fields to.
+            boost (optional): Weight of the query. Defaults to 1.0.
+
+        Raises:
+            ValueError: If query is not supported.
+        """
+        query_type, body = next(iter(query.items()))
+        if query_type == "bool" and body.keys() <= {"should", "boost"}:
+            for clause in body.get("should", []):
+                self._collect_weighted_terms(
+                    clause, weighted_terms, fields, boost * body.get("boost", 1)
+                )
+        elif query_type in ("term", "match"):
+            field, params = next(iter(body.items()))
+            if not isinstance(params, dict):
+                params = {"value" if query_type == "term" else "query": params}
+            fields.add(field)
+            weight = boost * params.get("boost", 1)
+            if query_type == "term":
+                weighted_terms[params["value"]] += weight
+            else:
+                for term in self._analyzer.analyze(params["query"]):
+                    weighted_terms[term] += weight
+        else:
+            raise ValueError(f"Unsupported query: {query_type}")
+
+    def _get_top_k(
+        self, weighted_terms: Dict[str, float], k: int, b: float, k1: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the top-k documents for weighted terms.
+
+        Args:
+            weighted_terms: Dictionary of terms with weights as key-value
+              pair.
+            k: Number of documents to return.
+            b: b parameter for BM25.
+            k1: k1 parameter for BM25.
+
+        Returns:
+            Tuple with arrays of document indices and scores, ranked by
+            decreasing score (ties broken by increasing document index).
+        """
+        query_terms = [
+            (self._term_ids[term], weight)
+            for term, weight in weighted_terms.items()
+            if term in self._term_ids and weight > 0
+        ]
+        if not query_terms or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        term_ids = np.array([term_id for term_id, _ in query_terms])
+        doc_freqs = (
+            self._postings_offsets[term_ids + 1]
+            - self._postings_offsets[term_ids]
+        )
+        term_weights = np.array([weight for _, weight in query_terms]) * (
+            np.log(1 + (len(self) - doc_freqs + 0.5) / (doc_freqs + 0.5))
+        )
+        block_bounds = [
+            self._get_block_upper_bounds(term_id, term_weight, b, k1)
+            for term_id, term_weight in zip(term_ids, term_weights)
+        ]
+        # Terms are processed in decreasing order of their score upper bounds
+        # by both strategies, so that scores are summed in the same order.
+        order = np.argsort(
+            [-bounds.max() for bounds in block_bounds], kind="stable"
+        )
+        term_ids, term_weights = term_ids[order], term_weights[order]
+        if self.dynamic_pruning:
+            docs, scores = self._get_candidates_block_max(
+                term_ids,
+                term_weights,
+                [block_bounds[term] for term in order],
+                k,
+                b,
+                k1,
+            )
+        else:
+            docs, scores = self._get_candidates_exhaustive(
+                term_ids, term_weights, b, k1
+            )
+        ranked = np.lexsort((docs, -scores))[:k]
+        return docs[ranked], scores[ranked]
+
+    def _get_candidates_block_max(
+        self,
+        term_ids: np.ndarray,
+        term_weights: np.ndarray,
+        block_bounds: List[np.ndarray],
+        k: int,
+        b: float,
+        k1: float,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Scores documents that may be in the top k using Block-Max MaxScore.
+
+        Terms are processed in decreasing order of their score upper bounds,
+        while the k-th best score seen so far gives a threshold that final
+        top-k documents have to reach:
+          - Blocks of a posting list whose upper bound, together with the
+            upper bounds of the remaining terms, is below the threshold
+            cannot introduce new top-k documents; only postings of current
+            candidates are scored in them.
+          - Once this holds for whole posting lists, candidates are checked
+            against the upper bound of the block they would fall into, and
+            only the remaining ones are looked up in the posting list.
+          - Candidates that cannot reach the threshold anymore are dropped.
+        Scores of all documents that can be in the top k are exact.
+
+        Args:
+            term_ids: Term IDs, sorted by decreasing upper bound.
+            term_weights: Query weights of terms multiplied by their IDF.
+            block_bounds: Score upper bounds of the posting list blocks of
+              each term.
+            k: Number of documents to return.
+            b: b parameter for BM25.
+            k1: k1 parameter for BM25.
+
+        Returns:
+            Tuple with arrays of candidate document indices and scores.
+        """
+        upper_bounds = np.array([bounds.max() for bounds in block_bounds])
+        # Sum of upper bounds of the terms after each term.
+        remaining = np.append(np.cumsum(upper_bounds[::-1])[::-1], 0)[1:]
+
+        scores = np.zeros(len(self))
+        # Candidates are documents seen so far that have not been dropped.
+        is_candidate = np.zeros(len(self), dtype=bool)
+        candidates = np.empty(0, dtype=np.int64)
+        threshold = -np.inf
+        for term, term_id in enumerate(term_ids):
+            term_docs, term_tfs = self._get_postings(term_id)
+            # Minimum score this term needs to contribute to a new document.
+            min_score = threshold - remaining[term]
+            if upper_bounds[term] >= min_score:
+                new = np.repeat(
+                    block_bounds[term] >= min_score,
+                    self._get_block_sizes(term_id),
+                )
+                new[new] = scores[term_docs[new]] == 0
+                is_candidate[term_docs[new]] = True
+                candidates = np.sort(
+                    np.concatenate([candidates, term_docs[new]])
+                )
+                scored = is_candidate[term_docs]
+            else:
+                start, end = self._block_offsets[term_id : term_id + 2]
+                blocks = np.searchsorted(
+                    self._block_last_docs[start:end], candidates
+                )
+                candidates = self._drop_candidates(
+                    candidates,
+                    scores[candidates]
+                    + np.append(block_bounds[term], 0)[blocks]
+                    < min_score,
+                    is_candidate,
+                )
+                if len(term_docs) <= len(candidates):
+                    scored = is_candidate[term_docs]
+                else:
+                    scored = self._find_postings(term_docs, candidates)
+            scores[term_docs[scored]] += term_weights[term] * (
+                self._get_tf_norms(
+                    term_tfs[scored],
+                    self._doc_lengths[term_docs[scored]],
+                    b,
+                    k1,
+                )
+            )
+            if len(candidates) >= k:
+                candidate_scores = scores[candidates]
+                threshold = np.partition(candidate_scores, len(candidates) - k)[
+                    len(candidates) - k
+                ]
+                candidates = self._drop_candidates(
+                    candidates,
+                    candidate_scores + remaining[term] < threshold,
+                    is_candidate,
+                )
+        return candidates, scores[candidates]
+
+    def _drop_candidates(
+        self,
+        candidates: np.ndarray,
+        dropped: np.ndarray,
+        is_candidate: np.ndarray,
+    ) -> np.ndarray:
+        """Removes candidates that cannot be in the top k.
+
+        Args:
+            candidates: Candidate document indices.
+            dropped: Boolean mask of candidates to remove.
+            is_candidate: Boolean mask over all documents to update.
+
+        Returns:
+            Remaining candidates.
+        """
+        is_candidate[candidates[dropped]] = False
+        return candidates[~dropped]
+
+    def _find_postings(
+        self, term_docs: np.ndarray, docs: np.ndarray
+    ) -> np.ndarray:
+        """Looks up documents in a posting list.
+
+        Args:
+            term_docs: Document indices of the posting list.
+            docs: Document indices to look up.
+
+        Returns:
+            Indices of postings of the documents that are in the list.
+        """
+        positions = np.minimum(
+            np.searchsorted(term_docs, docs), len(term_docs) - 1
+        )
+        return positions[term_docs[positions] == docs]
+
+    def _get_candidates_exhaustive(
+        self,
+        term_ids: np.ndarray,
+        term_weights: np.ndarray,
+        b: float,
+        k1: float,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Scores all documents containing any of the terms.
+
+        Args:
+            term_ids: Term IDs.
+            term_weights: Query weights of terms multiplied by their IDF.
+            b: b parameter for BM25.
+            k1: k1 parameter for BM25.
+
+        Returns:
+            Tuple with arrays of document indices and scores.
+        """
+        postings = [self._get_postings(term_id) for term_id in term_ids]
+        docs = np.concatenate([term_docs for term_docs, _ in postings])
+        contributions = np.concatenate(
+            [
+                term_weight
+                * self._get_tf_norms(
+                    term_tfs, self._doc_lengths[term_docs], b, k1
+                )
+                for (term_docs, term_tfs), term_weight in zip(
+                    postings, term_weights
+                )
+            ]
+        )
+        scores = np.bincount(docs, weights=contributions, minlength=len(self))
+        docs = np.unique(docs)
+        return docs, scores[docs]
+
+    def _get_postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns document indices and term frequencies of a posting list."""
+        start, end = self._postings_offsets[term_id : term_id + 2]
+        return self._postings_docs[start:end], self._postings_tfs[start:end]
+
+    def _get_block_sizes(self, term_id: int) -> np.ndarray:
+        """Returns number of postings in each block of a posting list."""
+        start, end = self._postings_offsets[term_id : term_id + 2]
+        num_blocks = self._block_offsets[term_id + 1] - (
+            self._block_offsets[term_id]
+        )
+        sizes = np.full(num_blocks, _BLOCK_SIZE)
+        sizes[-1] = end - start - _BLOCK_SIZE * (num_blocks - 1)
+        return sizes
+
+    def _get_block_upper_bounds(
+        self, term_id: int, term_weight: float, b: float, k1: float
+    ) -> np.ndarray:
+        """Returns upper bounds of term scores for each block of postings.
+
+        Args:
+            term_id: Term ID.
+            term_weight: Query weight of the term multiplied by its IDF.
+            b: b parameter for BM25.
+            k1: k1 parameter for BM25.
+
+        Returns:
+            Array of upper bounds.
+        """
+        start, end = self._block_offsets[term_id : term_id + 2]
+        return term_weight * self._get_tf_norms(
+            self._block_max_tfs[start:end],
+            self._block_min_doc_lengths[start:end],
+            b,
+            k1,
+        )
+
+    def _get_tf_norms(
+        self, tfs: np.ndarray, doc_lengths: np.ndarray, b: float, k1: float
+    ) -> np.ndarray:
+        """Computes BM25 term frequency normalization.
+
+        Args:
+            tfs: Term frequencies.
+            doc_lengths: Lengths of the documents.
+            b: b parameter for BM25.
+            k1: k1 parameter for BM25.
+
+        Returns:
+            Normalized term frequencies.
+        """
+        tfs = tfs.astype(np.float64)
+        return tfs / (
+            tfs + k1 * (1 - b + b * doc_lengths / self._avg_doc_length)
+        )
+
+    def _get_content(self, doc_index: int) -> str:
+        """Returns content of a document given its index."""
+        start, end = self._content_offsets[doc_index : doc_index + 2]
+        return self._contents[start:end].decode("utf-8")
+
+
+def _get_block_statistics(
+    postings_offsets: np.ndarray,
+    postings_docs: np.ndarray,
+    postings_tfs: np.ndarray,
+    doc_lengths: np.ndarray,
+) -> Dict[str, np.ndarray]:
+    """Computes statistics of posting list blocks for score upper bounds.
+
+    Args:
+        postings_offsets: Start offsets of posting lists (and their total
+          length).
+        postings_docs: Concatenated posting lists of document indices.
+        postings_tfs: Concatenated posting lists of term frequencies.
+        doc_lengths: Document lengths.
+
+    Returns:
+        Dictionary with start offsets of the blocks of each posting list, and
+        maximum term frequency, minimum document length, and last document
+        index of each block.
+    """
+    list_lengths = np.diff(postings_offsets)
+    num_blocks = (list_lengths + _BLOCK_SIZE - 1) // _BLOCK_SIZE
+    block_offsets = np.zeros(len(num_blocks) + 1, dtype=np.int64)
+    block_offsets[1:] = np.cumsum(num_blocks)
+    if block_offsets[-1] == 0:
+        return {
+            "block_offsets": block_offsets,
+            "block_max_tfs": postings_tfs,
+            "block_min_doc_lengths": postings_tfs,
+            "block_last_docs": postings_docs,
+        }
+    # Position of each block within its posting list.
+    block_ranks = np.arange(block_offsets[-1]) - np.repeat(
+        block_offsets[:-1], num_blocks
+    )
+    block_starts = (
+        np.repeat(postings_offsets[:-1], num_blocks) + _BLOCK_SIZE * block_ranks
+    )
+    block_ends = np.append(block_starts[1:], len(postings_docs))
+    return {
+        "block_offsets": block_offsets,
+        "block_max_tfs": np.maximum.reduceat(postings_tfs, block_starts),
+        "block_min_doc_lengths": np.minimum.reduceat(
+            doc_lengths[postings_docs], block_starts
+        ),
+        "block_last_docs": postings_docs[block_ends - 1],
+    }
+
+
+def _join_strings(strings: Iterable[str]) -> np.ndarray:
+    """Encodes newline-free strings into a byte array."""
+    return np.frombuffer("\n".join(strings).encode("utf-8"), dtype=np.uint8)
+
+
+def _split_strings(data: np.ndarray) -> List[str]:
+    """Decodes strings encoded with `_join_strings()`."""
+    return data.tobytes().decode("utf-8").split("\n") if len(data) else []
+
+
+def _encode_gaps(docs: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Delta-encodes posting lists for compression.
+
+    Args:
+        docs: Concatenated posting lists with increasing document indices.
+        offsets: Start offsets of posting lists (and their total length).
+
+    Returns:
+        Document index gaps, where the first entry of each list is absolute.
+    """
+    gaps = docs.copy()
+    gaps[1:] -= docs[:-1]
+    starts = offsets[:-1][offsets[:-1] < len(docs)]
+    gaps[starts] = docs[starts]
+    return gaps
+
+
+def _decode_gaps(gaps: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Decodes posting lists encoded with `_encode_gaps()`.
+
+    Args:
+        gaps: Document index gaps.
+        offsets: Start offsets of posting lists (and their total length).
+
+    Returns:
+        Concatenated posting lists of document indices.
+    """
+    sums = np.cumsum(gaps, dtype=np.int64)
+    list_bases = np.append(0, sums)[offsets[:-1]]
+    return sums - np.repeat(list_bases, np.diff(offsets))
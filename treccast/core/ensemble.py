@@ -4,9 +4,11 @@ retrievers
 
 import argparse
 import csv
+import itertools
 import os
 from collections import Counter
-from typing import List
+from operator import itemgetter
+from typing import Iterator, List, Tuple
 
 import confuse
 
@@ -21,6 +23,10 @@ class Ensemble:
         Optionally allows for a per-method threshold for number of documents
         considered.
 
+        The tsv files are read once in parallel, one query at a time, hence
+        each file must list the passages of a query consecutively and the
+        queries in the same order (as written by the first-pass retrievers).
+
         Args:
             filepaths: List of the tsv output file paths generated by first-pass
                 retrieval methods to create an ensemble of.
@@ -32,53 +38,61 @@ class Ensemble:
         self.rank_thresholds = rank_thresholds
         self.combined_rankings = []
 
-    def _select_rankings(
-        self, rankings: List[List[str]], threshold: int
-    ) -> List[List[str]]:
-        """Selects the number of passages defined by the threshold parameter
-        for each query.
+    def _read_rankings(
+        self, filepath: str, threshold: int = None
+    ) -> Iterator[Tuple[str, Iterator[List[str]]]]:
+        """Reads the rankings of a tsv file one query at a time.
 
         Args:
-            rankings: List of the passages for retrieved by a model, each a list
-                containing query_id, query, passage_id, and passage.
-            threshold (int): Maximum number of passages to select per query.
+            filepath: Path to the tsv output file of a retrieval model.
+            threshold (optional): Maximum number of passages to select per
+              query. Defaults to None (all passages).
 
-        Returns:
-            Selected passages for all queries with a maximum number of passages
-                per query defined by threshold.
+        Yields:
+            Query ID and its passages, each a list containing query_id, query,
+            passage_id, and passage.
         """
-        seen_queries = {}
-        selected = []
-        for ranking in rankings:
-            query_id = ranking[0]
-            if seen_queries.get(query_id, 0) < threshold:
-                seen_queries[query_id] = seen_queries.get(query_id, 0) + 1
-                selected.append(ranking)
-        return selected
-
-    def _get_rankings(self) -> List[str]:
-        """Reads all files from the file paths provided to the Ensemble class
-        constructor.
-
-        Returns:
-            List containing a list for each ranking read from the tsv output
-                file for each retrieval model.
+        with open(filepath, "r") as f:
+            read_tsv = csv.reader(f, delimiter="\t")
+            next(read_tsv, None)
+            for query_id, rows in itertools.groupby(
+                read_tsv, key=itemgetter(0)
+            ):
+                yield query_id, itertools.islice(rows, threshold)
+
+    def iter_combined_rankings(self) -> Iterator[List[str]]:
+        """Combines the rankings of all files, one query at a time.
+
+        Passages of a query are deduplicated on passage ID, keeping the order
+        in which they are first seen (i.e., by model, then by rank).
+
+        Raises:
+            ValueError: If the files do not list the same queries in the same
+              order.
+
+        Yields:
+            Passages of the ensemble, each a list containing query_id, query,
+            passage_id, and passage.
         """
-        rankings = []
-        for i, filepath in enumerate(self.filepaths):
-            with open(filepath, "r") as f:
-                read_tsv = csv.reader(f, delimiter="\t")
-                next(read_tsv)
-                if self.rank_thresholds is None:
-                    rankings.append(list(read_tsv))
-                else:
-                    rankings.append(
-                        self._select_rankings(
-                            list(read_tsv), self.rank_thresholds[i]
-                        )
-                    )
-
-        return rankings
+        readers = [
+            self._read_rankings(
+                filepath,
+                self.rank_thresholds[i] if self.rank_thresholds else None,
+            )
+            for i, filepath in enumerate(self.filepaths)
+        ]
+        for queries in itertools.zip_longest(*readers):
+            query_ids = {query[0] if query else None for query in queries}
+            if len(query_ids) > 1:
+                raise ValueError(
+                    f"Rankings are not aligned by query: {sorted(query_ids)}"
+                )
+            seen_passages = set()
+            for _, rows in queries:
+                for row in rows:
+                    if row[2] not in seen_passages:
+                        seen_passages.add(row[2])
+                        yield row
 
     def combine_rankings(self) -> List[List[str]]:
         """Combines all rankings read from the file paths into a single ranking.
@@ -89,27 +103,28 @@ class Ensemble:
         Returns:
             List of the combined retrieval models; the ensemble output.
         """
-        rankings = self._get_rankings()
-        flattened_rankings = [item for sublist in rankings for item in sublist]
-        flattened_rankings.sort()
-        removed_duplicates_set = set(map(tuple, flattened_rankings))
-        removed_duplicates = list(map(list, removed_duplicates_set))
-        removed_duplicates.sort(key=flattened_rankings.index)
-        self.combined_rankings = removed_duplicates
-        counts = Counter(sublist[0] for sublist in removed_duplicates)
+        self.combined_rankings = list(self.iter_combined_rankings())
+        counts = Counter(row[0] for row in self.combined_rankings)
         print("Counts for each query: {}".format(counts))
         return self.combined_rankings
 
     def write_to_tsv(self, path: str) -> None:
         """Writes the results of the ensemble method to a file in tsv format.
 
+        Rankings are combined while writing, unless `combine_rankings()` was
+        called before.
+
         Args:
             path: Filepath to the resulting output file.
         """
+        counts = Counter()
         with open(path, "w") as f_out:
             tsv_writer = csv.writer(f_out, delimiter="\t")
             tsv_writer.writerow(["query_id", "query", "passage_id", "passage"])
-            tsv_writer.writerows(self.combined_rows)
+            for row in self.combined_rankings or self.iter_combined_rankings():
+                counts[row[0]] += 1
+                tsv_writer.writerow(row)
+        print("Counts for each query: {}".format(counts))
 
 
 if __name__ == "__main__":
@@ -129,5 +144,4 @@ if __name__ == "__main__":
     thresholds = config["thresholds"].get()
     output_path = config["output_file"].get()
     ensemble = Ensemble(input_paths, thresholds)
-    ensemble.combine_rankings()
     ensemble.write_to_tsv(output_path)
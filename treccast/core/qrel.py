@@ -2,14 +2,21 @@
 
 from __future__ import annotations
 
-import csv
+from itertools import repeat
 from typing import Dict, List
-from collections import defaultdict
+
+import numpy as np
 
 from treccast.core.util.passage_loader import PassageLoader
 
+# Graded relevance level at which a document is considered relevant. This
+# corresponds to the `-l2` option of trec_eval.
+_RELEVANCE_THRESHOLD = 2
+
 
-def binarize_relevance(rel: float, threshold: int = 2) -> int:
+def binarize_relevance(
+    rel: float, threshold: int = _RELEVANCE_THRESHOLD
+) -> int:
     """Turns 0-4 relevance label into a binary relevance label (0/1).
 
     Args:
@@ -23,25 +30,41 @@ def binarize_relevance(rel: float, threshold: int = 2) -> int:
 
 
 class Qrel:
-    def __init__(self, query_id: str) -> None:
+    def __init__(
+        self, query_id: str, threshold: int = _RELEVANCE_THRESHOLD
+    ) -> None:
         """Instantiates a Qrel object using the query_id and a list of judged
         documents.
 
-        Documents are stored unordered with each relevance level.
+        Graded relevance labels are stored per document ID, which allows for
+        constant time relevance lookups. NumPy arrays of the judgments are
+        built lazily for bulk operations.
 
         Args:
             query_id: Unique ID for the query.
+            threshold (optional): Graded relevance level at which documents
+              are considered relevant when binarizing. Defaults to 2.
         """
         self._query_id = query_id
-        self._judged_docs = defaultdict(list)
+        self._threshold = threshold
+        self._relevance: Dict[str, int] = {}
+        self._contents: Dict[str, str] = {}
+        self._arrays = None
 
     def __len__(self):
-        return len(self._judged_docs)
+        return len(self._relevance)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._relevance
 
     @property
     def query_id(self) -> str:
         return self._query_id
 
+    @property
+    def threshold(self) -> int:
+        return self._threshold
+
     def documents(self) -> Dict[str, str]:
         """Returns documents and their contents.
 
@@ -49,58 +72,175 @@ class Qrel:
             Dictionary with doc_id as key and content as value.
         """
         return {
-            doc["doc_id"]: doc.get("content")
-            for docs in self._judged_docs.values()
-            for doc in docs
+            doc_id: self._contents.get(doc_id) for doc_id in self._relevance
         }
 
     def add_doc(self, doc_id: str, rel: int, doc_content: str = None) -> None:
         """Adds a new document to the Qrel.
 
-        Note: it doesn't check whether the document is already present.
+        If the document is already present, its judgment is overwritten.
 
         Args:
             doc_id: Document ID.
-            rel: The relevance label of the doc.
+            rel: The graded relevance label of the doc.
             doc_content (optional): String content of the document.
         """
-        self._judged_docs[rel].append(
-            {"doc_id": doc_id, "rel": rel, "content": doc_content}
+        self._relevance[doc_id] = rel
+        if doc_content is not None:
+            self._contents[doc_id] = doc_content
+        self._arrays = None
+
+    def get_relevance(self, doc_id: str, binarized: bool = False) -> int:
+        """Returns relevance of a document. Unjudged documents are considered
+        non-relevant.
+
+        Args:
+            doc_id: Document ID.
+            binarized (optional): If true, returns binary relevance label.
+              Defaults to False.
+
+        Returns:
+            Relevance label of the document.
+        """
+        rel = self._relevance.get(doc_id, 0)
+        return binarize_relevance(rel, self._threshold) if binarized else rel
+
+    def get_relevances(
+        self, doc_ids: List[str], binarized: bool = False
+    ) -> np.ndarray:
+        """Returns relevance labels for a list of documents (e.g., a ranking).
+
+        Args:
+            doc_ids: Document IDs.
+            binarized (optional): If true, returns binary relevance labels.
+              Defaults to False.
+
+        Returns:
+            Array of relevance labels parallel to doc_ids.
+        """
+        rels = np.fromiter(
+            map(self._relevance.get, doc_ids, repeat(0, len(doc_ids))),
+            dtype=np.int64,
+            count=len(doc_ids),
         )
+        if binarized:
+            return (rels >= self._threshold).astype(np.int64)
+        return rels
+
+    def doc_ids(self) -> np.ndarray:
+        """Returns IDs of all judged documents.
+
+        Returns:
+            Array of document IDs parallel to `relevances()`.
+        """
+        return self._get_arrays()[0]
+
+    def relevances(self, binarized: bool = False) -> np.ndarray:
+        """Returns relevance labels of all judged documents.
 
-    def get_docs(self, rel: int = None) -> List[Dict]:
+        Args:
+            binarized (optional): If true, returns binary relevance labels.
+              Defaults to False.
+
+        Returns:
+            Array of relevance labels parallel to `doc_ids()`.
+        """
+        rels = self._get_arrays()[1]
+        if binarized:
+            return (rels >= self._threshold).astype(np.int64)
+        return rels
+
+    def get_docs(self, rel: int = None, binarized: bool = True) -> List[Dict]:
         """Fetches the docs with specified relevance label.
 
+        For compatibility with binarized qrels, rel is matched against
+        binarized labels by default, and a falsy rel (None or 0) fetches all
+        docs.
+
         Args:
-            rel: Level of relevance to fetch docs from.
+            rel (optional): Level of relevance to fetch docs from. If None or
+              0, all judged docs are returned. Defaults to None.
+            binarized (optional): If true, rel is matched against binarized
+              relevance labels, otherwise against graded ones. Defaults to
+              True.
 
         Returns:
-            Unordered list of dictionaries with doc_id, score, and (optional)
-                content fields.
+            Unordered list of dictionaries with doc_id, rel, and (optional)
+                content fields. The rel field holds the binarized label, or
+                the graded one if binarized is False.
         """
-        if rel:
-            return self._judged_docs[rel]
-        return [doc for docs in self._judged_docs.values() for doc in docs]
+        docs = []
+        for doc_id, doc_rel in self._relevance.items():
+            if binarized:
+                doc_rel = binarize_relevance(doc_rel, self._threshold)
+            if rel and doc_rel != rel:
+                continue
+            docs.append(
+                {
+                    "doc_id": doc_id,
+                    "rel": doc_rel,
+                    "content": self._contents.get(doc_id),
+                }
+            )
+        return docs
+
+    def _get_arrays(self):
+        """Builds (and caches) arrays of judged document IDs and labels."""
+        if self._arrays is None:
+            self._arrays = (
+                np.array(list(self._relevance.keys()), dtype=object),
+                np.fromiter(
+                    self._relevance.values(),
+                    dtype=np.int64,
+                    count=len(self._relevance),
+                ),
+            )
+        return self._arrays
 
     @staticmethod
     def load_qrels_from_file(
-        filepath: str, ploader: PassageLoader = None
-    ) -> Dict[Qrel]:
+        filepath: str,
+        ploader: PassageLoader = None,
+        threshold: int = _RELEVANCE_THRESHOLD,
+    ) -> Dict[str, Qrel]:
         """Loads Qrels from TREC qrels file.
 
+        Graded relevance labels are kept; binarized labels are derived using
+        threshold. Passage contents, if requested, are fetched with a single
+        bulk request.
+
         Args:
             filepath: Path to TREC reqls file.
             ploader: PassageLoader that can retrieve passage content.
+            threshold (optional): Graded relevance level at which documents
+              are considered relevant. Defaults to 2.
 
         Returns:
             Dictionary of Qrel objects with query ID as key.
         """
         qrels = {}
         with open(filepath, "r") as f_in:
-            for q_id, _, doc_id, rel in csv.reader(f_in, delimiter=" "):
-                rel = binarize_relevance(int(rel))
+            for line in f_in:
+                fields = line.split()
+                if not fields:
+                    continue
+                q_id, _, doc_id, rel = fields
                 if q_id not in qrels:
-                    qrels[q_id] = Qrel(query_id=q_id)
-                passage = ploader.get(doc_id=doc_id) if ploader else None
-                qrels[q_id].add_doc(doc_id, rel, passage)
+                    qrels[q_id] = Qrel(query_id=q_id, threshold=threshold)
+                qrels[q_id].add_doc(doc_id, int(rel))
+
+        if ploader:
+            doc_ids = list(
+                {
+                    doc_id
+                    for qrel in qrels.values()
+                    for doc_id in qrel.documents()
+                }
+            )
+            passages = dict(zip(doc_ids, ploader.mget(doc_ids)))
+            for qrel in qrels.values():
+                for doc_id in qrel.documents():
+                    qrel.add_doc(
+                        doc_id, qrel.get_relevance(doc_id), passages[doc_id]
+                    )
         return qrels
@@ -50,6 +50,14 @@ class Ranking:
             [doc.content for doc in self._scored_docs],
         )
 
+    def scores(self) -> List[float]:
+        """Returns document scores.
+
+        Returns:
+            List of scores parallel to the document IDs from `documents()`.
+        """
+        return [doc.score for doc in self._scored_docs]
+
     def add_doc(self, doc: ScoredDocument) -> None:
         """Adds a new document to the ranking.
 
@@ -76,7 +84,7 @@ class Ranking:
         Args:
             docs: List of scored documents.
         """
-        doc_ids, _ = self.documents()
+        doc_ids = {doc.doc_id for doc in self._scored_docs}
         self._scored_docs.extend(
             [doc for doc in docs if doc.doc_id not in doc_ids]
         )
@@ -5,13 +5,19 @@ of a Question and Context.
 from __future__ import annotations
 
 import argparse
+import copy
 import json
-from dataclasses import dataclass
+from collections import defaultdict
+from dataclasses import dataclass, field
 from enum import Enum
-from typing import List, Tuple, Union
+from functools import lru_cache
+from typing import Any, Dict, List, Set, Tuple, Union
 
 from treccast.core.base import Context, Document, Query
-from treccast.core.util.passage_loader import PassageLoader
+from treccast.core.util.passage_loader import (
+    DEFAULT_MGET_BATCH_SIZE,
+    PassageLoader,
+)
 
 
 class QueryRewrite(Enum):
@@ -107,6 +113,10 @@ class Topic:
     description: str
     title: str
     turns: List[Turn]
+    _turns_by_id: Dict[str, Turn] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._turns_by_id = {turn.turn_id: turn for turn in self.turns}
 
     def get_turn(self, turn_id: str) -> Turn:
         """Returns a given topic turn.
@@ -120,9 +130,9 @@ class Topic:
         Returns:
             Turn instance.
         """
-        if turn_id not in [turn.turn_id for turn in self.turns]:
+        if turn_id not in self._turns_by_id:
             raise IndexError(f"Invalid turn_id: {turn_id}")
-        return next(turn for turn in self.turns if turn.turn_id == turn_id)
+        return self._turns_by_id[turn_id]
 
     def get_query_id(self, turn_id: str) -> str:
         """Returns query ID corresponding to a given topic turn.
@@ -167,7 +177,11 @@ class Topic:
             List of Query objects.
         """
         return [
-            self.get_query(turn.turn_id, query_rewrite) for turn in self.turns
+            Query(
+                self.get_query_id(turn.turn_id),
+                turn.get_utterance(query_rewrite),
+            )
+            for turn in self.turns
         ]
 
     def get_contexts(
@@ -192,17 +206,13 @@ class Topic:
         """
         queries = self.get_queries(query_rewrite)[:-1]
         canonical_responses = [
-            turn.get_passage_content(use_answer_rewrite)
-            for turn in self.turns
+            turn.get_passage_content(use_answer_rewrite) for turn in self.turns
         ][:-1]
         contexts = [None]
+        context = Context()
         for query, canonical_response in zip(queries, canonical_responses):
-            context = Context()
-            context.history = (
-                contexts[-1].history.copy() if len(contexts) > 1 else []
-            )
-            context.history.append(
-                (query, [Document(None, canonical_response)])
+            context = context.extend(
+                query, [Document(None, canonical_response)]
             )
             contexts.append(context)
         return contexts
@@ -241,6 +251,10 @@ class Topic:
     ) -> List[Topic]:
         """Creates a list of Topic objects from JSON file.
 
+        Topics are parsed only once per process for each combination of
+        year, query rewrite and file version; each call returns copies of the
+        cached Topic objects, which callers may modify.
+
         Args:
             year: Year.
             query_rewrite (optional): Query rewrite variant to load
@@ -251,13 +265,27 @@ class Topic:
         Returns:
             Extracted Topics.
         """
-        with open(
-            Topic.get_filepath(year, query_rewrite, use_extended),
-            "r",
-            encoding="utf8",
-        ) as f_in:
-            raw_topics = json.load(f_in)
+        return list(
+            copy.deepcopy(_load_topics(year, query_rewrite, use_extended))
+        )
+
+    @staticmethod
+    def parse_topics(
+        raw_topics: List[Dict[str, Any]],
+        year: str,
+        query_rewrite: QueryRewrite = None,
+    ) -> List[Topic]:
+        """Creates a list of Topic objects from parsed topic JSON.
+
+        Args:
+            raw_topics: Topics as loaded from a topic JSON file.
+            year: Year.
+            query_rewrite (optional): Query rewrite variant to load
+              (auto/manual). Defaults to None (i.e., raw).
 
+        Returns:
+            Extracted Topics.
+        """
         topics = []
         for raw_topic in raw_topics:
             topic_id = raw_topic.get("number")  # int
@@ -281,9 +309,11 @@ class Topic:
                         "result_turn_dependence"
                     ),
                     query_turn_dependence=raw_turn.get("query_turn_dependence"),
-                    raw_utterance=raw_turn.get("utterance")
-                    if raw_turn.get("raw_utterance") is None
-                    else raw_turn.get("raw_utterance"),
+                    raw_utterance=(
+                        raw_turn.get("utterance")
+                        if raw_turn.get("raw_utterance") is None
+                        else raw_turn.get("raw_utterance")
+                    ),
                     automatic_rewritten_utterance=raw_turn.get(
                         "automatic_rewritten_utterance"
                     ),
@@ -292,14 +322,18 @@ class Topic:
                     ),
                     passage_id=raw_turn.get("passage_id"),
                     response=raw_turn.get("response"),
-                    provenance=[
-                        provenance + "-1"
-                        if "-" not in provenance and len(provenance) > 0
-                        else provenance
-                        for provenance in raw_turn.get("provenance")
-                    ]
-                    if "provenance" in raw_turn
-                    else raw_turn.get("provenance"),
+                    provenance=(
+                        [
+                            (
+                                provenance + "-1"
+                                if "-" not in provenance and len(provenance) > 0
+                                else provenance
+                            )
+                            for provenance in raw_turn.get("provenance")
+                        ]
+                        if "provenance" in raw_turn
+                        else raw_turn.get("provenance")
+                    ),
                     passage=raw_turn.get("passage"),
                     canonical_passage=raw_turn.get("canonical_passage"),
                     provenance_passages=raw_turn.get("provenance_passages"),
@@ -325,7 +359,7 @@ class Topic:
         """
         return [
             query
-            for topic in Topic.load_topics_from_file(year, query_rewrite)
+            for topic in _load_topics(year, query_rewrite, True)
             for query in topic.get_queries(query_rewrite)
         ]
 
@@ -363,7 +397,7 @@ class Topic:
                     )
                 ],
             )
-            for topic in Topic.load_topics_from_file(year, query_rewrite)
+            for topic in _load_topics(year, query_rewrite, True)
             for turn in topic.turns
         ]
 
@@ -388,13 +422,38 @@ class Topic:
         """
         return [
             context
-            for topic in Topic.load_topics_from_file(year, query_rewrite)
+            for topic in _load_topics(year, query_rewrite, True)
             for context in topic.get_contexts(
                 year, query_rewrite, use_answer_rewrite
             )
         ]
 
 
+@lru_cache(maxsize=None)
+def _load_topics(
+    year: str, query_rewrite: QueryRewrite = None, use_extended: bool = True
+) -> Tuple[Topic, ...]:
+    """Loads topics from JSON file and caches them.
+
+    Args:
+        year: Year.
+        query_rewrite (optional): Query rewrite variant to load (auto/manual).
+          Defaults to None (i.e., raw).
+        use_extended (optional): If true, uses extended topic file version.
+          Defaults to True.
+
+    Returns:
+        Tuple of extracted Topics.
+    """
+    with open(
+        Topic.get_filepath(year, query_rewrite, use_extended),
+        "r",
+        encoding="utf8",
+    ) as f_in:
+        raw_topics = json.load(f_in)
+    return tuple(Topic.parse_topics(raw_topics, year, query_rewrite))
+
+
 def parse_args() -> argparse.Namespace:
     """Defines accepted arguments and returns the parsed values.
 
@@ -410,6 +469,105 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
+def extend_with_passages(
+    host_name: str,
+    index_names: Dict[str, str],
+    query_rewrites: List[QueryRewrite] = None,
+    batch_size: int = DEFAULT_MGET_BATCH_SIZE,
+) -> None:
+    """Extends turns with canonical and provenance passages in bulk.
+
+    Each topic file is parsed once and the passage IDs of all years and query
+    rewrite variants are collected up front. Passages are then fetched with
+    chunked mget requests (one pass per index) and all extended topics are
+    stored to json files of the same name with "_extended" added to the end.
+
+    Args:
+        host_name: Elasticsearch hostname.
+        index_names: Elasticsearch index to use for passage retrieval, with
+          year as key.
+        query_rewrites (optional): Query rewrite variants to extend. Defaults
+          to automatic and manual.
+        batch_size (optional): Maximum number of IDs per mget request.
+          Defaults to 1000.
+    """
+    if query_rewrites is None:
+        query_rewrites = [QueryRewrite.AUTOMATIC, QueryRewrite.MANUAL]
+
+    # Load original topics and collect passage IDs per index.
+    topic_files = []
+    passage_ids = defaultdict(set)
+    for year, index_name in index_names.items():
+        for query_rewrite in query_rewrites:
+            filepath = Topic.get_filepath(
+                year, query_rewrite, use_extended=False
+            )
+            with open(filepath, "r", encoding="utf8") as f_in:
+                raw_topics = json.load(f_in)
+            topics = Topic.parse_topics(raw_topics, year, query_rewrite)
+            topic_files.append((filepath, index_name, raw_topics, topics))
+            passage_ids[index_name].update(_get_passage_ids(topics))
+
+    # Fetch all passages, one index at a time.
+    passages = {}
+    for index_name, doc_ids in passage_ids.items():
+        doc_ids = sorted(doc_ids)
+        passage_loader = PassageLoader(host_name, index_name)
+        passages[index_name] = dict(
+            zip(doc_ids, passage_loader.mget(doc_ids, batch_size))
+        )
+
+    # Extend turns with passages and save extended topics.
+    for filepath, index_name, raw_topics, topics in topic_files:
+        for topic, raw_topic in zip(topics, raw_topics):
+            for turn, raw_turn in zip(topic.turns, raw_topic["turn"]):
+                _extend_raw_turn(raw_turn, turn, passages[index_name])
+
+        with open(
+            f"{filepath.split('.json')[0]}_extended.json", "w", encoding="utf8"
+        ) as f_out:
+            json.dump(raw_topics, f_out)
+
+    # Extended topic files changed, drop any cached versions.
+    _load_topics.cache_clear()
+
+
+def _get_passage_ids(topics: List[Topic]) -> Set[str]:
+    """Returns IDs of canonical and provenance passages of all turns.
+
+    Args:
+        topics: List of topics.
+
+    Returns:
+        Set of (non-empty) passage IDs.
+    """
+    passage_ids = set()
+    for topic in topics:
+        for turn in topic.turns:
+            passage_ids.add(turn.canonical_result_id)
+            passage_ids.update(turn.provenance or [])
+    passage_ids.discard(None)
+    passage_ids.discard("")
+    return passage_ids
+
+
+def _extend_raw_turn(
+    raw_turn: Dict[str, Any], turn: Turn, passages: Dict[str, str]
+) -> None:
+    """Adds canonical passage and provenance passages to a raw turn.
+
+    Args:
+        raw_turn: Turn as loaded from a topic JSON file (updated in place).
+        turn: Turn parsed from raw_turn.
+        passages: Passage contents with passage ID as key.
+    """
+    raw_turn["canonical_passage"] = passages.get(turn.canonical_result_id)
+    if turn.provenance is not None:
+        raw_turn["provenance_passages"] = [
+            passages.get(provenance) for provenance in turn.provenance
+        ]
+
+
 def extend_with_canonical_passages(
     host_name: str,
     index_name: str,
@@ -419,7 +577,8 @@ def extend_with_canonical_passages(
     """Extends turns with canonical passages.
 
     Stores extended topics to the json file of the same name with "_extended"
-    added to the end.
+    added to the end. See `extend_with_passages` for extending several years
+    and query rewrite variants at once.
 
     Args:
         host_name: Elasticsearch hostname.
@@ -427,40 +586,15 @@ def extend_with_canonical_passages(
         year: Year for which to extend the topic file.
         query_rewrite (optional): Type of query rewrite. Defaults to None.
     """
-    passage_loader = PassageLoader(host_name, index_name)
-    filepath = Topic.get_filepath(year, query_rewrite, use_extended=False)
-
-    # load original topics
-    with open(filepath, "r", encoding="utf8") as f_in:
-        raw_topics = json.load(f_in)
-
-    # extend turns with canonical answers
-    for i, topic in enumerate(
-        Topic.load_topics_from_file(year, query_rewrite, use_extended=False)
-    ):
-        for turn, raw_turn in zip(topic.turns, raw_topics[i]["turn"]):
-            raw_turn["canonical_passage"] = passage_loader.get(
-                turn.canonical_result_id
-            )
-
-    # save extended topics
-    with open(
-        f"{filepath.split('.json')[0]}_extended.json", "w", encoding="utf8"
-    ) as f_out:
-        json.dump(raw_topics, f_out)
+    extend_with_passages(host_name, {year: index_name}, [query_rewrite])
 
 
 if __name__ == "__main__":
     args = parse_args()
-    opts = {
-        "2020": "ms_marco_trec_car_clean",
-        "2021": "ms_marco_kilt_wapo_clean",
-    }
-    for year, index_name in opts.items():
-        for query_rewrite in [
-            QueryRewrite.AUTOMATIC,
-            QueryRewrite.MANUAL,
-        ]:
-            extend_with_canonical_passages(
-                args.hostname, index_name, year, query_rewrite
-            )
+    extend_with_passages(
+        args.hostname,
+        {
+            "2020": "ms_marco_trec_car_clean",
+            "2021": "ms_marco_kilt_wapo_clean",
+        },
+    )
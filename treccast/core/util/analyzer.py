@@ -0,0 +1,348 @@
+"""Local text analysis mirroring the Elasticsearch analyzer of our indices.
+
+The indices are built with the standard tokenizer followed by lowercasing,
+removal of NLTK English stopwords, and KStemming (see
+`treccast.indexer.indexer.Indexer`). This module approximates that chain in
+pure Python so that documents and queries can be analyzed without a running
+Elasticsearch instance.
+
+KStem relies on a dictionary and is only approximated by removing plural
+inflection. The verification mode compares the local analysis with that of
+an index on a sample of texts and saves the terms of words that are analyzed
+differently, which are then used instead of the local rules.
+
+Usage:
+    $ python -m treccast.core.util.analyzer \
+        --index_name ms_marco_kilt_wapo_clean --year 2021 \
+        --output data/analyzer/ms_marco_kilt_wapo_clean.json
+"""
+
+import argparse
+import json
+import re
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, Iterable, List, Tuple
+
+if TYPE_CHECKING:
+    from treccast.core.collection import ElasticSearchIndex
+
+# Characters that are tokenized individually (Han ideographs and Hiragana).
+_IDEOGRAPHS = "\u3040-\u309f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+
+# Approximation of the Unicode word boundary rules of the standard tokenizer:
+# word characters form a token, which is not broken by a single separator
+# between letters (e.g., "u.s", "don't", "foo:bar") or between digits (e.g.,
+# "3.14", "1,000").
+_TOKEN_PATTERN = re.compile(
+    rf"[{_IDEOGRAPHS}]"
+    rf"|[^\W{_IDEOGRAPHS}]+"
+    r"(?:(?:(?<=[^\W\d_])[:.'\u2018\u2019\u00b7](?=[^\W\d_])"
+    r"|(?<=\d)[,.;'\u2018\u2019](?=\d))"
+    rf"[^\W{_IDEOGRAPHS}]+)*"
+)
+
+# Tokens longer than this are split by the standard tokenizer.
+_MAX_TOKEN_LENGTH = 255
+
+# KStem leaves words of this length or longer unchanged.
+_MAX_STEM_LENGTH = 50
+
+# Suffixes of plural forms that are removed with the trailing "es".
+_ES_SUFFIXES = ("sses", "shes", "ches", "xes", "zes")
+
+
+def get_default_stopwords() -> List[str]:
+    """Returns NLTK English stopwords (downloaded if not already present).
+
+    Returns:
+        List of stopwords.
+    """
+    # Imported here as NLTK is slow to import and the corpus may need to be
+    # downloaded first.
+    import nltk
+    from nltk.corpus import stopwords
+
+    nltk.download("stopwords", quiet=True)
+    return stopwords.words("english")
+
+
+def stem(token: str) -> str:
+    """Removes plural inflection from a token, similar to KStem.
+
+    Args:
+        token: Lowercased token.
+
+    Returns:
+        Stemmed token.
+    """
+    # Like KStem, only words consisting of letters a-z are stemmed.
+    if not (token.isascii() and token.isalpha()):
+        return token
+    if len(token) >= _MAX_STEM_LENGTH:
+        return token
+    if len(token) <= 3 or not token.endswith("s") or token[-2] in "su":
+        return token
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith(_ES_SUFFIXES):
+        return token[:-2]
+    if token.endswith("is"):
+        return token
+    return token[:-1]
+
+
+def tokenize(text: str) -> List[str]:
+    """Splits text into tokens similar to the standard tokenizer.
+
+    Args:
+        text: Text to tokenize.
+
+    Returns:
+        List of tokens.
+    """
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(text):
+        # Sequences of underscores alone do not form words.
+        if not token.strip("_"):
+            continue
+        tokens.extend(
+            token[i : i + _MAX_TOKEN_LENGTH]
+            for i in range(0, len(token), _MAX_TOKEN_LENGTH)
+        )
+    return tokens
+
+
+class Analyzer:
+    def __init__(
+        self, stopwords: Iterable[str] = None, terms: Dict[str, str] = None
+    ) -> None:
+        """Analyzes text into index terms.
+
+        Args:
+            stopwords (optional): Stopwords to remove. Defaults to NLTK
+              English stopwords, which are loaded when first needed.
+            terms (optional): Index terms of lowercased tokens that override
+              stopword removal and stemming, where an empty string removes
+              the token (see `verify_analyzer()`). Defaults to None.
+        """
+        self._stopwords = None if stopwords is None else frozenset(stopwords)
+        self._terms = dict(terms or {})
+
+    @classmethod
+    def load(cls, path: str, stopwords: Iterable[str] = None) -> "Analyzer":
+        """Loads an analyzer with terms saved by the verification mode.
+
+        Args:
+            path: Path to JSON file with index terms of tokens.
+            stopwords (optional): Stopwords to remove. Defaults to NLTK
+              English stopwords.
+
+        Returns:
+            Analyzer.
+        """
+        with open(path, "r") as f_in:
+            return cls(stopwords, terms=json.load(f_in))
+
+    @property
+    def stopwords(self) -> List[str]:
+        return sorted(self._get_stopwords())
+
+    def _get_stopwords(self) -> FrozenSet[str]:
+        """Returns stopwords, loading the default ones if necessary."""
+        if self._stopwords is None:
+            self._stopwords = frozenset(get_default_stopwords())
+        return self._stopwords
+
+    def analyze(self, text: str) -> List[str]:
+        """Tokenizes, lowercases, removes stopwords from, and stems text.
+
+        Args:
+            text: Text to analyze.
+
+        Returns:
+            List of terms.
+        """
+        stopwords = self._get_stopwords()
+        terms = []
+        for token in tokenize(text):
+            token = token.lower()
+            term = self._terms.get(token)
+            if term is None:
+                if token in stopwords:
+                    continue
+                term = stem(token)
+            if term:
+                terms.append(term)
+        return terms
+
+
+def get_index_terms(
+    collection: "ElasticSearchIndex", tokens: List[str], field: str = "body"
+) -> Dict[str, str]:
+    """Returns index terms of tokens using the analyzer of an index.
+
+    Tokens are joined into a single text, and terms are assigned to tokens
+    based on their offsets.
+
+    Args:
+        collection: Elasticsearch index.
+        tokens: Lowercased tokens.
+        field: Field whose analyzer is used (defaults to "body").
+
+    Returns:
+        Dictionary with tokens as keys and terms as values, where the term is
+        an empty string for removed tokens, and tokens split into multiple
+        terms are left out.
+    """
+    starts = {}
+    offset = 0
+    for token in tokens:
+        starts[offset] = token
+        offset += len(token) + 1
+    terms = {token: [] for token in tokens}
+    for token in _analyze_remotely(collection, " ".join(tokens), field):
+        if token["start_offset"] in starts:
+            terms[starts[token["start_offset"]]].append(token["token"])
+        else:
+            # Token starting within a word, i.e., the word was split.
+            terms.pop(_get_token_at(starts, token["start_offset"]), None)
+    return {
+        token: (term[0] if term else "")
+        for token, term in terms.items()
+        if len(term) <= 1
+    }
+
+
+def _analyze_remotely(
+    collection: "ElasticSearchIndex", text: str, field: str
+) -> List[Dict[str, Any]]:
+    """Returns tokens of a text analyzed by Elasticsearch."""
+    return collection.es.indices.analyze(
+        body={"text": text, "field": field}, index=collection.index_name
+    )["tokens"]
+
+
+def _get_token_at(starts: Dict[int, str], offset: int) -> str:
+    """Returns the token spanning a character offset of the joined text."""
+    return starts[max(start for start in starts if start <= offset)]
+
+
+def verify_analyzer(
+    collection: "ElasticSearchIndex",
+    texts: Iterable[str],
+    analyzer: Analyzer,
+    field: str = "body",
+) -> Tuple[List[Tuple[str, List[str], List[str]]], Dict[str, str]]:
+    """Compares local analysis with the analyzer of an index.
+
+    Args:
+        collection: Elasticsearch index.
+        texts: Sample of texts to analyze.
+        analyzer: Local analyzer.
+        field: Field whose analyzer is used (defaults to "body").
+
+    Returns:
+        Tuple with the texts that are analyzed differently (along with the
+        terms of the index and the local terms) and the index terms of tokens
+        that are analyzed differently.
+    """
+    mismatches = []
+    for text in texts:
+        expected = [
+            token["token"]
+            for token in _analyze_remotely(collection, text, field)
+        ]
+        actual = analyzer.analyze(text)
+        if expected != actual:
+            mismatches.append((text, expected, actual))
+
+    tokens = sorted(
+        {token.lower() for text, _, _ in mismatches for token in tokenize(text)}
+    )
+    index_terms = get_index_terms(collection, tokens, field=field)
+    terms = {
+        token: term
+        for token, term in index_terms.items()
+        if analyzer.analyze(token) != ([term] if term else [])
+    }
+    return mismatches, terms
+
+
+def parse_cmdline_arguments() -> argparse.Namespace:
+    """Defines accepted arguments and returns the parsed values.
+
+    Returns:
+        Object with a property for each argument.
+    """
+    parser = argparse.ArgumentParser(prog="analyzer.py")
+    parser.add_argument(
+        "--index_name",
+        type=str,
+        default="ms_marco_kilt_wapo_clean",
+        help="Elasticsearch index name.",
+    )
+    parser.add_argument(
+        "--host_name",
+        type=str,
+        default="localhost:9204",
+        help="Elasticsearch host name.",
+    )
+    parser.add_argument(
+        "--field",
+        type=str,
+        default="body",
+        help="Field whose analyzer is verified.",
+    )
+    parser.add_argument(
+        "--year",
+        type=str,
+        default="2021",
+        choices=["2020", "2021"],
+        help="Year of the queries used as sample.",
+    )
+    parser.add_argument(
+        "--terms",
+        type=str,
+        help="Path to previously saved index terms to verify.",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="Path to save index terms of tokens analyzed differently.",
+    )
+    return parser.parse_args()
+
+
+def main(args):
+    """Verifies the local analyzer on queries and their rewrites.
+
+    Args:
+        args: Arguments.
+    """
+    # Imported here to avoid circular imports.
+    from treccast.core.collection import ElasticSearchIndex
+    from treccast.core.topic import QueryRewrite, Topic
+
+    collection = ElasticSearchIndex(args.index_name, hostname=args.host_name)
+    analyzer = Analyzer.load(args.terms) if args.terms else Analyzer()
+    texts = {
+        query.question
+        for rewrite in (None, QueryRewrite.MANUAL, QueryRewrite.AUTOMATIC)
+        for query in Topic.load_queries_from_file(args.year, rewrite)
+    }
+    mismatches, terms = verify_analyzer(
+        collection, sorted(texts), analyzer, field=args.field
+    )
+    for text, expected, actual in mismatches:
+        print(f"{text}\n  index: {expected}\n  local: {actual}")
+    print(
+        f"{len(texts) - len(mismatches)}/{len(texts)} texts analyzed "
+        f"identically, {len(terms)} tokens differ."
+    )
+    if args.output:
+        with open(args.output, "w") as f_out:
+            json.dump({**analyzer._terms, **terms}, f_out, indent=2)
+
+
+if __name__ == "__main__":
+    args = parse_cmdline_arguments()
+    main(args)
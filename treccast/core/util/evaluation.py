@@ -0,0 +1,269 @@
+"""In-process evaluation of rankings against qrels.
+
+Computes the trec_eval measures used in the project (recall, map_cut,
+recip_rank, ndcg_cut) per query and agrees with `trec_eval -q -l2`:
+  - Documents are ranked by decreasing score, ties are broken by decreasing
+    document ID (ranks in run files are ignored).
+  - Only queries that are present both in the run and in the qrels are
+    evaluated.
+  - Binary measures consider documents with graded relevance of at least the
+    Qrel threshold (2 by default, i.e., `-l2`) relevant, while nDCG uses all
+    positive graded relevance labels as gains.
+
+Usage:
+    $ python -m treccast.core.util.evaluation --year 2021 \
+        -m recall.500 ndcg_cut.3 --runfile data/runs/2021/run.trec
+"""
+
+import argparse
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from treccast.core.qrel import Qrel
+from treccast.core.ranking import Ranking
+
+_Results = Dict[str, Dict[str, float]]
+
+SUPPORTED_METRICS = ["recall", "map_cut", "recip_rank", "ndcg_cut"]
+
+
+def parse_metric(metric: str) -> Tuple[str, int]:
+    """Splits trec_eval style metric name into measure and cutoff.
+
+    Args:
+        metric: Metric name, e.g., "ndcg_cut.3" or "recip_rank".
+
+    Raises:
+        ValueError: If the measure is not supported.
+
+    Returns:
+        Tuple with measure name and cutoff (None if there is no cutoff).
+    """
+    measure, _, cutoff = metric.partition(".")
+    if measure not in SUPPORTED_METRICS:
+        raise ValueError(
+            f"Unsupported metric: {metric}. Supported metrics: "
+            f"{', '.join(SUPPORTED_METRICS)}."
+        )
+    return measure, int(cutoff) if cutoff else None
+
+
+class Evaluator:
+    def __init__(self, qrels: Dict[str, Qrel]) -> None:
+        """Evaluates rankings against relevance judgments.
+
+        Per-query relevance statistics (number of relevant documents and ideal
+        gains) are computed once and reused for all evaluated rankings.
+
+        Args:
+            qrels: Dictionary of Qrel objects with query ID as key.
+        """
+        self._qrels = qrels
+        self._num_rel = {}
+        self._ideal_gains = {}
+        for query_id, qrel in qrels.items():
+            self._num_rel[query_id] = int(qrel.relevances(binarized=True).sum())
+            gains = qrel.relevances()
+            self._ideal_gains[query_id] = np.sort(gains[gains > 0])[::-1]
+
+    @staticmethod
+    def load_from_file(filepath: str) -> "Evaluator":
+        """Creates evaluator from TREC qrels file.
+
+        Args:
+            filepath: Path to TREC qrels file.
+
+        Returns:
+            Evaluator instance.
+        """
+        return Evaluator(Qrel.load_qrels_from_file(filepath))
+
+    def evaluate(
+        self, rankings: Dict[str, Ranking], metrics: List[str]
+    ) -> _Results:
+        """Evaluates rankings per query.
+
+        Args:
+            rankings: Dictionary of Ranking objects with query ID as key.
+            metrics: List of trec_eval style metric names.
+
+        Returns:
+            Dictionary with metric name as key and dictionary of per-query
+            values (with query ID as key) as value.
+        """
+        results = {metric: {} for metric in metrics}
+        for query_id in sorted(rankings.keys() & self._qrels.keys()):
+            rels = self._get_ranked_relevances(rankings[query_id])
+            for metric, value in self.evaluate_relevances(
+                query_id, rels, metrics
+            ).items():
+                results[metric][query_id] = value
+        return results
+
+    def evaluate_relevances(
+        self, query_id: str, rels: np.ndarray, metrics: List[str]
+    ) -> Dict[str, float]:
+        """Evaluates a single ranking given by the relevance of its documents.
+
+        Useful when many rankings of the same candidates are evaluated (e.g.,
+        during parameter tuning), as relevance labels only need to be looked
+        up once.
+
+        Args:
+            query_id: Query ID (needs to be present in the qrels).
+            rels: Graded relevance labels of the documents in rank order.
+            metrics: List of trec_eval style metric names.
+
+        Returns:
+            Dictionary with metric name as key and value as value.
+        """
+        return {
+            metric: self._compute(query_id, rels, *parse_metric(metric))
+            for metric in metrics
+        }
+
+    @staticmethod
+    def mean(results: _Results) -> Dict[str, float]:
+        """Averages per-query results over queries (trec_eval "all").
+
+        Args:
+            results: Per-query results as returned by `evaluate()`.
+
+        Returns:
+            Dictionary with metric name as key and mean value as value.
+        """
+        return {
+            metric: float(np.mean(list(values.values()))) if values else 0.0
+            for metric, values in results.items()
+        }
+
+    def _get_ranked_relevances(self, ranking: Ranking) -> np.ndarray:
+        """Returns graded relevance of ranked documents in trec_eval order.
+
+        Args:
+            ranking: Ranking for a single query.
+
+        Returns:
+            Array of graded relevance labels ordered by rank.
+        """
+        doc_ids, _ = ranking.documents()
+        scores = ranking.scores()
+        score_array = np.asarray(scores, dtype=np.float64)
+        order = np.argsort(-score_array, kind="stable")
+        sorted_scores = score_array[order]
+        if np.any(sorted_scores[1:] == sorted_scores[:-1]):
+            # Ties are broken by decreasing document ID.
+            ranked_doc_ids = [
+                doc_id
+                for _, doc_id in sorted(zip(scores, doc_ids), reverse=True)
+            ]
+        else:
+            ranked_doc_ids = [doc_ids[i] for i in order]
+        return self._qrels[ranking.query_id].get_relevances(ranked_doc_ids)
+
+    def _compute(
+        self, query_id: str, rels: np.ndarray, measure: str, cutoff: int
+    ) -> float:
+        """Computes a single measure for a query.
+
+        Args:
+            query_id: Query ID.
+            rels: Graded relevance labels of the ranked documents.
+            measure: Measure name.
+            cutoff: Rank cutoff (None for no cutoff).
+
+        Returns:
+            Measure value.
+        """
+        num_rel = self._num_rel[query_id]
+        rels = rels[:cutoff]
+        if measure == "ndcg_cut":
+            return _ndcg(rels, self._ideal_gains[query_id][:cutoff])
+        binary_rels = rels >= self._qrels[query_id].threshold
+        if measure == "recip_rank":
+            first_relevant = np.flatnonzero(binary_rels)
+            return 1 / (first_relevant[0] + 1) if len(first_relevant) else 0.0
+        if num_rel == 0:
+            return 0.0
+        if measure == "recall":
+            return binary_rels.sum() / num_rel
+        # Average precision
+        precisions = np.cumsum(binary_rels) / np.arange(1, len(rels) + 1)
+        return precisions[binary_rels].sum() / num_rel
+
+
+def _ndcg(rels: np.ndarray, ideal_gains: np.ndarray) -> float:
+    """Computes nDCG given ranked and ideal gains.
+
+    Args:
+        rels: Graded relevance labels of the ranked documents.
+        ideal_gains: Positive relevance labels sorted in decreasing order.
+
+    Returns:
+        nDCG value.
+    """
+    if len(ideal_gains) == 0:
+        return 0.0
+    gains = np.clip(rels, 0, None)
+    dcg = (gains / np.log2(np.arange(2, len(gains) + 2))).sum()
+    idcg = (ideal_gains / np.log2(np.arange(2, len(ideal_gains) + 2))).sum()
+    return dcg / idcg
+
+
+def parse_cmdline_arguments() -> argparse.Namespace:
+    """Defines accepted arguments and returns the parsed values.
+
+    Returns:
+        Object with a property for each argument.
+    """
+    parser = argparse.ArgumentParser(prog="evaluation.py")
+    parser.add_argument(
+        "--runfile",
+        type=str,
+        required=True,
+        help="Path to the TREC runfile to evaluate.",
+    )
+    parser.add_argument(
+        "--year",
+        type=str,
+        default="2021",
+        choices=["2020", "2021"],
+        help="Year for which the qrels should be used.",
+    )
+    parser.add_argument(
+        "-m",
+        "--metrics",
+        nargs="+",
+        default=["recall.1000", "map_cut.1000", "recip_rank", "ndcg_cut.3"],
+        help="trec_eval style metric names.",
+    )
+    parser.add_argument(
+        "-q",
+        action="store_true",
+        help="Outputs per-query values in addition to the average.",
+    )
+    return parser.parse_args()
+
+
+def main(args):
+    """Prints evaluation results in trec_eval output format.
+
+    Args:
+        args: Arguments.
+    """
+    evaluator = Evaluator.load_from_file(f"data/qrels/{args.year}.txt")
+    results = evaluator.evaluate(
+        Ranking.load_rankings_from_runfile(args.runfile), args.metrics
+    )
+    for metric, mean in Evaluator.mean(results).items():
+        name = metric.replace(".", "_")
+        if args.q:
+            for query_id, value in results[metric].items():
+                print(f"{name}\t{query_id}\t{value:.4f}")
+        print(f"{name}\tall\t{mean:.4f}")
+
+
+if __name__ == "__main__":
+    args = parse_cmdline_arguments()
+    main(args)
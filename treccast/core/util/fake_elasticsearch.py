@@ -0,0 +1,637 @@
+"""In-process stand-in for an Elasticsearch server.
+
+The fake server implements the subset of the Elasticsearch API used by this
+repository (search, msearch, get, mget, termvectors, analyze, bulk, and index
+administration) on top of local inverted indices (see
+`treccast.core.collection.InvertedIndex`). Each request can be delayed by a
+configurable latency, so that code bound by Elasticsearch round trips (e.g.,
+`BM25Retriever`, `PassageLoader`, RM3 feedback, `Indexer.batch_index`) can be
+tested and benchmarked offline. Responses are serialized to JSON and parsed by
+the client transport like responses of a real server.
+
+Usage:
+    server = FakeElasticsearchServer(latency=0.002)
+    server.add_index("ms_marco", InvertedIndex("data/indices/ms_marco.npz"))
+    with server.patch():
+        retriever = BM25Retriever(ElasticSearchIndex("ms_marco"))
+        ...
+    print(server.request_counts)
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from treccast.core.collection import InvertedIndex
+from treccast.core.util.analyzer import _TOKEN_PATTERN, Analyzer
+
+_Response = Dict[str, Any]
+
+
+class _JSONSerializer:
+    """Serializes requests and deserializes responses of the fake client,
+    mirroring the interface of the Elasticsearch JSONSerializer."""
+
+    mimetype = "application/json"
+
+    def dumps(self, data: Any) -> str:
+        return data if isinstance(data, str) else json.dumps(data)
+
+    def loads(self, s: Any, mimetype: str = None) -> Any:
+        return json.loads(s)
+
+
+class _FakeTransport:
+    def __init__(self) -> None:
+        """Transport of the fake client, holding its (de)serializer."""
+        self.serializer = _JSONSerializer()
+        self.deserializer = _JSONSerializer()
+
+
+class _FakeIndex:
+    def __init__(
+        self,
+        name: str,
+        collection: InvertedIndex = None,
+        analyzer: Analyzer = None,
+        path: str = None,
+        settings: Dict[str, Any] = None,
+        mappings: Dict[str, Any] = None,
+    ) -> None:
+        """Index of the fake server.
+
+        An index is either backed by an existing inverted index, in which case
+        it is read-only, or created empty, in which case its inverted index is
+        rebuilt from the indexed documents when it is read after writes (akin
+        to a refresh).
+
+        Args:
+            name: Index name.
+            collection (optional): Inverted index backing the index. Defaults
+              to None.
+            analyzer (optional): Analyzer of the index if it is not backed by
+              an inverted index. Defaults to None.
+            path (optional): Path of the inverted index built from indexed
+              documents. Defaults to None.
+            settings (optional): Index settings. Defaults to the BM25
+              similarity with default parameters.
+            mappings (optional): Field mappings. Defaults to None.
+        """
+        self.name = name
+        # Analyzes text into index terms.
+        self.analyze: Callable[[str], List[str]] = (
+            analyzer.analyze if collection is None else collection.analyze
+        )
+        self._analyzer = analyzer
+        self.settings = settings or {}
+        self.settings.setdefault("similarity", {}).setdefault(
+            "default", {"type": "BM25", "b": 0.75, "k1": 1.2}
+        )
+        self.mappings = mappings or {}
+        self._collection = collection
+        self._path = path
+        self._sources: Optional[Dict[str, str]] = None if collection else {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if collection is not None:
+            self._apply_similarities()
+
+    @property
+    def collection(self) -> InvertedIndex:
+        """Inverted index of the index, rebuilt if documents were written."""
+        with self._lock:
+            if self._collection is None or self._dirty:
+                self._collection = InvertedIndex.build(
+                    self._path,
+                    (
+                        {"_id": doc_id, "body": content}
+                        for doc_id, content in self._sources.items()
+                    ),
+                    analyzer=self._analyzer,
+                )
+                self._dirty = False
+                self._apply_similarities()
+            return self._collection
+
+    def get_content(self, doc_id: str) -> Optional[str]:
+        """Returns content of a document or None if it is not indexed."""
+        if self._sources is not None:
+            return self._sources.get(doc_id)
+        return self._collection.get_content(doc_id)
+
+    def write(self, op_type: str, doc_id: str, source: Dict[str, Any]) -> int:
+        """Indexes or deletes a document.
+
+        Args:
+            op_type: Bulk operation ("index", "create", or "delete").
+            doc_id: Document ID.
+            source: Document fields.
+
+        Returns:
+            HTTP status of the operation.
+        """
+        if self._sources is None:
+            return 403
+        with self._lock:
+            self._dirty = True
+            if op_type == "delete":
+                return 200 if self._sources.pop(doc_id, None) else 404
+            if op_type == "create" and doc_id in self._sources:
+                return 409
+            status = 200 if doc_id in self._sources else 201
+            self._sources[doc_id] = source.get("body", "")
+            return status
+
+    def update_settings(self, settings: Dict[str, Any]) -> None:
+        """Merges index settings and applies BM25 similarities."""
+        self.settings.setdefault("similarity", {}).update(
+            settings.pop("similarity", {})
+        )
+        self.settings.update(settings)
+        if self._collection is not None:
+            self._apply_similarities()
+
+    def _apply_similarities(self) -> None:
+        """Sets BM25 parameters of the inverted index to those of the
+        similarities in the settings."""
+        for name, similarity in self.settings["similarity"].items():
+            b = float(similarity.get("b", 0.75))
+            k1 = float(similarity.get("k1", 1.2))
+            if name == "default":
+                self._collection.update_similarity_parameters(b=b, k1=k1)
+            else:
+                # Registers the named similarity of multi-fields.
+                self._collection.get_bm25_field("body", b=b, k1=k1)
+
+
+class FakeElasticsearchServer:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        latency_per_doc: float = 0.0,
+        analyzer: Analyzer = None,
+    ) -> None:
+        """Instantiates an in-process Elasticsearch stand-in.
+
+        Args:
+            latency (optional): Delay of each request in seconds. Defaults to
+              0.
+            latency_per_doc (optional): Additional delay per document in a
+              response (e.g., hits, fetched documents, term vectors, or bulk
+              items) in seconds. Defaults to 0.
+            analyzer (optional): Analyzer of created indices. Defaults to
+              Analyzer with NLTK stopwords.
+        """
+        self.latency = latency
+        self.latency_per_doc = latency_per_doc
+        self.analyzer = analyzer or Analyzer()
+        self._indices: Dict[str, _FakeIndex] = {}
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        # Number of requests received per API (e.g., "search", "mget").
+        self.request_counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def add_index(self, name: str, collection: InvertedIndex) -> None:
+        """Serves an existing inverted index as a read-only index.
+
+        Args:
+            name: Index name.
+            collection: Inverted index.
+        """
+        self._indices[name] = _FakeIndex(name, collection=collection)
+
+    def client(self, *args, **kwargs) -> "FakeElasticsearch":
+        """Returns a client of the server.
+
+        Accepts (and ignores) the arguments of the Elasticsearch client.
+        """
+        return FakeElasticsearch(self)
+
+    @contextmanager
+    def patch(self) -> Iterator["FakeElasticsearchServer"]:
+        """Makes Elasticsearch clients created within the context clients of
+        the server, e.g., those of ElasticSearchIndex and PassageLoader."""
+        import elasticsearch
+        import elasticsearch.client
+
+        originals = (
+            elasticsearch.Elasticsearch,
+            elasticsearch.client.Elasticsearch,
+        )
+        elasticsearch.Elasticsearch = self.client
+        elasticsearch.client.Elasticsearch = self.client
+        try:
+            yield self
+        finally:
+            (
+                elasticsearch.Elasticsearch,
+                elasticsearch.client.Elasticsearch,
+            ) = originals
+
+    def has_index(self, name: str) -> bool:
+        return name in self._indices
+
+    def get_index(self, name: str) -> _FakeIndex:
+        """Returns an index.
+
+        Raises:
+            NotFoundError: If the index does not exist.
+        """
+        if name not in self._indices:
+            from elasticsearch.exceptions import NotFoundError
+
+            raise NotFoundError(
+                404,
+                "index_not_found_exception",
+                {"error": {"type": "index_not_found_exception", "index": name}},
+            )
+        return self._indices[name]
+
+    def create_index(
+        self, name: str, settings: Dict[str, Any], mappings: Dict[str, Any]
+    ) -> None:
+        """Creates an empty index."""
+        self._indices[name] = _FakeIndex(
+            name,
+            analyzer=self.analyzer,
+            path=os.path.join(self._tmp_dir.name, f"{len(self._indices)}.npz"),
+            settings=settings,
+            mappings=mappings,
+        )
+
+    def delete_index(self, name: str) -> None:
+        self.get_index(name)
+        del self._indices[name]
+
+    def index_names(self) -> List[str]:
+        return list(self._indices)
+
+    def handle(self, api: str, num_docs: int = 0) -> None:
+        """Counts a request and delays its response by the configured
+        latency.
+
+        Args:
+            api: Name of the API.
+            num_docs (optional): Number of documents in the response.
+              Defaults to 0.
+        """
+        with self._lock:
+            self.request_counts[api] += 1
+        delay = self.latency + self.latency_per_doc * num_docs
+        if delay > 0:
+            time.sleep(delay)
+
+
+class _FakeIndicesClient:
+    def __init__(self, client: "FakeElasticsearch") -> None:
+        """Index administration API of the fake client."""
+        self._client = client
+        self._server = client.server
+
+    def exists(self, index: str, **kwargs) -> bool:
+        self._server.handle("indices.exists")
+        return self._server.has_index(index)
+
+    def create(self, index: str, body: Dict[str, Any] = None, **kwargs):
+        body = body or {}
+        self._server.create_index(
+            index,
+            dict(body.get("settings", {}).get("index", {})),
+            body.get("mappings", {}),
+        )
+        return self._client._respond(
+            "indices.create", {"acknowledged": True, "index": index}
+        )
+
+    def delete(self, index: str, **kwargs) -> _Response:
+        self._server.delete_index(index)
+        return self._client._respond("indices.delete", {"acknowledged": True})
+
+    def get_settings(self, index: str = None, **kwargs) -> _Response:
+        names = [index] if index else self._server.index_names()
+        return self._client._respond(
+            "indices.get_settings",
+            {
+                name: {
+                    "settings": {"index": self._server.get_index(name).settings}
+                }
+                for name in names
+            },
+        )
+
+    def get_mapping(self, index: str = None, **kwargs) -> _Response:
+        names = [index] if index else self._server.index_names()
+        return self._client._respond(
+            "indices.get_mapping",
+            {
+                name: {"mappings": self._server.get_index(name).mappings}
+                for name in names
+            },
+        )
+
+    def put_settings(
+        self, body: Dict[str, Any], index: str = None, **kwargs
+    ) -> _Response:
+        self._server.get_index(index).update_settings(
+            dict(body.get("index", body))
+        )
+        return self._client._respond(
+            "indices.put_settings", {"acknowledged": True}
+        )
+
+    def close(self, index: str, **kwargs) -> _Response:
+        self._server.get_index(index)
+        return self._client._respond("indices.close", {"acknowledged": True})
+
+    def open(self, index: str, **kwargs) -> _Response:
+        self._server.get_index(index)
+        return self._client._respond("indices.open", {"acknowledged": True})
+
+    def analyze(
+        self, body: Dict[str, Any], index: str = None, **kwargs
+    ) -> _Response:
+        analyze = (
+            self._server.get_index(index).analyze
+            if index
+            else self._server.analyzer.analyze
+        )
+        return self._client._respond(
+            "indices.analyze", {"tokens": _analyze(analyze, body["text"])}
+        )
+
+
+class FakeElasticsearch:
+    def __init__(self, server: FakeElasticsearchServer) -> None:
+        """Client of a fake Elasticsearch server.
+
+        Args:
+            server: Fake server.
+        """
+        self.server = server
+        self.transport = _FakeTransport()
+        self.indices = _FakeIndicesClient(self)
+
+    def search(
+        self,
+        body: Dict[str, Any] = None,
+        index: str = None,
+        _source: bool = True,
+        size: int = 10,
+        **kwargs,
+    ) -> _Response:
+        response = self._search(index, body or {}, _source, size)
+        return self._respond("search", response, len(response["hits"]["hits"]))
+
+    def msearch(
+        self, body: List[Dict[str, Any]], index: str = None, **kwargs
+    ) -> _Response:
+        responses = []
+        for header, search in zip(body[::2], body[1::2]):
+            try:
+                response = self._search(
+                    header.get("index", index),
+                    search,
+                    search.get("_source", True),
+                    search.get("size", 10),
+                )
+                response["status"] = 200
+            except ValueError as e:
+                response = {
+                    "error": {"type": "parsing_exception", "reason": str(e)},
+                    "status": 400,
+                }
+            responses.append(response)
+        return self._respond(
+            "msearch",
+            {"took": 0, "responses": responses},
+            sum(len(r.get("hits", {}).get("hits", [])) for r in responses),
+        )
+
+    def get(self, index: str, id: str, **kwargs) -> _Response:
+        doc = self._get(index, id)
+        if not doc["found"]:
+            from elasticsearch.exceptions import NotFoundError
+
+            self.server.handle("get")
+            raise NotFoundError(404, json.dumps(doc), doc)
+        return self._respond("get", doc, 1)
+
+    def mget(
+        self, body: Dict[str, Any], index: str = None, **kwargs
+    ) -> _Response:
+        docs = [
+            self._get(doc.get("_index", index), doc["_id"])
+            for doc in body.get("docs", [])
+        ] + [self._get(index, doc_id) for doc_id in body.get("ids", [])]
+        return self._respond("mget", {"docs": docs}, len(docs))
+
+    def termvectors(
+        self,
+        index: str,
+        body: Dict[str, Any] = None,
+        id: str = None,
+        fields: str = "body",
+        positions: bool = True,
+        **kwargs,
+    ) -> _Response:
+        doc = dict(body or {})
+        if id is not None:
+            doc["_id"] = id
+        return self._respond(
+            "termvectors",
+            self._get_term_vectors(index, doc, fields, positions),
+            1,
+        )
+
+    def mtermvectors(
+        self,
+        body: Dict[str, Any],
+        index: str = None,
+        fields: str = "body",
+        positions: bool = True,
+        **kwargs,
+    ) -> _Response:
+        docs = body.get("docs", []) + [
+            {"_id": doc_id} for doc_id in body.get("ids", [])
+        ]
+        return self._respond(
+            "mtermvectors",
+            {
+                "docs": [
+                    self._get_term_vectors(
+                        doc.get("_index", index), doc, fields, positions
+                    )
+                    for doc in docs
+                ]
+            },
+            len(docs),
+        )
+
+    def bulk(self, body: str, index: str = None, **kwargs) -> _Response:
+        lines = [json.loads(line) for line in body.splitlines() if line]
+        items = []
+        i = 0
+        while i < len(lines):
+            op_type, action = next(iter(lines[i].items()))
+            source = lines[i + 1] if op_type != "delete" else {}
+            i += 1 if op_type == "delete" else 2
+            doc_index = action.get("_index", index)
+            status = self.server.get_index(doc_index).write(
+                op_type, action["_id"], source
+            )
+            items.append(
+                {
+                    op_type: {
+                        "_index": doc_index,
+                        "_id": action["_id"],
+                        "status": status,
+                    }
+                }
+            )
+        return self._respond(
+            "bulk",
+            {
+                "took": 0,
+                "errors": any(
+                    not 200 <= item[op]["status"] < 300
+                    for item in items
+                    for op in item
+                ),
+                "items": items,
+            },
+            len(items),
+        )
+
+    def _respond(
+        self, api: str, response: _Response, num_docs: int = 0
+    ) -> _Response:
+        """Delays a response and passes it through the transport
+        deserializer, as the response of a real server.
+
+        Args:
+            api: Name of the API.
+            response: Response.
+            num_docs (optional): Number of documents in the response.
+              Defaults to 0.
+
+        Returns:
+            Deserialized response.
+        """
+        self.server.handle(api, num_docs)
+        return self.transport.deserializer.loads(
+            json.dumps(response), _JSONSerializer.mimetype
+        )
+
+    def _search(
+        self, index: str, body: Dict[str, Any], source: bool, size: int
+    ) -> _Response:
+        """Performs a search on an index.
+
+        Raises:
+            ValueError: If the query is not supported.
+
+        Returns:
+            Search response.
+        """
+        docs = self.server.get_index(index).collection.search(
+            body["query"], num_results=size, source=source
+        )
+        hits = []
+        for doc in docs:
+            hit = {"_index": index, "_id": doc.doc_id, "_score": doc.score}
+            if source:
+                hit["_source"] = {"body": doc.content}
+            hits.append(hit)
+        return {
+            "took": 0,
+            "timed_out": False,
+            "hits": {
+                "total": {"value": len(hits), "relation": "eq"},
+                "max_score": hits[0]["_score"] if hits else None,
+                "hits": hits,
+            },
+        }
+
+    def _get(self, index: str, doc_id: str) -> _Response:
+        """Returns a document response, with found set to False if it is not
+        in the index."""
+        content = self.server.get_index(index).get_content(doc_id)
+        doc = {"_index": index, "_id": doc_id, "found": content is not None}
+        if content is not None:
+            doc["_source"] = {"body": content}
+        return doc
+
+    def _get_term_vectors(
+        self, index: str, doc: Dict[str, Any], fields: str, positions: bool
+    ) -> _Response:
+        """Returns term vectors of an indexed or artificial document.
+
+        Args:
+            index: Index name.
+            doc: Document with an ID or with fields to analyze.
+            fields: Comma-separated field names.
+            positions: Whether positions are returned, unless set by the
+              document.
+
+        Returns:
+            Term vectors response.
+        """
+        fake_index = self.server.get_index(index)
+        field = fields.split(",")[0]
+        if "doc" in doc:
+            text = doc["doc"].get(field, "")
+            response = {"_index": index, "found": True}
+        else:
+            text = fake_index.get_content(doc["_id"])
+            response = {
+                "_index": index,
+                "_id": doc["_id"],
+                "found": text is not None,
+            }
+            if text is None:
+                return response
+        terms = {}
+        for token in _analyze(fake_index.analyze, text):
+            stats = terms.setdefault(token["token"], {"term_freq": 0})
+            stats["term_freq"] += 1
+            if doc.get("positions", positions):
+                stats.setdefault("tokens", []).append(
+                    {"position": token["position"]}
+                )
+        response["term_vectors"] = {field: {"terms": terms}}
+        return response
+
+
+def _analyze(
+    analyze: Callable[[str], List[str]], text: str
+) -> List[Dict[str, Any]]:
+    """Analyzes text into tokens with offsets and positions, as returned by
+    the analyze API.
+
+    Positions are counted before stopword removal, as in Elasticsearch.
+
+    Args:
+        analyze: Function analyzing text into index terms.
+        text: Text to analyze.
+
+    Returns:
+        List of tokens.
+    """
+    tokens = []
+    for position, match in enumerate(_TOKEN_PATTERN.finditer(text)):
+        for term in analyze(match.group()):
+            tokens.append(
+                {
+                    "token": term,
+                    "start_offset": match.start(),
+                    "end_offset": match.end(),
+                    "type": "<ALPHANUM>",
+                    "position": position,
+                }
+            )
+    return tokens
@@ -1,10 +1,8 @@
 """Retrieves passages from Elasticsearch instance using IDs."""
 
-
 from typing import List
 
 import logging
-import elasticsearch
 from treccast.core.collection import ElasticSearchIndex
 
 logging.basicConfig(
@@ -13,6 +11,9 @@ logging.basicConfig(
     handlers=[logging.StreamHandler()],
 )
 
+# Maximum number of document IDs sent in a single mget request.
+DEFAULT_MGET_BATCH_SIZE = 1000
+
 
 class PassageLoader(object):
     def __init__(
@@ -41,35 +42,49 @@ class PassageLoader(object):
         Returns:
             The content of the indexed passage.
         """
+        from elasticsearch.exceptions import NotFoundError
+
         if doc_id not in self._cache:
             try:
                 self._cache[doc_id] = self._collection.es.get(
                     self._index, doc_id
                 )["_source"][self._field]
-            except elasticsearch.exceptions.NotFoundError:
+            except NotFoundError:
                 logging.info("%s not found in the index", doc_id)
                 return None
         return self._cache[doc_id]
 
-    def mget(self, doc_ids: List[str]) -> List[str]:
+    def mget(
+        self, doc_ids: List[str], batch_size: int = DEFAULT_MGET_BATCH_SIZE
+    ) -> List[str]:
         """Load multiple passages based on a list of document IDs.
 
-        The specified passages which are not already cached are retrieved, then
-        all specified passages are loaded.
+        The specified passages which are not already cached are retrieved in
+        chunks of batch_size IDs per mget request, then all specified passages
+        are loaded. Passages that are not found in the index are returned as
+        None.
 
         Args:
             doc_ids: All the document identifiers with which to load content.
+            batch_size (optional): Maximum number of IDs per mget request.
+              Defaults to 1000.
 
         Returns:
             The contents of each of the indexed passages.
         """
-        missing_doc_ids = [
-            doc_id for doc_id in doc_ids if doc_id not in self._cache
-        ]
-        result_dicts = self._collection.es.mget(
-            index=self._index, body={"ids": missing_doc_ids}
-        )["docs"]
-        results = [result["_source"][self._field] for result in result_dicts]
-        for doc_id, result in zip(missing_doc_ids, results):
-            self._cache[doc_id] = result
-        return [self._cache[doc_id] for doc_id in doc_ids]
+        missing_doc_ids = list(
+            dict.fromkeys(
+                doc_id for doc_id in doc_ids if doc_id not in self._cache
+            )
+        )
+        for i in range(0, len(missing_doc_ids), batch_size):
+            result_dicts = self._collection.es.mget(
+                index=self._index,
+                body={"ids": missing_doc_ids[i : i + batch_size]},
+            )["docs"]
+            for result in result_dicts:
+                if not result.get("found"):
+                    logging.info("%s not found in the index", result["_id"])
+                    continue
+                self._cache[result["_id"]] = result["_source"][self._field]
+        return [self._cache.get(doc_id) for doc_id in doc_ids]
@@ -1,79 +1,223 @@
-"""Merges two rankings with Reciprocal Rank Fusion."""
+"""Merges rankings with Reciprocal Rank Fusion and score-based fusion.
 
-from typing import List, Tuple
+Rankings are fused in memory. Reciprocal Rank Fusion gives the same
+documents and scores as `trectools.fusion.reciprocal_rank_fusion` applied to
+the rankings written as TREC runs: each ranking is deduplicated (keeping the
+highest score of a document), ordered by descending score and ascending
+document ID, and cut off at max_docs documents, and the fused ranking is
+ordered the same way.
+"""
 
+from typing import Callable, Dict, List, Tuple
+
+from treccast.core.base import ScoredDocument
 from treccast.core.ranking import Ranking
 from treccast.core.util.passage_loader import PassageLoader
-from trectools import TrecRun, fusion
+
+# Term that avoids vanishing importance of lower-ranked documents.
+DEFAULT_RRF_K = 60
+
+# Maximum number of documents per input and fused ranking.
+DEFAULT_MAX_DOCS = 1000
 
 
 class ReciprocalRankFusion(object):
     def __init__(
         self,
-        ploader: PassageLoader,
+        ploader: PassageLoader = None,
+        k: int = DEFAULT_RRF_K,
+        max_docs: int = DEFAULT_MAX_DOCS,
     ) -> None:
         """Instantiates Reciprocal Rank Fusion of several rankings.
 
         Args:
-            ploader: Passage loader.
+            ploader (optional): Passage loader used for documents without
+              content in the fused rankings. Defaults to None.
+            k (optional): Constant added to ranks. Defaults to 60.
+            max_docs (optional): Maximum number of documents considered from
+              each ranking and returned in the fused ranking. Defaults to
+              1000.
         """
         self._ploader = ploader
+        self._k = k
+        self._max_docs = max_docs
 
-    @staticmethod
-    def create_trec_run(ranking: Tuple[str, Ranking]) -> TrecRun:
-        """Creates trectools TrecRun object using a ranking name and a Ranking.
+    def reciprocal_rank_fusion(
+        self, rankings: List[Tuple[str, Ranking]]
+    ) -> Ranking:
+        """Merges several rankings using Reciprocal Rank Fusion.
 
         Args:
-            ranking: Tuple with a ranking name and a Ranking.
+            rankings: List of tuples with a ranking name and a Ranking object.
 
         Returns:
-            TrecRun object.
+            Ranking obtained after Reciprocal Rank Fusion.
         """
-        ranking_file_path = f"data/reciprocal_rank_fusion/{ranking[0]}.trec"
-        with open(ranking_file_path, "w") as trec_out:
-            ranking[1].write_to_trec_file(
-                trec_out,
-                run_id=ranking[0],
-                k=len(ranking[1].documents()[0]),
-                remove_passage_id=False,
-            )
+        return self.weighted_reciprocal_rank_fusion(
+            rankings, [1.0] * len(rankings)
+        )
 
-        return TrecRun(ranking_file_path)
+    def weighted_reciprocal_rank_fusion(
+        self, rankings: List[Tuple[str, Ranking]], weights: List[float]
+    ) -> Ranking:
+        """Merges several rankings using weighted Reciprocal Rank Fusion.
 
-    @staticmethod
-    def create_trec_runs(rankings: List[Tuple[str, Ranking]]) -> List[TrecRun]:
-        """Creates trectools TrecRun objects.
+        The score of a document is the sum of weight / (k + rank) over the
+        rankings containing it.
 
         Args:
-            ranking: List of tuples with a ranking name and a Ranking object.
+            rankings: List of tuples with a ranking name and a Ranking object.
+            weights: Weight of each ranking.
 
         Returns:
-            List of TrecRun objects.
+            Ranking obtained after weighted Reciprocal Rank Fusion.
         """
-        return [
-            ReciprocalRankFusion.create_trec_run(ranking)
-            for ranking in rankings
-        ]
+        return self._fuse(
+            rankings,
+            lambda docs: [
+                [
+                    (doc, weight * (1.0 / (self._k + rank)))
+                    for rank, doc in enumerate(ranked_docs, start=1)
+                ]
+                for ranked_docs, weight in zip(docs, weights)
+            ],
+        )
 
-    def reciprocal_rank_fusion(
-        self, rankings: List[Tuple[str, Ranking]]
+    def comb_sum(
+        self, rankings: List[Tuple[str, Ranking]], normalize: bool = False
     ) -> Ranking:
-        """Merges several rankings using Reciprocal Rank Fusion.
+        """Merges several rankings using CombSUM.
+
+        The score of a document is the sum of its scores in the rankings
+        containing it.
 
         Args:
-            ranking: List of tuples with a ranking name and a Ranking object.
+            rankings: List of tuples with a ranking name and a Ranking object.
+            normalize (optional): Whether to min-max normalize the scores of
+              each ranking first. Defaults to False.
 
         Returns:
-            Ranking obtained after Reciprocal Rank Fusion.
+            Ranking obtained after CombSUM.
+        """
+        return self._fuse(
+            rankings, lambda docs: self._get_doc_scores(docs, normalize)
+        )
+
+    def comb_mnz(
+        self, rankings: List[Tuple[str, Ranking]], normalize: bool = False
+    ) -> Ranking:
+        """Merges several rankings using CombMNZ.
+
+        The score of a document is the sum of its scores multiplied by the
+        number of rankings containing it.
+
+        Args:
+            rankings: List of tuples with a ranking name and a Ranking object.
+            normalize (optional): Whether to min-max normalize the scores of
+              each ranking first. Defaults to False.
+
+        Returns:
+            Ranking obtained after CombMNZ.
         """
-        runs = ReciprocalRankFusion.create_trec_runs(rankings)
-        fused_run = fusion.reciprocal_rank_fusion(runs)
-        fused_run_file_path = (
-            "data/reciprocal_rank_fusion/"
-            f"{rankings[0][0]}_{rankings[1][0]}_fused.trec"
+        return self._fuse(
+            rankings,
+            lambda docs: self._get_doc_scores(docs, normalize),
+            multiply_by_count=True,
         )
-        fused_run.print_subset(fused_run_file_path, topics=fused_run.topics())
-        qid_ranking_dict = Ranking.load_rankings_from_runfile(
-            fused_run_file_path, self._ploader
+
+    def _get_ranked_docs(self, ranking: Ranking) -> List[ScoredDocument]:
+        """Returns unique documents of a ranking in the order of a TREC run.
+
+        Args:
+            ranking: Ranking.
+
+        Returns:
+            At most max_docs documents, ordered by descending score and
+            ascending document ID.
+        """
+        docs = ranking.fetch_topk_docs(len(ranking), unique=True)
+        return sorted(docs, key=lambda doc: (-doc.score, doc.doc_id))[
+            : self._max_docs
+        ]
+
+    @staticmethod
+    def _get_doc_scores(
+        docs: List[List[ScoredDocument]], normalize: bool
+    ) -> List[List[Tuple[ScoredDocument, float]]]:
+        """Returns documents paired with their (normalized) scores.
+
+        Args:
+            docs: Ranked documents of each ranking.
+            normalize: Whether to min-max normalize scores per ranking.
+
+        Returns:
+            Documents and scores of each ranking.
+        """
+        doc_scores = []
+        for ranked_docs in docs:
+            scores = [doc.score for doc in ranked_docs]
+            if normalize and scores:
+                low, high = min(scores), max(scores)
+                scores = [
+                    (score - low) / (high - low) if high > low else 1.0
+                    for score in scores
+                ]
+            doc_scores.append(list(zip(ranked_docs, scores)))
+        return doc_scores
+
+    def _fuse(
+        self,
+        rankings: List[Tuple[str, Ranking]],
+        get_doc_scores: Callable[
+            [List[List[ScoredDocument]]],
+            List[List[Tuple[ScoredDocument, float]]],
+        ],
+        multiply_by_count: bool = False,
+    ) -> Ranking:
+        """Merges rankings by summing the scores of documents.
+
+        Content of fused documents is taken from the input rankings, and
+        loaded with the passage loader only if no ranking has it.
+
+        Args:
+            rankings: List of tuples with a ranking name and a Ranking object.
+            get_doc_scores: Function returning the score contributions of the
+              ranked documents of each ranking.
+            multiply_by_count (optional): Whether to multiply summed scores
+              by the number of rankings containing a document. Defaults to
+              False.
+
+        Returns:
+            Fused ranking.
+        """
+        docs = [self._get_ranked_docs(ranking) for _, ranking in rankings]
+        fused_scores: Dict[str, float] = {}
+        counts: Dict[str, int] = {}
+        contents: Dict[str, str] = {}
+        for doc_scores in get_doc_scores(docs):
+            for doc, score in doc_scores:
+                fused_scores[doc.doc_id] = (
+                    fused_scores.get(doc.doc_id, 0.0) + score
+                )
+                counts[doc.doc_id] = counts.get(doc.doc_id, 0) + 1
+                if contents.get(doc.doc_id) is None:
+                    contents[doc.doc_id] = doc.content
+        if multiply_by_count:
+            fused_scores = {
+                doc_id: score * counts[doc_id]
+                for doc_id, score in fused_scores.items()
+            }
+
+        top_docs = sorted(
+            fused_scores.items(), key=lambda item: (-item[1], item[0])
+        )[: self._max_docs]
+        missing = [doc_id for doc_id, _ in top_docs if contents[doc_id] is None]
+        if missing and self._ploader:
+            contents.update(zip(missing, self._ploader.mget(missing)))
+        return Ranking(
+            rankings[0][1].query_id,
+            [
+                ScoredDocument(doc_id, contents[doc_id], score)
+                for doc_id, score in top_docs
+            ],
         )
-        return list(qid_ranking_dict.values())[0]
@@ -1,22 +1,25 @@
 import argparse
-import subprocess
 
 from scipy.stats import ttest_ind
 
+from treccast.core.ranking import Ranking
+from treccast.core.util.evaluation import Evaluator
+
 
 def compute_statistical_significance(
     year: str,
     runfile_1: str,
     runfile_2: str,
-    trec_eval: str = "tools/trec_eval/trec_eval",
 ):
     """Computing statistical significance using paired t-test.
 
+    Runs are evaluated in-process against the year's qrels (equivalent to
+    `trec_eval -q -l2`).
+
     Args:
         year: Year for which the significance test should be calculated.
         runfile_1: Path to the first runfile.
         runfile_2: Path to the second runfile.
-        trec_eval: Path to trec_eval_evaluation tool.
 
     """
     cutoff = "500" if year == "2021" else "1000"
@@ -34,26 +37,19 @@ def compute_statistical_significance(
     print(f"System 1: {file_name_1}")
     print(f"System 2: {file_name_2}")
 
+    evaluator = Evaluator.load_from_file(f"data/qrels/{year}.txt")
+    results_1 = evaluator.evaluate(
+        Ranking.load_rankings_from_runfile(path_1), metrics
+    )
+    results_2 = evaluator.evaluate(
+        Ranking.load_rankings_from_runfile(path_2), metrics
+    )
+
     for metric in metrics:
-        proc = subprocess.Popen(
-            f"{trec_eval} -m {metric} -q -l2 data/qrels/{year}.txt {path_1}",
-            shell=True,
-            stdout=subprocess.PIPE,
-        )
-        metric_file_1 = list(
-            map(float, proc.communicate()[0].decode("utf-8").split()[2::3])
-        )
-        # print(metric_file_1[-1])
-
-        proc = subprocess.Popen(
-            f"{trec_eval} -m {metric} -q -l2 data/qrels/{year}.txt {path_2}",
-            shell=True,
-            stdout=subprocess.PIPE,
-        )
-        metric_file_2 = list(
-            map(float, proc.communicate()[0].decode("utf-8").split()[2::3])
-        )
-        print(metric_file_2[-1])
+        query_ids = sorted(results_1[metric].keys() & results_2[metric].keys())
+        metric_file_1 = [results_1[metric][q_id] for q_id in query_ids]
+        metric_file_2 = [results_2[metric][q_id] for q_id in query_ids]
+        print(round(sum(metric_file_2) / len(metric_file_2), 4))
 
         stats = ttest_ind(metric_file_1, metric_file_2)
         print(f"T-test for metric {metric}:")
@@ -87,15 +83,6 @@ def parse_cmdline_arguments() -> argparse.Namespace:
         choices=["2020", "2021"],
         help="Year for which the significance test should be calculated.",
     )
-    parser.add_argument(
-        "--trec_eval",
-        type=str,
-        default="tools/trec_eval/trec_eval",
-        help=(
-            "Path to trec_eval evaluation tool. Defaults to"
-            "tools/trec_eval/trec_eval"
-        ),
-    )
 
     return parser.parse_args()
 
@@ -109,7 +96,6 @@ def main(args):
         year=args.year,
         runfile_1=args.runfile_1,
         runfile_2=args.runfile_2,
-        trec_eval=args.trec_eval,
     )
 
 
@@ -0,0 +1,122 @@
+"""Benchmarks top-k retrieval on a local inverted index for expanded queries.
+
+Queries are expanded with RM3 (see `treccast.expander.prf`) using feedback
+documents from the local index and retrieved with Block-Max MaxScore and with
+exhaustive scoring. Latency is reported per expansion size, and rankings of
+both strategies are checked to be identical.
+
+Usage:
+    $ python -m treccast.core.util.sparse_retrieval_benchmark \
+        --index data/indices/ms_marco.npz --year 2021 \
+        --num_terms 10 25 50 100
+"""
+
+import argparse
+import time
+from typing import List
+
+import numpy as np
+
+from treccast.core.base import Query
+from treccast.core.collection import InvertedIndex
+from treccast.core.topic import QueryRewrite, Topic
+from treccast.expander.prf import RM3
+from treccast.retriever.bm25_retriever import BM25Retriever
+
+
+def benchmark(
+    index: InvertedIndex,
+    queries: List[Query],
+    num_terms: List[int],
+    num_results: int = 1000,
+) -> None:
+    """Prints retrieval latency per expansion size.
+
+    Args:
+        index: Local inverted index.
+        queries: Queries to expand and retrieve.
+        num_terms: Expansion sizes to benchmark.
+        num_results (optional): Number of documents to retrieve. Defaults to
+          1000.
+
+    Raises:
+        RuntimeError: If rankings of the two strategies differ.
+    """
+    retriever = BM25Retriever(index)
+    print("num_terms\tstrategy\tmean_ms\tp50_ms\tp95_ms")
+    for n in num_terms:
+        bool_queries = [
+            retriever.bool_query(weighted_terms=query.weighted_terms)
+            for query in RM3(retriever, prf_num_terms=n).get_expanded_queries(
+                queries
+            )
+        ]
+        rankings = {}
+        for dynamic_pruning in (True, False):
+            index.dynamic_pruning = dynamic_pruning
+            latencies = []
+            rankings[dynamic_pruning] = []
+            for bool_query in bool_queries:
+                start = time.perf_counter()
+                documents = index.search(bool_query, num_results, source=False)
+                latencies.append((time.perf_counter() - start) * 1000)
+                rankings[dynamic_pruning].append(
+                    [doc.doc_id for doc in documents]
+                )
+            strategy = "block_max" if dynamic_pruning else "exhaustive"
+            print(
+                f"{n}\t{strategy}\t{np.mean(latencies):.2f}\t"
+                f"{np.percentile(latencies, 50):.2f}\t"
+                f"{np.percentile(latencies, 95):.2f}"
+            )
+        index.dynamic_pruning = True
+        if rankings[True] != rankings[False]:
+            raise RuntimeError(f"Rankings differ for {n} expansion terms.")
+
+
+def parse_cmdline_arguments() -> argparse.Namespace:
+    """Defines accepted arguments and returns the parsed values.
+
+    Returns:
+        Object with a property for each argument.
+    """
+    parser = argparse.ArgumentParser(prog="sparse_retrieval_benchmark.py")
+    parser.add_argument(
+        "--index",
+        type=str,
+        required=True,
+        help="Path to the local inverted index.",
+    )
+    parser.add_argument(
+        "--year",
+        type=str,
+        default="2021",
+        choices=["2020", "2021"],
+        help="Year of the queries.",
+    )
+    parser.add_argument(
+        "--num_terms",
+        type=int,
+        nargs="+",
+        default=[10, 25, 50, 75, 100],
+        help="Numbers of expansion terms (prf_num_terms) to benchmark.",
+    )
+    return parser.parse_args()
+
+
+def main(args):
+    """Runs the benchmark.
+
+    Args:
+        args: Arguments.
+    """
+    benchmark(
+        InvertedIndex(args.index),
+        Topic.load_queries_from_file(args.year, QueryRewrite.MANUAL),
+        args.num_terms,
+    )
+
+
+if __name__ == "__main__":
+    args = parse_cmdline_arguments()
+    main(args)
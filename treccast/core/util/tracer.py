@@ -0,0 +1,167 @@
+"""Stage-level timing of the pipeline.
+
+A tracer measures the time spent in each stage of a turn (e.g., rewriting,
+retrieval, re-ranking) along with counters (e.g., Elasticsearch requests,
+re-ranked pairs). Each turn is written as a line of a JSONL trace, and a
+summary table is printed at the end of a run. Optionally, one stage is
+profiled with cProfile.
+
+Usage:
+    tracer = Tracer("trace.jsonl")
+    tracer.start_turn("81_1")
+    with tracer.stage("retrieval"):
+        ...
+    tracer.count("es_requests", 2)
+    tracer.end_turn()
+    print(tracer.close())
+"""
+
+import cProfile
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+# Suffix of counters with the number of items processed by a stage, which are
+# reported as throughput of the stage (e.g., "t5_pairs" for stage "t5").
+_ITEMS_SUFFIX = "_pairs"
+
+
+class Tracer:
+    def __init__(
+        self,
+        path: str = None,
+        profile_stage: str = None,
+        profile_path: str = None,
+    ) -> None:
+        """Instantiates a tracer.
+
+        Args:
+            path (optional): Path to the JSONL trace. Defaults to None (no
+              trace is written).
+            profile_stage (optional): Name of the stage profiled with
+              cProfile. Defaults to None.
+            profile_path (optional): Path to the cProfile statistics of the
+              profiled stage. Defaults to "{profile_stage}.prof".
+        """
+        self._trace = open(path, "w") if path else None
+        self._profile_stage = profile_stage
+        self._profile_path = profile_path or f"{profile_stage}.prof"
+        self._profiler = cProfile.Profile() if profile_stage else None
+        self._start = time.perf_counter()
+        self._turn_start = None
+        self._query_id = None
+        self._stages: Dict[str, float] = defaultdict(float)
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._stage_times: Dict[str, List[float]] = defaultdict(list)
+        self._totals: Dict[str, float] = defaultdict(float)
+
+    def start_turn(self, query_id: str) -> None:
+        """Starts the record of a turn.
+
+        Args:
+            query_id: Query ID of the turn.
+        """
+        self._flush()
+        self._query_id = query_id
+        self._turn_start = time.perf_counter()
+
+    def end_turn(self) -> None:
+        """Ends the record of the current turn and writes it to the trace."""
+        self._flush()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Measures the time spent in a stage.
+
+        Args:
+            name: Stage name.
+        """
+        profile = self._profiler is not None and name == self._profile_stage
+        if profile:
+            self._profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+            if profile:
+                self._profiler.disable()
+
+    def add_time(self, name: str, seconds: float) -> None:
+        """Adds time measured elsewhere (e.g., in another thread) to a stage.
+
+        Args:
+            name: Stage name.
+            seconds: Time spent in the stage.
+        """
+        self._stages[name] += seconds
+        self._stage_times[name].append(seconds)
+
+    def count(self, name: str, value: float = 1) -> None:
+        """Increments a counter.
+
+        Args:
+            name: Counter name.
+            value (optional): Increment. Defaults to 1.
+        """
+        self._counters[name] += value
+        self._totals[name] += value
+
+    def summary(self) -> str:
+        """Returns a summary table of stage times and counters.
+
+        Returns:
+            Table with calls, total, mean and 95th percentile time per stage,
+            throughput of stages with item counters, and counter totals.
+        """
+        lines = [
+            f"{'stage':<12}{'calls':>8}{'total (s)':>12}{'mean (ms)':>12}"
+            f"{'p95 (ms)':>12}{'items/s':>12}"
+        ]
+        for name, times in self._stage_times.items():
+            total = sum(times)
+            items = self._totals.get(f"{name}{_ITEMS_SUFFIX}")
+            throughput = f"{items / total:.1f}" if items and total else "-"
+            lines.append(
+                f"{name:<12}{len(times):>8}{total:>12.2f}"
+                f"{total / len(times) * 1000:>12.1f}"
+                f"{np.percentile(times, 95) * 1000:>12.1f}{throughput:>12}"
+            )
+        for name, value in self._totals.items():
+            lines.append(f"{name:<32}{value:>12g}")
+        lines.append(f"{'total':<32}{time.perf_counter() - self._start:>12.2f}")
+        return "\n".join(lines)
+
+    def close(self) -> str:
+        """Writes the last record, closes the trace and saves the profile.
+
+        Returns:
+            Summary table.
+        """
+        self._flush()
+        if self._trace:
+            self._trace.close()
+        if self._profiler is not None:
+            self._profiler.dump_stats(self._profile_path)
+        return self.summary()
+
+    def _flush(self) -> None:
+        """Writes the current record (per turn, or run-level stages outside
+        turns) to the trace and resets it."""
+        if self._trace and (self._stages or self._counters):
+            record = {
+                "query_id": self._query_id,
+                "stages": dict(self._stages),
+                "counters": dict(self._counters),
+            }
+            if self._turn_start is not None:
+                record["total"] = time.perf_counter() - self._turn_start
+            self._trace.write(json.dumps(record) + "\n")
+        self._query_id = None
+        self._turn_start = None
+        self._stages = defaultdict(float)
+        self._counters = defaultdict(float)
@@ -1,17 +1,31 @@
 """Classes for query expansion by pseudo-relevance-feedback."""
 
 import abc
-from collections import Counter, defaultdict
+from collections import Counter, OrderedDict
 from enum import Enum
-from typing import Any, Dict, List
+from itertools import chain
+from typing import Dict, List, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
 
 from treccast.core.base import Query, SparseQuery
 from treccast.retriever.bm25_retriever import BM25Retriever
 
 _WeightedTerms = Dict[str, float]
 
+# Vocabulary IDs and frequencies of the terms of a document, and its length.
+_TermVector = Tuple[np.ndarray, np.ndarray, int]
+
 _LAMBDA = 0.5
 
+# Maximum number of per-document term vectors kept in memory by RM3.
+DEFAULT_TERM_VECTOR_CACHE_SIZE = 10000
+
+# The vocabulary of cached term vectors is compacted to the terms of cached
+# documents once it has grown by this factor since the last compaction.
+_VOCABULARY_GROWTH_FACTOR = 2
+
 
 class PrfType(Enum):
     RM3 = "RM3"
@@ -28,6 +42,17 @@ class PRF(abc.ABC):
         """Expands given query with additional terms."""
         raise NotImplementedError
 
+    def get_expanded_queries(self, queries: List[Query]) -> List[SparseQuery]:
+        """Expands given queries with additional terms.
+
+        Args:
+            queries: Queries to expand.
+
+        Returns:
+            List of expanded queries.
+        """
+        return [self.get_expanded_query(query) for query in queries]
+
     def interpolate_terms(
         self,
         weighted_terms: _WeightedTerms,
@@ -42,14 +67,11 @@ class PRF(abc.ABC):
             lam: Weight ratio between old and new terms. If <0.5, new terms will
               be rated higher than old ones.
         """
-        terms = dict.fromkeys(
-            weighted_terms.keys() | weighted_terms_to_add.keys(), 0
-        )
-        for term in terms:
-            terms[term] = lam * weighted_terms.get(term, 0) + (
-                1 - lam
-            ) * weighted_terms_to_add.get(term, 0)
-        return terms
+        return {
+            term: lam * weighted_terms.get(term, 0)
+            + (1 - lam) * weighted_terms_to_add.get(term, 0)
+            for term in chain(weighted_terms, weighted_terms_to_add)
+        }
 
 
 class RM3(PRF):
@@ -58,6 +80,7 @@ class RM3(PRF):
         retriever: BM25Retriever,
         prf_num_documents: int = 10,
         prf_num_terms: int = 10,
+        term_vector_cache_size: int = DEFAULT_TERM_VECTOR_CACHE_SIZE,
     ) -> None:
         """Pseudo relevance feedback based on RM3 algorithm.
 
@@ -70,10 +93,19 @@ class RM3(PRF):
               (defaults to 10).
             prf_num_terms: Number of top scoring terms to use for prf
               (defaults to 10).
+            term_vector_cache_size: Maximum number of document term vectors
+              kept in memory across queries; least recently used ones are
+              evicted first (defaults to 10000).
         """
         super().__init__(retriever)
         self.prf_num_documents = prf_num_documents
         self.prf_num_terms = prf_num_terms
+        self.term_vector_cache_size = term_vector_cache_size
+        self._term_vectors: Dict[str, _TermVector] = OrderedDict()
+        # Vocabulary shared by the cached term vectors.
+        self._vocabulary: Dict[str, int] = {}
+        self._vocabulary_terms: List[str] = []
+        self._compacted_vocabulary_size = 0
 
     def get_expanded_query(self, query: Query) -> SparseQuery:
         """Returns expanded sparse query.
@@ -84,59 +116,269 @@ class RM3(PRF):
         Returns:
             Sparse query containing expanded list of weighted terms.
         """
-        if isinstance(query, SparseQuery):
-            query_terms = self.retriever.simplify_query(query).weighted_terms
-        else:
-            query_terms = Counter(self.retriever.analyze_query(query.question))
-        rm3_terms = self._get_top_collection_terms(query)
-        return SparseQuery(
-            query.query_id,
-            query.question,
-            self.interpolate_terms(query_terms, rm3_terms),
-        )
+        return self.get_expanded_queries([query])[0]
 
-    def _get_top_collection_terms(self, query: Query) -> Dict[str, float]:
+    def get_expanded_queries(self, queries: List[Query]) -> List[SparseQuery]:
+        """Returns expanded sparse queries.
+
+        Feedback documents of all queries are retrieved with a single batch
+        search and their term vectors are fetched with a single request.
+
+        Args:
+            queries: Queries to use for the initial query retrieval.
+
+        Returns:
+            List of sparse queries containing expanded lists of weighted terms.
+        """
+        # Feedback terms are computed first, as the request for feedback
+        # documents also analyzes the questions of the queries.
+        rm3_terms = self._get_top_collection_terms(queries)
+        expanded_queries = []
+        for query, query_rm3_terms in zip(queries, rm3_terms):
+            if isinstance(query, SparseQuery):
+                query_terms = self.retriever.simplify_query(
+                    query
+                ).weighted_terms
+            else:
+                query_terms = Counter(
+                    self.retriever.analyze_query(query.question)
+                )
+            expanded_queries.append(
+                SparseQuery(
+                    query.query_id,
+                    query.question,
+                    self.interpolate_terms(query_terms, query_rm3_terms),
+                )
+            )
+        return expanded_queries
+
+    def _get_top_collection_terms(
+        self, queries: List[Query]
+    ) -> List[Dict[str, float]]:
         """Returns top terms and weights associated with each term.
 
         Number of documents to consider and number of terms to take are
         specified in self.num_documents and self.num_terms respectively.
 
+        The feedback documents of all queries form a sparse document-term
+        matrix over the vocabulary of cached term vectors, with term
+        frequencies normalized by document length. The relevance models are
+        its product with a sparse query-document matrix of document scores.
+        Terms with equal weights are ordered by their first occurrence in the
+        feedback documents.
+
         Args:
-            query: Query for the initial retrieval.
+            queries: Queries for the initial retrieval.
 
         Returns:
-            A dictionary with weighted terms according to the RM3 algorithm.
+            A dictionary with weighted terms according to the RM3 algorithm
+            for each query.
         """
-        fbWeights = defaultdict(float)
-        top_ranked_documents: List[Dict[str, Any]] = self.retriever.retrieve(
-            query,
-            num_results=self.prf_num_documents,
-            source=False,
-        ).fetch_topk_docs(self.prf_num_documents)
-
-        for doc in top_ranked_documents:
-            tv: Dict[str, Any] = self.retriever._collection.es.termvectors(
-                index=self.retriever._collection.index_name,
-                id=doc.doc_id,
-                fields=self.retriever._field,
-                field_statistics=False,
-                offsets=False,
-                payloads=False,
-                positions=False,
-                term_statistics=False,
-            )["term_vectors"][self.retriever._field]["terms"]
-            doc_length = sum(stats["term_freq"] for stats in tv.values())
-            for term, payload in tv.items():
-                fbWeights[term] += (
-                    payload["term_freq"] / doc_length * doc.score
+        rankings = [
+            ranking.fetch_topk_docs(self.prf_num_documents)
+            for ranking in self.retriever.batch_retrieve(
+                queries, num_results=self.prf_num_documents, source=False
+            )
+        ]
+        texts = list(
+            dict.fromkeys(
+                query.question
+                for query in queries
+                if not isinstance(query, SparseQuery)
+                and query.question not in self.retriever._analysis_cache
+            )
+        )
+        term_vectors = self._get_term_vectors(
+            [doc.doc_id for ranking in rankings for doc in ranking], texts
+        )
+        if not term_vectors:
+            return [{} for _ in queries]
+
+        counts = [len(ids) for ids, _, _ in term_vectors]
+        term_ids = np.concatenate([ids for ids, _, _ in term_vectors])
+        term_freqs = np.concatenate([tfs for _, tfs, _ in term_vectors])
+        doc_lengths = np.repeat(
+            [length for _, _, length in term_vectors], counts
+        )
+        vocabulary_size = len(self._vocabulary_terms)
+        doc_term_matrix = csr_matrix(
+            (term_freqs / doc_lengths, term_ids, np.cumsum([0] + counts)),
+            shape=(len(term_vectors), vocabulary_size),
+        )
+        ranking_lengths = [len(ranking) for ranking in rankings]
+        query_doc_matrix = csr_matrix(
+            (
+                np.array(
+                    [doc.score for ranking in rankings for doc in ranking],
+                    dtype=float,
+                ),
+                np.arange(len(term_vectors)),
+                np.cumsum([0] + ranking_lengths),
+            ),
+            shape=(len(queries), len(term_vectors)),
+        )
+        fb_weights = query_doc_matrix @ doc_term_matrix
+        fb_weights.sort_indices()
+
+        # Position of the first occurrence of each term of a query, with
+        # terms identified by query index and vocabulary ID.
+        keys = (
+            np.repeat(
+                np.repeat(np.arange(len(queries)), ranking_lengths), counts
+            )
+            * vocabulary_size
+            + term_ids
+        )
+        unique_keys, first = np.unique(keys, return_index=True)
+        weight_keys = (
+            np.repeat(np.arange(len(queries)), np.diff(fb_weights.indptr))
+            * vocabulary_size
+            + fb_weights.indices
+        )
+        ranks = first[np.searchsorted(unique_keys, weight_keys)]
+
+        top_terms = []
+        for start, end in zip(fb_weights.indptr[:-1], fb_weights.indptr[1:]):
+            top = start + self._get_top_indices(
+                fb_weights.data[start:end],
+                ranks[start:end],
+                self.prf_num_terms,
+            )
+            top_weights = fb_weights.data[top].tolist()
+            total_weights = sum(top_weights)
+            top_terms.append(
+                {
+                    self._vocabulary_terms[term_id]: fb_weight / total_weights
+                    for term_id, fb_weight in zip(
+                        fb_weights.indices[top], top_weights
+                    )
+                }
+            )
+        return top_terms
+
+    @staticmethod
+    def _get_top_indices(
+        weights: np.ndarray, ranks: np.ndarray, k: int
+    ) -> np.ndarray:
+        """Returns indices of the k largest weights in descending order.
+
+        Args:
+            weights: Weights.
+            ranks: Values used to order equal weights (ascending).
+            k: Number of indices to return.
+
+        Returns:
+            Array of indices.
+        """
+        if k < len(weights):
+            threshold = weights[np.argpartition(-weights, k - 1)[:k]].min()
+            candidates = np.flatnonzero(weights >= threshold)
+        else:
+            candidates = np.arange(len(weights))
+        return candidates[
+            np.lexsort((ranks[candidates], -weights[candidates]))
+        ][:k]
+
+    def _get_term_vectors(
+        self, doc_ids: List[str], texts: List[str] = None
+    ) -> List[_TermVector]:
+        """Returns term frequencies and lengths of documents.
+
+        Term vectors missing from the cache are fetched from the collection
+        with a single request, which also analyzes the given texts and adds
+        them to the analysis cache of the retriever. The cache keeps at most
+        self.term_vector_cache_size documents, and its vocabulary is compacted
+        once it has doubled since the last compaction.
+
+        Args:
+            doc_ids: Document IDs.
+            texts (optional): Texts to analyze in the same request.
+
+        Returns:
+            List of (term vocabulary IDs, term frequencies, document length)
+            tuples parallel to doc_ids.
+        """
+        if (
+            len(self._vocabulary_terms)
+            > _VOCABULARY_GROWTH_FACTOR * self._compacted_vocabulary_size
+        ):
+            self._compact_vocabulary()
+        missing = [
+            doc_id
+            for doc_id in dict.fromkeys(doc_ids)
+            if doc_id not in self._term_vectors
+        ]
+        fetched = {}
+        if missing or texts:
+            (
+                analyzed_texts,
+                fetched_vectors,
+            ) = self.retriever._collection.analyze_and_get_term_vectors(
+                texts or [], missing, field=self.retriever._field
+            )
+            for text, tokens in zip(texts or [], analyzed_texts):
+                self.retriever.cache_analysis(text, tokens)
+            fetched = dict(zip(missing, fetched_vectors))
+        term_vectors = []
+        for doc_id in doc_ids:
+            if doc_id in fetched:
+                term_freqs = fetched[doc_id]
+                entry = (
+                    self._get_vocabulary_ids(term_freqs),
+                    np.fromiter(term_freqs.values(), dtype=int),
+                    sum(term_freqs.values()),
                 )
+                self._term_vectors[doc_id] = entry
+            else:
+                entry = self._term_vectors[doc_id]
+                self._term_vectors.move_to_end(doc_id)
+            term_vectors.append(entry)
+        while len(self._term_vectors) > self.term_vector_cache_size:
+            self._term_vectors.popitem(last=False)
+        return term_vectors
 
-        sorted_query_terms = sorted(
-            fbWeights.items(), key=lambda item: item[1], reverse=True
-        )[: self.prf_num_terms]
-        total_weights = sum(fbWeight for _, fbWeight in sorted_query_terms)
+    def _compact_vocabulary(self) -> None:
+        """Removes terms that no cached term vector contains from the
+        vocabulary and renumbers the remaining terms.
 
-        return {
-            term: fbWeight / total_weights
-            for term, fbWeight in sorted_query_terms
+        Without compaction, the vocabulary (and the width of the document-term
+        matrix) would keep growing with the terms of evicted documents.
+        """
+        term_ids = np.unique(
+            np.concatenate(
+                [ids for ids, _, _ in self._term_vectors.values()]
+                or [np.zeros(0, dtype=int)]
+            )
+        )
+        new_ids = np.zeros(len(self._vocabulary_terms), dtype=int)
+        new_ids[term_ids] = np.arange(len(term_ids))
+        self._vocabulary_terms = [
+            self._vocabulary_terms[term_id] for term_id in term_ids
+        ]
+        self._vocabulary = {
+            term: term_id for term_id, term in enumerate(self._vocabulary_terms)
         }
+        for doc_id, (ids, term_freqs, length) in list(
+            self._term_vectors.items()
+        ):
+            self._term_vectors[doc_id] = (new_ids[ids], term_freqs, length)
+        self._compacted_vocabulary_size = len(self._vocabulary_terms)
+
+    def _get_vocabulary_ids(self, terms: List[str]) -> np.ndarray:
+        """Returns vocabulary IDs of terms, adding new terms to the vocabulary.
+
+        Args:
+            terms: Terms.
+
+        Returns:
+            Array of vocabulary IDs.
+        """
+        for term in terms:
+            if term not in self._vocabulary:
+                self._vocabulary[term] = len(self._vocabulary_terms)
+                self._vocabulary_terms.append(term)
+        return np.fromiter(
+            (self._vocabulary[term] for term in terms),
+            dtype=int,
+            count=len(terms),
+        )
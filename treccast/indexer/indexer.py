@@ -10,7 +10,12 @@ Usage:
     the index.
 
     $ python indexer.py --ms_marco path/to/collection
+
+    Building a local inverted index (no Elasticsearch needed) of MS MARCO.
+
+    $ python indexer.py --ms_marco --local_index data/indices/ms_marco.npz
 """
+
 import argparse
 import itertools
 from typing import Any, Dict, Iterator
@@ -18,12 +23,14 @@ from typing import Any, Dict, Iterator
 import nltk
 from elasticsearch.helpers import parallel_bulk
 from nltk.corpus import stopwords
-from treccast.core.collection import ElasticSearchIndex
+from treccast.core.collection import (
+    DEFAULT_BM25_FIELDS,
+    ElasticSearchIndex,
+    InvertedIndex,
+)
 from treccast.core.util.data_generator import DataGeneratorMixin
 
-DEFAULT_MS_MARCO_PASSAGE_DATASET = (
-    "/data/collections/collection.tar.gz"
-)
+DEFAULT_MS_MARCO_PASSAGE_DATASET = "/data/collections/collection.tar.gz"
 DEFAULT_TREC_CAR_PARAGRAPH_DATASET = (
     "/data/collections/dedup.articles-paragraphs.cbor"
 )
@@ -156,6 +163,33 @@ def parse_cmdline_arguments() -> argparse.Namespace:
         action="store_true",
         help="Do not use custom Elasticsearch analyzer",
     )
+    parser.add_argument(
+        "--local_index",
+        type=str,
+        help=(
+            "Specifies the path of a local inverted index to build instead of"
+            " indexing into Elasticsearch"
+        ),
+    )
+    parser.add_argument(
+        "--bm25_parameters",
+        type=str,
+        nargs="+",
+        help=(
+            "Specifies comma-separated (b, k1) pairs, e.g., 0.4,0.9, for which"
+            " additional BM25 fields are created"
+        ),
+    )
+    parser.add_argument(
+        "--bm25_fields",
+        type=str,
+        nargs="+",
+        default=DEFAULT_BM25_FIELDS,
+        help=(
+            "Specifies the fields to create additional BM25 fields for"
+            " (defaults to body and catch_all)"
+        ),
+    )
     parser.add_argument(
         "-m",
         "--ms_marco",
@@ -188,11 +222,6 @@ def main(args):
         args: Arguments.
     """
     indexing = Indexer(args.index, args.host)
-    if args.reset:
-        indexing.delete_index()
-
-    indexing.create_index(use_analyzer=not args.no_analyzer)
-
     data_generators = []
     if args.ms_marco:
         data_generators.append(
@@ -210,6 +239,22 @@ def main(args):
             )
 
     data_generator = itertools.chain(*data_generators)
+    if args.local_index:
+        InvertedIndex.build(args.local_index, data_generator)
+        return
+
+    if args.reset:
+        indexing.delete_index()
+
+    bm25_parameters = [
+        tuple(float(value) for value in parameters.split(","))
+        for parameters in args.bm25_parameters or []
+    ]
+    indexing.create_index(
+        use_analyzer=not args.no_analyzer,
+        bm25_parameters=bm25_parameters,
+        bm25_fields=args.bm25_fields,
+    )
     documents = indexing.process_documents(data_generator)
     indexing.batch_index(documents)
 
@@ -1,24 +1,33 @@
-"""Main command line application."""
+"""Main command line application.
+
+Components (retrievers, expanders, rerankers, and their dependencies such as
+Elasticsearch, PyTerrier, and PyTorch) are imported only when the
+configuration requires them, to keep startup fast.
+"""
+
+from __future__ import annotations
 
 import argparse
 import csv
-from typing import List, Tuple, Union
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, List, Optional, Tuple, Union
 
 import confuse
-import pyterrier as pt
 
 from treccast.core.base import Query
-from treccast.core.collection import ElasticSearchIndex
 from treccast.core.ranking import CachedRanking, Ranking
 from treccast.core.topic import QueryRewrite, Topic
-from treccast.core.util.reciprocal_rank_fusion import ReciprocalRankFusion
-from treccast.expander.prf import PRF, RM3, PrfType
-from treccast.reranker.reranker import Reranker
-from treccast.reranker.t5_reranker import DuoT5Reranker, T5Reranker
-from treccast.retriever.ance_dense_retriever import ANCEDenseRetriever
-from treccast.retriever.bm25_retriever import BM25Retriever
-from treccast.retriever.retriever import CachedRetriever, Retriever
-from treccast.rewriter.rewriter import CachedRewriter, Rewriter
+from treccast.core.util.tracer import Tracer
+
+if TYPE_CHECKING:
+    from treccast.core.util.reciprocal_rank_fusion import (
+        ReciprocalRankFusion,
+    )
+    from treccast.expander.prf import PRF
+    from treccast.reranker.reranker import Reranker
+    from treccast.retriever.retriever import Retriever
+    from treccast.rewriter.rewriter import Rewriter
 
 DEFAULT_CONFIG_PATH = "config/defaults/{}.yaml"
 
@@ -32,6 +41,7 @@ def main(config: confuse.Configuration):
     Args:
         config: Configuration generated from YAML configuration file.
     """
+    start = time.perf_counter()
     query_rewrite = None
     if config["query_rewrite"].get():
         query_rewrite = QueryRewrite[config["query_rewrite"].get(str).upper()]
@@ -52,6 +62,10 @@ def main(config: confuse.Configuration):
     if isinstance(retriever, tuple):
         dense_retriever = retriever[1]
         retriever = retriever[0]
+        from treccast.core.util.reciprocal_rank_fusion import (
+            ReciprocalRankFusion,
+        )
+
         rrf = ReciprocalRankFusion(ploader=dense_retriever._passage_loader)
 
     expander = _get_expander(config, retriever)
@@ -70,8 +84,24 @@ def main(config: confuse.Configuration):
     second_reranker = None
     second_reranker_top_k = None
     if config["duot5"].get(bool):
+        from treccast.reranker.t5_reranker import DuoT5Reranker
+
         second_reranker = DuoT5Reranker()
         second_reranker_top_k = config["duot5_topk"].get()
+    print(f"Startup time: {time.perf_counter() - start:.2f}s")
+
+    year = config["year"].get()
+    output_name = config["output_name"].get()
+    profile_stage = config["profile_stage"].get()
+    tracer = Tracer(
+        (
+            f"data/runs/{year}/{output_name}.trace.jsonl"
+            if config["trace"].get(bool)
+            else None
+        ),
+        profile_stage=profile_stage,
+        profile_path=f"data/runs/{year}/{output_name}.{profile_stage}.prof",
+    )
 
     run(
         queries=queries,
@@ -88,6 +118,7 @@ def main(config: confuse.Configuration):
         ranking_cache=ranking_cache,
         dense_retriever=dense_retriever,
         rrf=rrf,
+        tracer=tracer,
     )
 
 
@@ -106,6 +137,7 @@ def run(
     ranking_cache: CachedRanking = None,
     dense_retriever: Retriever = None,
     rrf: ReciprocalRankFusion = None,
+    tracer: Tracer = None,
 ) -> None:
     """Iterates over queries to perform rewriting, retrieval, and re-ranking.
 
@@ -135,7 +167,10 @@ def run(
         dense_retriever: Dense retriever to use. Defaults to None.
         rrf: Reciprocal Rank Fusion object for fusing rankings. Defaults to
           None.
+        tracer: Tracer measuring the time of each stage. Defaults to a tracer
+          without trace file.
     """
+    tracer = tracer or Tracer()
     retrieved_query_ids = []
     with open(f"data/runs/{year}/{output_name}.trec", "w") as trec_out, open(
         f"data/first_pass/{year}/{output_name}.tsv", "w"
@@ -144,17 +179,31 @@ def run(
         tsv_writer.writerow(
             ["query_id", "query", "passage_id", "passage", "label"]
         )
-        for query in queries:
-            original_query = query
-
-            # Custom rewriter
-            if rewriter:
-                query = rewriter.rewrite_query(query)
+        # Custom rewriter
+        with tracer.stage("rewrite"):
+            rewritten_queries = (
+                [rewriter.rewrite_query(query) for query in queries]
+                if rewriter
+                else queries
+            )
 
-            rewritten_query = query
+        # Expansion of all queries at once
+        expanded_queries = rewritten_queries
+        if expander:
+            es_usage = _get_es_usage(retriever)
+            with tracer.stage("prf"):
+                expanded_queries = expander.get_expanded_queries(
+                    rewritten_queries
+                )
+            _count_es_usage(
+                tracer, retriever, es_usage, f"expanding {len(queries)} queries"
+            )
 
-            if expander:
-                query = expander.get_expanded_query(query)
+        for original_query, rewritten_query, query in zip(
+            queries, rewritten_queries, expanded_queries
+        ):
+            tracer.start_turn(query.query_id)
+            es_usage = _get_es_usage(retriever)
 
             # Retrieval
             ranking = run_retrieval(
@@ -166,7 +215,9 @@ def run(
                 dense_retriever=dense_retriever,
                 rrf=rrf,
                 ranking_cache=ranking_cache,
+                tracer=tracer,
             )
+            _count_es_usage(tracer, retriever, es_usage, query.query_id)
 
             # Re-ranking
             ranking = run_reranking(
@@ -177,18 +228,85 @@ def run(
                 second_reranker=second_reranker,
                 second_reranker_top_k=second_reranker_top_k,
                 ranking=ranking,
+                tracer=tracer,
             )
 
             # Save results
-            ranking.write_to_tsv_file(tsv_writer, query.question, k=k)
-            ranking.write_to_trec_file(
-                trec_out,
-                run_id="BM25",
-                k=k,
-                remove_passage_id=(year == "2021"),
-            )
+            with tracer.stage("write"):
+                ranking.write_to_tsv_file(tsv_writer, query.question, k=k)
+                ranking.write_to_trec_file(
+                    trec_out,
+                    run_id="BM25",
+                    k=k,
+                    remove_passage_id=(year == "2021"),
+                )
+            tracer.end_turn()
 
             retrieved_query_ids.append(query.query_id)
+    print(tracer.close())
+
+
+def _get_es_usage(retriever: Retriever) -> Optional[Tuple[int, int]]:
+    """Returns the number of requests sent to the Elasticsearch index of a
+    retriever and the total size of its responses.
+
+    Args:
+        retriever: First-pass retrieval model.
+
+    Returns:
+        Number of requests and response bytes, or None if the retriever does
+        not use an Elasticsearch index.
+    """
+    from treccast.core.collection import ElasticSearchIndex
+
+    collection = getattr(retriever, "_collection", None)
+    if not isinstance(collection, ElasticSearchIndex):
+        return None
+    return collection.request_count, collection.response_bytes
+
+
+def _count_es_usage(
+    tracer: Tracer,
+    retriever: Retriever,
+    es_usage: Optional[Tuple[int, int]],
+    description: str,
+) -> None:
+    """Adds the Elasticsearch requests and response bytes since a previous
+    measurement to the tracer, and prints the number of requests.
+
+    Args:
+        tracer: Tracer.
+        retriever: First-pass retrieval model.
+        es_usage: Previous result of `_get_es_usage`.
+        description: Description of what the requests were for.
+    """
+    if es_usage is None:
+        return
+    requests, response_bytes = (
+        current - previous
+        for current, previous in zip(_get_es_usage(retriever), es_usage)
+    )
+    tracer.count("es_requests", requests)
+    tracer.count("es_bytes", response_bytes)
+    print(f"Elasticsearch requests for {description}: {requests}")
+
+
+def _timed_retrieve(
+    retriever: Retriever, query: Query, k: int
+) -> Tuple[Ranking, float]:
+    """Performs retrieval and measures its latency.
+
+    Args:
+        retriever: Retrieval model.
+        query: Query instance.
+        k: Number of documents to retrieve.
+
+    Returns:
+        Tuple of the ranking and the latency in seconds.
+    """
+    start = time.perf_counter()
+    ranking = retriever.retrieve(query, num_results=k)
+    return ranking, time.perf_counter() - start
 
 
 def run_retrieval(
@@ -200,6 +318,7 @@ def run_retrieval(
     dense_retriever: Retriever,
     rrf: ReciprocalRankFusion,
     ranking_cache: CachedRanking,
+    tracer: Tracer = None,
 ) -> Ranking:
     """Runs retrieval component for a given query.
 
@@ -214,27 +333,49 @@ def run_retrieval(
           None.
         ranking_cache: Class that adds rankings from previous turns to the
           current candidate pool.
+        tracer (optional): Tracer measuring the time of each stage. Defaults
+          to None.
 
     Returns:
         Ranking returned by the first-pass retrieval.
     """
+    tracer = tracer or Tracer()
     if dense_retriever is not None:
-        # Sparse-dense retrieval
-        sparse_ranking = retriever.retrieve(sparse_query, num_results=k)
-        dense_ranking = dense_retriever.retrieve(dense_query, num_results=k)
-        ranking = rrf.reciprocal_rank_fusion(
-            [
-                (
-                    output_name.split("/")[-1] + "_sparse",
-                    sparse_ranking,
-                ),
-                (output_name.split("/")[-1] + "_dense", dense_ranking),
-            ]
+        # Sparse-dense retrieval, with both retrievers running concurrently.
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            sparse_future = executor.submit(
+                _timed_retrieve, retriever, sparse_query, k
+            )
+            dense_future = executor.submit(
+                _timed_retrieve, dense_retriever, dense_query, k
+            )
+            sparse_ranking, sparse_latency = sparse_future.result()
+            dense_ranking, dense_latency = dense_future.result()
+        tracer.add_time("sparse", sparse_latency)
+        tracer.add_time("dense", dense_latency)
+        print(
+            f"Retrieval latency for {sparse_query.query_id}: "
+            f"sparse {sparse_latency * 1000:.1f} ms, "
+            f"dense {dense_latency * 1000:.1f} ms"
         )
-    elif isinstance(retriever, CachedRetriever):
-        sparse_query, ranking = retriever.retrieve(sparse_query, num_results=k)
+        with tracer.stage("rrf"):
+            ranking = rrf.reciprocal_rank_fusion(
+                [
+                    (
+                        output_name.split("/")[-1] + "_sparse",
+                        sparse_ranking,
+                    ),
+                    (output_name.split("/")[-1] + "_dense", dense_ranking),
+                ]
+            )
+    elif _is_cached_retriever(retriever):
+        with tracer.stage("sparse"):
+            sparse_query, ranking = retriever.retrieve(
+                sparse_query, num_results=k
+            )
     else:
-        ranking = retriever.retrieve(sparse_query, num_results=k)
+        with tracer.stage("sparse"):
+            ranking = retriever.retrieve(sparse_query, num_results=k)
     if ranking_cache:
         ranking = ranking_cache.add_previous_turns(
             sparse_query.get_topic_id(), ranking
@@ -242,6 +383,20 @@ def run_retrieval(
     return ranking
 
 
+def _is_cached_retriever(retriever: Retriever) -> bool:
+    """Checks whether a retriever loads rankings from a file.
+
+    Args:
+        retriever: First-pass retrieval model.
+
+    Returns:
+        True if the retriever is a CachedRetriever.
+    """
+    from treccast.retriever.retriever import CachedRetriever
+
+    return isinstance(retriever, CachedRetriever)
+
+
 def run_reranking(
     query: Query,
     original_query: Query,
@@ -250,6 +405,7 @@ def run_reranking(
     second_reranker: Reranker,
     second_reranker_top_k: int,
     ranking: Ranking,
+    tracer: Tracer = None,
 ) -> Ranking:
     """Runs re-ranking component for a given query.
 
@@ -264,19 +420,28 @@ def run_reranking(
         second_reranker_top_k: Number of top documents in the ranking to be
           reranked by the second reranker.
         ranking: Ranking returned in first-pass retrieval.
+        tracer (optional): Tracer measuring the time of each stage. Defaults
+          to None.
 
     Returns:
         Reranked ranking.
     """
+    tracer = tracer or Tracer()
     rewritten_query = query
     if reranker:
         if reranker_rewriter:
             rewritten_query = reranker_rewriter.rewrite_query(original_query)
-        ranking = reranker.rerank(rewritten_query, ranking)
+        tracer.count("t5_pairs", len(ranking))
+        with tracer.stage("t5"):
+            ranking = reranker.rerank(rewritten_query, ranking)
         if second_reranker is not None:
-            ranking = second_reranker.rerank(
-                rewritten_query, ranking, second_reranker_top_k
-            )
+            # DuoT5 scores all ordered pairs of the top documents.
+            num_docs = min(second_reranker_top_k, len(ranking))
+            tracer.count("duot5_pairs", num_docs * (num_docs - 1))
+            with tracer.stage("duot5"):
+                ranking = second_reranker.rerank(
+                    rewritten_query, ranking, second_reranker_top_k
+                )
     return ranking
 
 
@@ -289,6 +454,8 @@ def _get_rewriter(path: str) -> Rewriter:
     Returns:
         Rewriter class containing rewrites.
     """
+    from treccast.rewriter.rewriter import CachedRewriter
+
     return CachedRewriter(path)
 
 
@@ -308,12 +475,31 @@ def _get_retriever(
     """
     first_pass_file = config["first_pass_file"].get()
     if first_pass_file:
+        from treccast.retriever.retriever import CachedRetriever
+
         return CachedRetriever(first_pass_file)
 
+    from treccast.core.collection import ElasticSearchIndex
+    from treccast.core.util.analyzer import Analyzer
+    from treccast.retriever.bm25_retriever import BM25Retriever
+
     # Can be expanded with more arguments
+    analyzer = None
+    if config["es"]["local_analyzer"].get(bool):
+        analyzer_terms = config["es"]["analyzer_terms"].get()
+        if analyzer_terms:
+            analyzer = Analyzer.load(analyzer_terms)
+        else:
+            # Local stemming only approximates KStem, hence unverified local
+            # analysis would miss index terms.
+            print(
+                "No verified analyzer terms (es.analyzer_terms), analyzing with"
+                " Elasticsearch."
+            )
     esi = ElasticSearchIndex(
         index_name=config["es"]["index_name"].get(),
         hostname=config["es"]["host_name"].get(),
+        analyzer=analyzer,
         timeout=120,
     )
 
@@ -326,8 +512,8 @@ def _get_retriever(
 
     if config["ance"].get(bool):
         print("*** ANCE dense retrieval ***")
-        if not pt.started():
-            pt.init()
+        from treccast.retriever.ance_dense_retriever import ANCEDenseRetriever
+
         print(config["ance_index"].get())
         ance_retriever = ANCEDenseRetriever(
             index_path=config["ance_index"].get(),
@@ -353,7 +539,12 @@ def _get_expander(config: confuse.Configuration, retriever: Retriever) -> PRF:
         The constructed class for query expansion.
     """
     prf_type = config["prf"]["type"].get()
-    if prf_type and PrfType[prf_type] == PrfType.RM3:
+    if not prf_type:
+        return None
+
+    from treccast.expander.prf import RM3, PrfType
+
+    if PrfType[prf_type] == PrfType.RM3:
         return RM3(
             retriever,
             config["prf"]["num_documents"].get(),
@@ -377,6 +568,8 @@ def _get_reranker(config: confuse.Configuration) -> Reranker:
     """
     reranker = config["reranker"].get()
     if reranker == "t5":
+        from treccast.reranker.t5_reranker import T5Reranker
+
         return T5Reranker()
     elif reranker:
         raise ValueError('Unsupported re-ranker. Use "t5".')
@@ -530,6 +723,33 @@ def parse_args(args: List[str] = None) -> argparse.Namespace:
             "Defaults to 50."
         ),
     )
+    # Instrumentation specific config
+    instrumentation_group = parser.add_argument_group("Instrumentation")
+    instrumentation_group.add_argument(
+        "--trace",
+        action="store_const",
+        const=True,
+        help=(
+            "Writes stage times and counters of each turn to a JSONL trace "
+            "next to the run file. Defaults to False."
+        ),
+    )
+    instrumentation_group.add_argument(
+        "--profile_stage",
+        choices=[
+            "rewrite",
+            "prf",
+            "sparse",
+            "rrf",
+            "t5",
+            "duot5",
+            "write",
+        ],
+        help=(
+            "Profiles a stage with cProfile and saves the statistics next to "
+            "the run file. Defaults to None."
+        ),
+    )
     return parser.parse_args(args)
 
 
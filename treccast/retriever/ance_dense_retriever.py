@@ -4,10 +4,11 @@ import argparse
 import logging
 import os
 import shutil
+import time
 from itertools import chain
+from typing import Any, Dict, Iterator, List
 
-import pyterrier as pt
-import pyterrier_ance
+import pandas as pd
 from treccast.core.base import Query, ScoredDocument
 from treccast.core.ranking import Ranking
 from treccast.core.util.file_parser import FileParser
@@ -23,7 +24,8 @@ _DEFAULT_LOCATION_OF_ANCE_INDEX = (
 
 _DEFAULT_LOCATION_OF_COLLECTIONS = "/data/collections/"
 
-os.environ["JAVA_HOME"] = "/usr/lib/jvm/java-11-openjdk-amd64"
+# Java installation used by PyTerrier unless JAVA_HOME is already set.
+_DEFAULT_JAVA_HOME = "/usr/lib/jvm/java-11-openjdk-amd64"
 
 logging.basicConfig(
     level=logging.INFO,
@@ -62,51 +64,60 @@ class ANCEDenseRetriever(Retriever):
               Defaults to 1000.
             collections: Path to the directory containing trecweb files.
         """
-        if year == "2021":
-            self._kilt_dataset = pt.get_dataset("irds:kilt")
-            self._marco_document_dataset = pt.get_dataset(
-                "irds:msmarco-document"
-            )
-            self._dataset_iter = chain(
-                self.trecweb_file_generator(
-                    f"{collections}/kilt_knowledgesource.trecweb"
-                ),
-                self.trecweb_file_generator(
-                    f"{collections}/msmarco-docs.trecweb"
-                ),
-                self.trecweb_file_generator(
-                    f"{collections}/TREC_Washington_Post_collection.v4.trecweb"
-                ),
-            )
-        elif year == "2020":
-            self._trec_car_dataset = pt.get_dataset("irds:car/v2.0")
-            self._marco_passage_dataset = pt.get_dataset("irds:msmarco-passage")
-            self._dataset_iter = chain(
-                self.trec_car_generator(),
-                self.ms_marco_passage_generator(),
-            )
+        start = time.perf_counter()
+        self._index_path = index_path
+        self._k = k
+        self._ance_retriever = None
 
         if reset_index and os.path.isdir(index_path):
             logging.info("--- Resetting index ---")
             shutil.rmtree(index_path)
 
         if not os.path.isdir(index_path):
-            logging.info("--- Starting indexing ---")
-            indexer = pyterrier_ance.ANCEIndexer(
+            self._build_index(year, collections)
+
+        self._passage_loader = PassageLoader(es_host_name, es_index_name)
+        logging.info(
+            "ANCE retriever initialized in %.2fs", time.perf_counter() - start
+        )
+
+    @property
+    def ance_retriever(self) -> Any:
+        """ANCE retrieval transformer, loaded on first access."""
+        if self._ance_retriever is None:
+            start = time.perf_counter()
+            _init_pyterrier()
+            import pyterrier_ance
+
+            self._ance_retriever = pyterrier_ance.ANCERetrieval(
                 checkpoint_path=_DENSE_RETRIEVAL_MODEL_CHECKPOINT,
-                index_path=index_path,
-                verbose=False,
+                index_path=self._index_path,
+                num_results=self._k,
             )
-            indexer.index(self._dataset_iter)
-            del indexer
+            logging.info(
+                "ANCE model and index loaded in %.2fs",
+                time.perf_counter() - start,
+            )
+        return self._ance_retriever
+
+    def _build_index(self, year: str, collections: str) -> None:
+        """Builds the ANCE index from the collection of a year.
 
-        self.ance_retriever = pyterrier_ance.ANCERetrieval(
+        Args:
+            year: Year of the collection.
+            collections: Path to the directory containing trecweb files.
+        """
+        logging.info("--- Starting indexing ---")
+        _init_pyterrier()
+        import pyterrier_ance
+
+        indexer = pyterrier_ance.ANCEIndexer(
             checkpoint_path=_DENSE_RETRIEVAL_MODEL_CHECKPOINT,
-            index_path=index_path,
-            num_results=k,
+            index_path=self._index_path,
+            verbose=False,
         )
-
-        self._passage_loader = PassageLoader(es_host_name, es_index_name)
+        indexer.index(get_collection_iter(year, collections))
+        del indexer
 
     def retrieve(self, query: Query, num_results: int = 1000) -> Ranking:
         """Performs retrieval.
@@ -119,50 +130,143 @@ class ANCEDenseRetriever(Retriever):
         Returns:
             Document ranking.
         """
+        return self.batch_retrieve([query], num_results=num_results)[0]
 
-        print(
-            "Retrieving using query:\n",
-            str(query),
-            "\n",
-        )
+    def batch_retrieve(
+        self, queries: List[Query], num_results: int = 1000
+    ) -> List[Ranking]:
+        """Performs retrieval for a list of queries.
 
-        retrieved_results = (self.ance_retriever % num_results).search(
-            query.question
-        )
-        retrieved_results = retrieved_results.reset_index()
+        All queries are encoded in one forward pass and the ANN index is
+        searched once with the matrix of query embeddings. Passage contents
+        are loaded with a single mget request; passages not found in the
+        index are left out of the rankings.
+
+        Args:
+            queries: List of input queries.
+            num_results (optional): Number of documents to return per query
+              (defaults to 1000).
 
-        ranking = Ranking(query.query_id)
-        for _, row in retrieved_results.iterrows():
-            content = self._passage_loader.get(row["docno"])
+        Returns:
+            List of rankings corresponding to the list of input queries.
+        """
+        for query in queries:
+            print(
+                "Retrieving using query:\n",
+                str(query),
+                "\n",
+            )
+        if not queries:
+            return []
+
+        # Positions are used as query IDs, as query IDs may repeat.
+        topics = pd.DataFrame(
+            {
+                "qid": [str(i) for i in range(len(queries))],
+                "query": [query.question for query in queries],
+            }
+        )
+        results = (self.ance_retriever % num_results).transform(topics)
+        positions = results["qid"].to_numpy().astype(int)
+        doc_ids = results["docno"].to_numpy().tolist()
+        scores = results["score"].to_numpy(dtype=float)
+        contents = self._passage_loader.mget(doc_ids)
+
+        rankings = [Ranking(query.query_id) for query in queries]
+        for position, doc_id, score, content in zip(
+            positions.tolist(), doc_ids, scores.tolist(), contents
+        ):
             if content is not None:
-                ranking.add_doc(
-                    ScoredDocument(
-                        doc_id=row["docno"],
-                        score=row["score"],
-                        content=content,
-                    )
+                rankings[position].add_doc(
+                    ScoredDocument(doc_id=doc_id, score=score, content=content)
                 )
-        return ranking
+        return rankings
 
-    def trecweb_file_generator(self, filepath: str):
-        for _, (passage_id, _, passage) in enumerate(
-            FileParser.parse(filepath)
-        ):
-            yield {"docno": passage_id, "text": passage}
 
-    def trec_car_generator(self):
-        for doc in self._trec_car_dataset.get_corpus_iter(verbose=False):
-            docno = "CAR_" + str(doc["docno"])
-            text = doc["text"].replace("\n", " ")
+def _init_pyterrier() -> None:
+    """Starts PyTerrier (and the JVM) if it is not started yet."""
+    import pyterrier as pt
+
+    os.environ.setdefault("JAVA_HOME", _DEFAULT_JAVA_HOME)
+    if not pt.started():
+        pt.init()
 
-            yield {"docno": docno, "text": text}
 
-    def ms_marco_passage_generator(self):
-        for doc in self._marco_passage_dataset.get_corpus_iter(verbose=False):
-            docno = "MARCO_" + str(doc["docno"])
-            text = doc["text"].replace("\n", " ")
+def trecweb_file_generator(filepath: str) -> Iterator[Dict[str, str]]:
+    """Yields passages of a trecweb file.
 
-            yield {"docno": docno, "text": text}
+    Args:
+        filepath: Path to the trecweb file.
+
+    Yields:
+        Dictionaries with passage ID ("docno") and text.
+    """
+    for _, (passage_id, _, passage) in enumerate(FileParser.parse(filepath)):
+        yield {"docno": passage_id, "text": passage}
+
+
+def trec_car_generator(dataset: Any) -> Iterator[Dict[str, str]]:
+    """Yields paragraphs of TREC CAR.
+
+    Args:
+        dataset: PyTerrier TREC CAR dataset.
+
+    Yields:
+        Dictionaries with prefixed paragraph ID ("docno") and text.
+    """
+    for doc in dataset.get_corpus_iter(verbose=False):
+        docno = "CAR_" + str(doc["docno"])
+        text = doc["text"].replace("\n", " ")
+
+        yield {"docno": docno, "text": text}
+
+
+def ms_marco_passage_generator(dataset: Any) -> Iterator[Dict[str, str]]:
+    """Yields passages of MS MARCO.
+
+    Args:
+        dataset: PyTerrier MS MARCO passage dataset.
+
+    Yields:
+        Dictionaries with prefixed passage ID ("docno") and text.
+    """
+    for doc in dataset.get_corpus_iter(verbose=False):
+        docno = "MARCO_" + str(doc["docno"])
+        text = doc["text"].replace("\n", " ")
+
+        yield {"docno": docno, "text": text}
+
+
+def get_collection_iter(
+    year: str, collections: str = _DEFAULT_LOCATION_OF_COLLECTIONS
+) -> Iterator[Dict[str, str]]:
+    """Returns an iterator over the passages of the collection of a year.
+
+    Args:
+        year: Year of the collection.
+        collections (optional): Path to the directory containing trecweb
+          files (used for 2021).
+
+    Returns:
+        Iterator of dictionaries with passage ID ("docno") and text.
+    """
+    if year == "2021":
+        return chain(
+            trecweb_file_generator(
+                f"{collections}/kilt_knowledgesource.trecweb"
+            ),
+            trecweb_file_generator(f"{collections}/msmarco-docs.trecweb"),
+            trecweb_file_generator(
+                f"{collections}/TREC_Washington_Post_collection.v4.trecweb"
+            ),
+        )
+    _init_pyterrier()
+    import pyterrier as pt
+
+    return chain(
+        trec_car_generator(pt.get_dataset("irds:car/v2.0")),
+        ms_marco_passage_generator(pt.get_dataset("irds:msmarco-passage")),
+    )
 
 
 def parse_cmdline_arguments() -> argparse.Namespace:
@@ -194,7 +298,7 @@ def parse_cmdline_arguments() -> argparse.Namespace:
         help=(
             "If true, resets the index that is in the given location. Defaults"
             "to False.",
-        )
+        ),
     )
     parser.add_argument(
         "--es_host_name",
@@ -203,7 +307,7 @@ def parse_cmdline_arguments() -> argparse.Namespace:
         help=(
             "Name of host and port number for passage loader. Defaults to"
             "localhost:9204."
-        )
+        ),
     )
     parser.add_argument(
         "--es_index_name",
@@ -242,9 +346,6 @@ def main(args):
     # - Run the following command:
     # pip install --upgrade git+https://github.com/WerLaj/pyterrier_ance.git
 
-    if not pt.started():
-        pt.init()
-
     ance = ANCEDenseRetriever(
         index_path=args.index_name,
         year=args.year,
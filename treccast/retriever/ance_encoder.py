@@ -0,0 +1,153 @@
+"""Encodes queries and passages with the ANCE (FirstP) model.
+
+The encoder reproduces the RobertaDot_NLL_LN model of the ANCE checkpoint:
+the representation of the first token is projected by a linear layer and
+layer-normalized. Relevance is the inner product of query and passage
+embeddings.
+"""
+
+from typing import List
+
+import numpy as np
+import torch
+from torch import nn
+from transformers import RobertaConfig, RobertaModel, RobertaTokenizer
+
+_DENSE_RETRIEVAL_MODEL_CHECKPOINT = (
+    "data/retrieval/ance/Passage ANCE(FirstP) Checkpoint"
+)
+
+# Maximum number of tokens of encoded queries and passages.
+_QUERY_MAX_LENGTH = 64
+_PASSAGE_MAX_LENGTH = 512
+
+
+class _RobertaDot(nn.Module):
+    def __init__(self, config: RobertaConfig) -> None:
+        """Instantiates the ANCE model architecture.
+
+        Args:
+            config: Configuration of the underlying RoBERTa model.
+        """
+        super().__init__()
+        self.roberta = RobertaModel(config, add_pooling_layer=False)
+        self.embeddingHead = nn.Linear(config.hidden_size, 768)
+        self.norm = nn.LayerNorm(768)
+
+    def forward(
+        self, input_ids: torch.Tensor, attention_mask: torch.Tensor
+    ) -> torch.Tensor:
+        """Returns the embeddings of a batch of token sequences."""
+        output = self.roberta(
+            input_ids=input_ids, attention_mask=attention_mask
+        )
+        return self.norm(self.embeddingHead(output[0][:, 0]))
+
+
+class ANCEEncoder:
+    def __init__(
+        self,
+        checkpoint_path: str = _DENSE_RETRIEVAL_MODEL_CHECKPOINT,
+        device: str = None,
+    ) -> None:
+        """Instantiates an ANCE encoder from a checkpoint.
+
+        Args:
+            checkpoint_path (optional): Path to the ANCE checkpoint directory.
+              Defaults to "data/retrieval/ance/Passage ANCE(FirstP)
+              Checkpoint".
+            device (optional): Torch device. Defaults to CUDA if available,
+              CPU otherwise.
+
+        Raises:
+            RuntimeError: If the checkpoint lacks weights of the model.
+        """
+        self._device = device or (
+            "cuda" if torch.cuda.is_available() else "cpu"
+        )
+        self._tokenizer = RobertaTokenizer.from_pretrained(checkpoint_path)
+        config = RobertaConfig.from_pretrained(checkpoint_path)
+        self._model = _RobertaDot(config)
+        state_dict = torch.load(
+            f"{checkpoint_path}/pytorch_model.bin", map_location="cpu"
+        )
+        # The checkpoint has extra weights (e.g., of the unused pooler), but
+        # none of the model may be left randomly initialized.
+        missing_keys = self._model.load_state_dict(
+            state_dict, strict=False
+        ).missing_keys
+        if missing_keys:
+            raise RuntimeError(
+                f"Weights missing from ANCE checkpoint {checkpoint_path}: "
+                f"{', '.join(missing_keys)}"
+            )
+        self._model.to(self._device)
+        self._model.eval()
+
+    @property
+    def dim(self) -> int:
+        """Dimension of the embeddings."""
+        return self._model.norm.normalized_shape[0]
+
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Encodes queries.
+
+        Args:
+            queries: Query texts.
+
+        Returns:
+            Float32 matrix with one embedding per query.
+        """
+        return self._encode(queries, _QUERY_MAX_LENGTH)
+
+    def encode_passages(self, passages: List[str]) -> np.ndarray:
+        """Encodes passages.
+
+        Args:
+            passages: Passage texts.
+
+        Returns:
+            Float32 matrix with one embedding per passage.
+        """
+        return self._encode(passages, _PASSAGE_MAX_LENGTH)
+
+    def count_passage_tokens(self, passages: List[str]) -> List[int]:
+        """Returns the number of tokens of encoded passages.
+
+        Args:
+            passages: Passage texts.
+
+        Returns:
+            Number of tokens of each passage after truncation.
+        """
+        return [
+            len(input_ids)
+            for input_ids in self._tokenizer(
+                passages, max_length=_PASSAGE_MAX_LENGTH, truncation=True
+            )["input_ids"]
+        ]
+
+    def _encode(self, texts: List[str], max_length: int) -> np.ndarray:
+        """Encodes texts in one forward pass.
+
+        Args:
+            texts: Texts.
+            max_length: Maximum number of tokens per text.
+
+        Returns:
+            Float32 matrix with one embedding per text.
+        """
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        inputs = self._tokenizer(
+            texts,
+            max_length=max_length,
+            padding=True,
+            truncation=True,
+            return_tensors="pt",
+        ).to(self._device)
+        with torch.no_grad():
+            embeddings = self._model(
+                inputs["input_ids"], inputs["attention_mask"]
+            )
+        return embeddings.cpu().numpy().astype(np.float32)
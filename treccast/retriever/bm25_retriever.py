@@ -1,35 +1,48 @@
-"""BM25 retrieval using ElasticSearch."""
+"""BM25 retrieval using ElasticSearch or a local inverted index."""
 
-from collections import defaultdict
-from typing import Any, Dict, List
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Tuple, Union
 
 from treccast.core.base import Query, ScoredDocument, SparseQuery
-from treccast.core.collection import ElasticSearchIndex
+from treccast.core.collection import ElasticSearchIndex, InvertedIndex
 from treccast.core.ranking import Ranking
 from treccast.retriever.retriever import Retriever
 
 _ESquery = Dict[str, Any]
 
+# Maximum number of analyzed texts kept in memory.
+ANALYSIS_CACHE_SIZE = 10000
+
 
 class BM25Retriever(Retriever):
     def __init__(
         self,
-        collection: ElasticSearchIndex,
+        collection: Union[ElasticSearchIndex, InvertedIndex],
         field: str = "body",
         k1: float = 1.2,
         b: float = 0.75,
     ) -> None:
-        """Initializes BM25 retrieval model based on Elasticsearch.
+        """Initializes BM25 retrieval model based on Elasticsearch or a local
+        inverted index.
+
+        If the index has a field scored with the given parameters (either the
+        field itself or a multi-field with a named similarity), it is queried
+        and the index settings are left untouched. Otherwise, the default
+        similarity of the index is updated, which requires closing the index.
 
         Args:
-            collection: ElasticSearch collection.
+            collection: ElasticSearch collection or local inverted index.
             field: Index field to query.
             k1: BM25 parameter (defaults to 1.2).
             b: BM25 parameter (defaults to 0.75).
         """
         self._collection = collection
-        self._collection.update_similarity_parameters(k1=k1, b=b)
         self._field = field
+        self._analysis_cache: Dict[str, List[str]] = OrderedDict()
+        self._score_field = self._collection.get_bm25_field(field, b=b, k1=k1)
+        if self._score_field is None:
+            self._collection.update_similarity_parameters(k1=k1, b=b)
+            self._score_field = field
 
     def simplify_query(self, query: SparseQuery) -> SparseQuery:
         """Converts weighted match queries to weighted terms.
@@ -68,6 +81,52 @@ class BM25Retriever(Retriever):
         Returns:
             Document ranking.
         """
+        query, es_query = self._get_es_query(query)
+        documents = self._retrieve(
+            query=es_query,
+            num_results=num_results,
+            source=source,
+        )
+
+        return Ranking(query.query_id, documents)
+
+    def batch_retrieve(
+        self, queries: List[Query], num_results: int = 1000, source=True
+    ) -> List[Ranking]:
+        """Performs retrieval for a list of queries using a single search
+        request.
+
+        Args:
+            queries: List of input queries.
+            num_results: Number of documents to return per query (defaults to
+              1000).
+            source: Whether to return document content (defaults to True).
+
+        Returns:
+            List of rankings corresponding to the list of input queries.
+        """
+        if not queries:
+            return []
+        queries, es_queries = zip(*map(self._get_es_query, queries))
+        return [
+            Ranking(query.query_id, documents)
+            for query, documents in zip(
+                queries,
+                self._collection.batch_search(
+                    list(es_queries), num_results=num_results, source=source
+                ),
+            )
+        ]
+
+    def _get_es_query(self, query: Query) -> Tuple[Query, _ESquery]:
+        """Returns Elasticsearch query for a query.
+
+        Args:
+            query: Query instance.
+
+        Returns:
+            Tuple of the (simplified) query and the Elasticsearch query.
+        """
         if isinstance(query, SparseQuery):
             query = self.simplify_query(query)
             es_query = self.bool_query(
@@ -82,14 +141,7 @@ class BM25Retriever(Retriever):
             str(query),
             "\n",
         )
-
-        documents = self._retrieve(
-            query=es_query,
-            num_results=num_results,
-            source=source,
-        )
-
-        return Ranking(query.query_id, documents)
+        return query, es_query
 
     def _retrieve(
         self,
@@ -107,38 +159,41 @@ class BM25Retriever(Retriever):
         Returns:
             List of scored documents.
         """
-        res = self._collection.es.search(
-            body={"query": query},
-            index=self._collection.index_name,
-            _source=source,
-            size=num_results,
+        return self._collection.search(
+            query, num_results=num_results, source=source
         )
 
-        return [
-            ScoredDocument(
-                doc_id=hit["_id"],
-                content=hit["_source"]["body"] if source else None,
-                score=hit["_score"],
-            )
-            for hit in res["hits"]["hits"]
-        ]
-
     def analyze_query(self, text: str) -> List[str]:
         """Parses text into a list of tokens which exist in the collection.
 
+        Analyzed texts are cached, so that repeated texts (e.g., match
+        queries of expanded queries) do not require a request to the
+        collection.
+
         Args:
             text: String to analyze.
 
         Returns:
             A list of tokens.
         """
-        return [
-            token["token"]
-            for token in self._collection.es.indices.analyze(
-                body={"text": text, "field": self._field},
-                index=self._collection.index_name,
-            )["tokens"]
-        ]
+        if text in self._analysis_cache:
+            self._analysis_cache.move_to_end(text)
+            return list(self._analysis_cache[text])
+        tokens = self._collection.analyze(text, field=self._field)
+        self.cache_analysis(text, tokens)
+        return list(tokens)
+
+    def cache_analysis(self, text: str, tokens: List[str]) -> None:
+        """Adds an analyzed text to the cache used by `analyze_query()`.
+
+        Args:
+            text: Analyzed string.
+            tokens: Tokens of the text.
+        """
+        self._analysis_cache[text] = tokens
+        self._analysis_cache.move_to_end(text)
+        while len(self._analysis_cache) > ANALYSIS_CACHE_SIZE:
+            self._analysis_cache.popitem(last=False)
 
     def match_query(self, query: str, weight: float = 1.0) -> _ESquery:
         """Simple elasticsearch match query.
@@ -150,7 +205,7 @@ class BM25Retriever(Retriever):
         Returns:
             Elasticsearch query.
         """
-        return {"match": {self._field: {"query": query, "boost": weight}}}
+        return {"match": {self._score_field: {"query": query, "boost": weight}}}
 
     def _term_query(self, term: str, weight: float = 1.0) -> _ESquery:
         """Sub-query for a single term to be used as part of a larger query.
@@ -162,7 +217,7 @@ class BM25Retriever(Retriever):
         Returns:
             Partial elasticsearch query.
         """
-        return {"term": {self._field: {"value": term, "boost": weight}}}
+        return {"term": {self._score_field: {"value": term, "boost": weight}}}
 
     def _phrase_query(self, phrase: str, weight: float = 1.0) -> _ESquery:
         """Sub-query for a single phrase to be used as part of a larger query.
@@ -175,7 +230,9 @@ class BM25Retriever(Retriever):
             Partial elasticsearch query.
         """
         return {
-            "match_phrase": {self._field: {"query": phrase, "boost": weight}}
+            "match_phrase": {
+                self._score_field: {"query": phrase, "boost": weight}
+            }
         }
 
     def bool_query(
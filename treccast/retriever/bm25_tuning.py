@@ -1,8 +1,287 @@
-import pandas as pd
-import numpy as np
+"""Tuning of BM25 parameters.
+
+The grid search retrieves a pool of candidate documents per query once, pulls
+the BM25 statistics of the query terms for the candidates, and rescores them
+for all (b, k1) combinations in memory. Rankings are evaluated in-process, so
+the index settings are never modified.
+
+Usage:
+    $ python -m treccast.retriever.bm25_tuning --year 2020 \
+        --es.host_name localhost:9204
+"""
+
+import argparse
+import math
 import os
-import matplotlib.pyplot as plt
 import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List
+
+import confuse
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from treccast.core.base import Query
+from treccast.core.collection import ElasticSearchIndex
+from treccast.core.qrel import Qrel
+from treccast.core.topic import QueryRewrite, Topic
+from treccast.core.util.evaluation import Evaluator
+
+# Parameter grid (previously swept by scripts/tune_bm25.sh).
+B_VALUES = np.round(np.arange(0.3, 0.95, 0.1), 1)
+K1_VALUES = np.round(np.arange(0.5, 2.05, 0.1), 1)
+
+_MTERMVECTORS_BATCH_SIZE = 500
+
+# Per-year defaults with the index name and field of the year's collection.
+_DEFAULT_CONFIG_PATH = "config/defaults/{}.yaml"
+
+# Lucene stores document lengths lossily in a single byte (see
+# SmallFloat.intToByte4); lengths below this value are stored exactly.
+_LUCENE_NUM_FREE_VALUES = 24
+
+
+@dataclass
+class QueryStatistics:
+    """BM25 statistics of the query terms for a pool of candidate documents.
+
+    Term statistics are taken from the shard of each document, which is what
+    Elasticsearch uses for scoring by default.
+    """
+
+    query_id: str
+    doc_ids: List[str]
+    # Term frequencies with shape (documents, terms).
+    term_freqs: np.ndarray
+    # IDF values with shape (documents, terms).
+    idfs: np.ndarray
+    # Number of times each term occurs in the query.
+    term_weights: np.ndarray
+    doc_lengths: np.ndarray
+    avg_doc_lengths: np.ndarray
+
+
+def get_query_statistics(
+    collection: ElasticSearchIndex,
+    query: Query,
+    field: str = "body",
+    num_candidates: int = 2000,
+) -> QueryStatistics:
+    """Collects the statistics needed for rescoring candidates with BM25.
+
+    Candidates are the top documents retrieved by a match query with the
+    current index settings. Documents outside of this pool are not
+    considered, so num_candidates should be larger than the ranking depth
+    that is evaluated.
+
+    Args:
+        collection: ElasticSearch collection.
+        query: Query instance.
+        field (optional): Index field to query. Defaults to "body".
+        num_candidates (optional): Number of candidate documents. Defaults to
+          2000.
+
+    Returns:
+        Statistics of the query terms for the candidate documents.
+    """
+    es = collection.es
+    term_counts = Counter(
+        token["token"]
+        for token in es.indices.analyze(
+            body={"text": query.question, "field": field},
+            index=collection.index_name,
+        )["tokens"]
+    )
+    terms = list(term_counts.keys())
+    hits = es.search(
+        body={"query": {"match": {field: query.question}}},
+        index=collection.index_name,
+        _source=False,
+        size=num_candidates,
+    )["hits"]["hits"]
+    doc_ids = [hit["_id"] for hit in hits]
+
+    term_freqs = np.zeros((len(doc_ids), len(terms)))
+    idfs = np.zeros((len(doc_ids), len(terms)))
+    doc_lengths = np.zeros(len(doc_ids), dtype=np.int64)
+    avg_doc_lengths = np.ones(len(doc_ids))
+    for start in range(0, len(doc_ids), _MTERMVECTORS_BATCH_SIZE):
+        response = es.mtermvectors(
+            body={"ids": doc_ids[start : start + _MTERMVECTORS_BATCH_SIZE]},
+            index=collection.index_name,
+            fields=field,
+            term_statistics=True,
+            field_statistics=True,
+            positions=False,
+            offsets=False,
+            payloads=False,
+        )
+        for i, doc in enumerate(response["docs"], start=start):
+            term_vector = doc.get("term_vectors", {}).get(field)
+            if not term_vector:
+                continue
+            doc_count = term_vector["field_statistics"]["doc_count"]
+            avg_doc_lengths[i] = (
+                term_vector["field_statistics"]["sum_ttf"] / doc_count
+            )
+            doc_lengths[i] = sum(
+                term["term_freq"] for term in term_vector["terms"].values()
+            )
+            for j, term in enumerate(terms):
+                term_stats = term_vector["terms"].get(term)
+                if term_stats is None:
+                    continue
+                term_freqs[i, j] = term_stats["term_freq"]
+                doc_freq = term_stats["doc_freq"]
+                idfs[i, j] = math.log(
+                    1 + (doc_count - doc_freq + 0.5) / (doc_freq + 0.5)
+                )
+
+    return QueryStatistics(
+        query_id=query.query_id,
+        doc_ids=doc_ids,
+        term_freqs=term_freqs,
+        idfs=idfs,
+        term_weights=np.array(list(term_counts.values()), dtype=np.float64),
+        doc_lengths=doc_lengths,
+        avg_doc_lengths=avg_doc_lengths,
+    )
+
+
+def lucene_doc_lengths(doc_lengths: np.ndarray) -> np.ndarray:
+    """Rounds document lengths to the precision used in Lucene norms.
+
+    Args:
+        doc_lengths: Exact document lengths.
+
+    Returns:
+        Document lengths as decoded by Lucene at scoring time.
+    """
+    doc_lengths = np.asarray(doc_lengths, dtype=np.int64)
+    rest = np.maximum(doc_lengths - _LUCENE_NUM_FREE_VALUES, 0)
+    # Only the 4 most significant bits of the remainder are kept.
+    shift = np.maximum(
+        np.floor(np.log2(np.maximum(rest, 1))).astype(np.int64) - 3, 0
+    )
+    rounded = _LUCENE_NUM_FREE_VALUES + ((rest >> shift) << shift)
+    return np.where(doc_lengths < _LUCENE_NUM_FREE_VALUES, doc_lengths, rounded)
+
+
+def score_bm25_grid(
+    stats: QueryStatistics,
+    b_values: np.ndarray = B_VALUES,
+    k1_values: np.ndarray = K1_VALUES,
+) -> np.ndarray:
+    """Computes BM25 scores of the candidates for all parameter combinations.
+
+    Scores follow Lucene's BM25 similarity, i.e., idf * tf / (tf + k1 * (1 -
+    b + b * dl / avgdl)), summed over query terms.
+
+    Args:
+        stats: Statistics of the query terms for the candidate documents.
+        b_values (optional): Values of b. Defaults to B_VALUES.
+        k1_values (optional): Values of k1. Defaults to K1_VALUES.
+
+    Returns:
+        Array of scores with shape (len(b_values), len(k1_values), documents).
+    """
+    b_values = np.asarray(b_values, dtype=np.float64)[:, None]
+    k1_values = np.asarray(k1_values, dtype=np.float64)[None, :, None, None]
+    length_ratios = (
+        lucene_doc_lengths(stats.doc_lengths) / stats.avg_doc_lengths
+    )
+    # Shape (b, documents).
+    length_norms = 1 - b_values + b_values * length_ratios
+    # Shape (b, k1, documents, terms).
+    tf_norms = stats.term_freqs / (
+        stats.term_freqs + k1_values * length_norms[:, None, :, None]
+    )
+    return (tf_norms * (stats.idfs * stats.term_weights)).sum(axis=-1)
+
+
+def tune_bm25_parameters(
+    collection: ElasticSearchIndex,
+    queries: List[Query],
+    qrels: Dict[str, Qrel],
+    field: str = "body",
+    b_values: np.ndarray = B_VALUES,
+    k1_values: np.ndarray = K1_VALUES,
+    num_candidates: int = 2000,
+    num_results: int = 1000,
+) -> pd.DataFrame:
+    """Evaluates Recall@1000 of BM25 for a grid of (b, k1) values.
+
+    Args:
+        collection: ElasticSearch collection.
+        queries: List of queries.
+        qrels: Dictionary of Qrel objects with query ID as key.
+        field (optional): Index field to query. Defaults to "body".
+        b_values (optional): Values of b. Defaults to B_VALUES.
+        k1_values (optional): Values of k1. Defaults to K1_VALUES.
+        num_candidates (optional): Number of candidate documents per query.
+          Defaults to 2000.
+        num_results (optional): Ranking depth. Defaults to 1000.
+
+    Returns:
+        DataFrame with b, k1, and recall_1000 columns.
+    """
+    evaluator = Evaluator(qrels)
+    metric = f"recall.{num_results}"
+    results = np.zeros((len(b_values), len(k1_values)))
+    num_queries = 0
+    for query in queries:
+        if query.query_id not in qrels:
+            continue
+        stats = get_query_statistics(collection, query, field, num_candidates)
+        rels = qrels[query.query_id].get_relevances(stats.doc_ids)
+        # Ties are broken by decreasing document ID, as in trec_eval.
+        doc_id_ranks = np.argsort(np.argsort(np.array(stats.doc_ids)))
+        scores = score_bm25_grid(stats, b_values, k1_values)
+        for i, j in np.ndindex(results.shape):
+            order = np.lexsort((-doc_id_ranks, -scores[i, j]))[:num_results]
+            results[i, j] += evaluator.evaluate_relevances(
+                query.query_id, rels[order], [metric]
+            )[metric]
+        num_queries += 1
+
+    b_grid, k1_grid = np.meshgrid(b_values, k1_values, indexing="ij")
+    return pd.DataFrame(
+        {
+            "b": b_grid.ravel(),
+            "k1": k1_grid.ravel(),
+            "recall_1000": results.ravel() / max(num_queries, 1),
+        }
+    )
+
+
+def save_bm25_parameters_ranking(
+    results_df: pd.DataFrame, results_directory_path: str, year: str
+) -> str:
+    """Saves BM25 parameters ranked with respect to Recall@1000.
+
+    Args:
+        results_df: DataFrame with b, k1, and recall_1000 columns.
+        results_directory_path: Path to directory where the ranking is saved.
+        year: The year for which the ranking is created.
+
+    Returns:
+        Path to the ranking file.
+    """
+    path = os.path.join(
+        os.getcwd(),
+        results_directory_path,
+        f"bm25_parameters_ranking_{year}.csv",
+    )
+    results_df.assign(year=year)[
+        ["year", "b", "k1", "recall_1000"]
+    ].sort_values(
+        ["recall_1000", "year"], ascending=[False, False], ignore_index=True
+    ).to_csv(
+        path, sep="\t", mode="w+"
+    )
+    return path
 
 
 def rank_bm25_parameters(results_directory_path: str, year: str):
@@ -40,17 +319,7 @@ def rank_bm25_parameters(results_directory_path: str, year: str):
                 },
                 ignore_index=True,
             )
-            all_results_df.sort_values(
-                ["recall_1000", "year"], ascending=[False, False], index=False
-            ).to_csv(
-                os.path.join(
-                    os.getcwd(),
-                    results_directory_path,
-                    f"bm25_parameters_ranking_{year}.csv",
-                ),
-                sep="\t",
-                mode="w+",
-            )
+    save_bm25_parameters_ranking(all_results_df, results_directory_path, year)
 
 
 def convert_ranking_to_pivot_dataframe(
@@ -145,14 +414,99 @@ def plot_averaged_results_on_heatmap(
     plot_df_on_heatmap(average_results_df, path_to_save_heatmap)
 
 
-if __name__ == "__main__":
-    rank_bm25_parameters("data/fine_tuning/bm25/", "2020")
-    plot_results_on_heatmap(
-        "data/fine_tuning/bm25/bm25_parameters_ranking_2021.csv"
+def parse_cmdline_arguments() -> argparse.Namespace:
+    """Defines accepted arguments and returns the parsed values.
+
+    Returns:
+        Object with a property for each argument.
+    """
+    parser = argparse.ArgumentParser(prog="bm25_tuning.py")
+    parser.add_argument(
+        "--year",
+        type=str,
+        default="2020",
+        choices=["2020", "2021"],
+        help="Year for which the parameters should be tuned.",
+    )
+    parser.add_argument(
+        "--query_rewrite",
+        type=str,
+        default="manual",
+        choices=[query_rewrite.name.lower() for query_rewrite in QueryRewrite],
+        help="Query rewrite variant to use. Defaults to manual.",
+    )
+    parser.add_argument(
+        "--es.host_name",
+        dest="host_name",
+        type=str,
+        default="localhost:9200",
+        help="Elasticsearch host name. Defaults to localhost:9200.",
+    )
+    parser.add_argument(
+        "--es.index_name",
+        dest="index_name",
+        type=str,
+        help=(
+            "Elasticsearch index name. Defaults to the index of the year in"
+            " config/defaults."
+        ),
+    )
+    parser.add_argument(
+        "--es.field",
+        dest="field",
+        type=str,
+        help=(
+            "Index field to query. Defaults to the field of the year in"
+            " config/defaults."
+        ),
+    )
+    parser.add_argument(
+        "--num_candidates",
+        type=int,
+        default=2000,
+        help="Number of candidate documents per query. Defaults to 2000.",
+    )
+    parser.add_argument(
+        "--output_dir",
+        type=str,
+        default="data/fine_tuning/bm25/",
+        help="Directory for the ranking and heatmap.",
     )
+    return parser.parse_args()
+
+
+def main(args):
+    """Runs the grid search, saves the parameter ranking and its heatmap.
+
+    Args:
+        args: Arguments.
+    """
+    config = confuse.Configuration("treccast", read=False)
+    config.set_file(_DEFAULT_CONFIG_PATH.format(args.year))
+    index_name = args.index_name or config["es"]["index_name"].get()
+    field = args.field or config["es"]["field"].get()
+    queries = Topic.load_queries_from_file(
+        args.year, QueryRewrite[args.query_rewrite.upper()]
+    )
+    results_df = tune_bm25_parameters(
+        ElasticSearchIndex(index_name, hostname=args.host_name),
+        queries,
+        Qrel.load_qrels_from_file(f"data/qrels/{args.year}.txt"),
+        field=field,
+        num_candidates=args.num_candidates,
+    )
+    ranking_path = save_bm25_parameters_ranking(
+        results_df, args.output_dir, args.year
+    )
+    plot_results_on_heatmap(ranking_path)
     if False:  # Set to true for plotting average results
         plot_averaged_results_on_heatmap(
             "data/fine_tuning/bm25/bm25_parameters_ranking_2020.csv",
             "data/fine_tuning/bm25/bm25_parameters_ranking_2021.csv",
             "data/fine_tuning/bm25/bm25_parameters_ranking_2020_2021_avg.csv",
         )
+
+
+if __name__ == "__main__":
+    args = parse_cmdline_arguments()
+    main(args)
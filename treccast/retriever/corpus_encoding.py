@@ -0,0 +1,400 @@
+"""Resumable, multi-process encoding of a passage collection.
+
+The collection is split into shards of consecutive passages. Shards are
+encoded in a pool of CPU worker processes, each with its own encoder, using
+batches formed by passage length (large batches of short passages, small
+batches of long ones). Each shard is written atomically, so an interrupted
+job resumes from the shards already completed. The shard size is recorded
+in encoding.json, as a job can only be resumed with the same shard size.
+Finally, the shards are combined into a dense index (see
+`treccast.retriever.dense_index`).
+
+Usage:
+    $ python -m treccast.retriever.corpus_encoding --num_workers 8
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from treccast.retriever.dense_index import (
+    DEFAULT_INDEX_PATH,
+    DEFAULT_SHARD_SIZE,
+    DenseIndex,
+)
+
+# Maximum number of (padded) tokens per batch.
+DEFAULT_TOKENS_PER_BATCH = 32768
+
+# Maximum number of passages per batch.
+_MAX_BATCH_SIZE = 1024
+
+# File in the index directory recording the shard size of an encoding job.
+_MANIFEST_FILENAME = "encoding.json"
+
+# Encoder of the current worker process.
+_worker_encoder = None
+
+
+def get_batches(lengths: List[int], tokens_per_batch: int) -> List[List[int]]:
+    """Groups passages into batches of similar length.
+
+    Passages are sorted by length and each batch holds as many passages as
+    fit in the token budget when padded to the longest one.
+
+    Args:
+        lengths: Number of tokens of each passage.
+        tokens_per_batch: Maximum number of padded tokens per batch.
+
+    Returns:
+        Batches of passage positions.
+    """
+    batches: List[List[int]] = []
+    batch: List[int] = []
+    for position in np.argsort(lengths, kind="stable").tolist():
+        padded_length = max(lengths[position], 1) * (len(batch) + 1)
+        if batch and (
+            padded_length > tokens_per_batch or len(batch) == _MAX_BATCH_SIZE
+        ):
+            batches.append(batch)
+            batch = []
+        batch.append(position)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _init_worker(encoder_factory: Callable[[], Any], num_threads: int) -> None:
+    """Loads the encoder of a worker process.
+
+    Args:
+        encoder_factory: Function creating the encoder.
+        num_threads: Number of intra-op threads of the worker (0 keeps the
+          default).
+    """
+    global _worker_encoder
+    if num_threads:
+        import torch
+
+        torch.set_num_threads(num_threads)
+    _worker_encoder = encoder_factory()
+
+
+def encode_shard(
+    shard_id: int,
+    passages: List[Dict[str, str]],
+    output_path: str,
+    tokens_per_batch: int = DEFAULT_TOKENS_PER_BATCH,
+    encoder: Any = None,
+) -> Tuple[int, int, float, int]:
+    """Encodes the passages of a shard and writes the shard atomically.
+
+    Embeddings are written first and passage IDs last, both through
+    temporary files, so a shard is complete if and only if its IDs file
+    exists.
+
+    Args:
+        shard_id: Shard number.
+        passages: Dictionaries with passage ID ("docno") and text.
+        output_path: Path to the index directory.
+        tokens_per_batch (optional): Maximum number of padded tokens per
+          batch. Defaults to 32768.
+        encoder (optional): Encoder with `count_passage_tokens` and
+          `encode_passages` methods. Defaults to the encoder of the worker
+          process.
+
+    Returns:
+        Tuple with shard number, number of passages, encoding time in
+        seconds, and process ID.
+    """
+    encoder = encoder or _worker_encoder
+    start = time.perf_counter()
+    texts = [passage["text"] for passage in passages]
+    shard_path = _get_shard_path(output_path, shard_id)
+    shard = None
+    for batch in get_batches(
+        encoder.count_passage_tokens(texts), tokens_per_batch
+    ):
+        embeddings = encoder.encode_passages([texts[i] for i in batch])
+        if shard is None:
+            shard = open_memmap(
+                f"{shard_path}.tmp",
+                mode="w+",
+                dtype=np.float16,
+                shape=(len(passages), embeddings.shape[1]),
+            )
+        shard[batch] = embeddings
+    if shard is not None:
+        shard.flush()
+        del shard
+        os.replace(f"{shard_path}.tmp", shard_path)
+
+    with open(f"{shard_path}.ids.tmp", "w") as f_out:
+        f_out.writelines(f"{passage['docno']}\n" for passage in passages)
+    os.replace(f"{shard_path}.ids.tmp", f"{shard_path}.ids")
+    return shard_id, len(passages), time.perf_counter() - start, os.getpid()
+
+
+def encode_corpus(
+    collection_iter: Iterator[Dict[str, str]],
+    output_path: str = DEFAULT_INDEX_PATH,
+    encoder_factory: Callable[[], Any] = None,
+    num_workers: int = 1,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+    tokens_per_batch: int = DEFAULT_TOKENS_PER_BATCH,
+    threads_per_worker: int = 0,
+) -> DenseIndex:
+    """Encodes a collection into a dense index, resuming completed shards.
+
+    Shard i holds passages [i * shard_size, (i + 1) * shard_size) of the
+    collection iterator, which therefore needs to yield passages in the same
+    order and shard_size needs to be the same when a job is resumed.
+    Passages of completed shards are skipped without encoding. At most two
+    shards per worker are held in memory.
+
+    Args:
+        collection_iter: Iterator of dictionaries with passage ID ("docno")
+          and text.
+        output_path (optional): Path to the index directory. Defaults to
+          "data/retrieval/ance/dense_index".
+        encoder_factory (optional): Function creating an encoder in each
+          worker. Defaults to ANCEEncoder.
+        num_workers (optional): Number of worker processes; with one worker,
+          shards are encoded in the current process. Defaults to 1.
+        shard_size (optional): Number of passages per shard. Defaults to
+          65536.
+        tokens_per_batch (optional): Maximum number of padded tokens per
+          batch. Defaults to 32768.
+        threads_per_worker (optional): Number of torch threads per worker.
+          Defaults to 0 (torch default).
+
+    Returns:
+        The dense index.
+
+    Raises:
+        ValueError: If output_path holds shards of a different shard size.
+    """
+    if encoder_factory is None:
+        from treccast.retriever.ance_encoder import ANCEEncoder
+
+        encoder_factory = ANCEEncoder
+    os.makedirs(output_path, exist_ok=True)
+    _check_shard_size(output_path, shard_size)
+    shards = _get_pending_shards(collection_iter, output_path, shard_size)
+    stats: Dict[int, List[float]] = {}
+
+    if num_workers <= 1:
+        encoder = encoder_factory()
+        for shard_id, passages in shards:
+            _report(
+                encode_shard(
+                    shard_id, passages, output_path, tokens_per_batch, encoder
+                ),
+                stats,
+            )
+    else:
+        with ProcessPoolExecutor(
+            num_workers,
+            initializer=_init_worker,
+            initargs=(encoder_factory, threads_per_worker),
+        ) as executor:
+            pending = set()
+            for shard_id, passages in shards:
+                if len(pending) >= 2 * num_workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        _report(future.result(), stats)
+                pending.add(
+                    executor.submit(
+                        encode_shard,
+                        shard_id,
+                        passages,
+                        output_path,
+                        tokens_per_batch,
+                    )
+                )
+            for future in wait(pending).done:
+                _report(future.result(), stats)
+
+    for pid, (count, seconds) in sorted(stats.items()):
+        print(f"Worker {pid}: {count / seconds:.1f} passages/sec")
+    return _combine_shards(output_path)
+
+
+def _get_shard_path(output_path: str, shard_id: int) -> str:
+    return os.path.join(output_path, f"shard_{shard_id}.npy")
+
+
+def _check_shard_size(output_path: str, shard_size: int) -> None:
+    """Records the shard size of a new job or checks it for a resumed one.
+
+    Args:
+        output_path: Path to the index directory.
+        shard_size: Number of passages per shard.
+
+    Raises:
+        ValueError: If the recorded shard size differs from shard_size.
+    """
+    manifest_path = os.path.join(output_path, _MANIFEST_FILENAME)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f_in:
+            recorded_shard_size = json.load(f_in)["shard_size"]
+        if recorded_shard_size != shard_size:
+            raise ValueError(
+                f"Shards in {output_path} have {recorded_shard_size} passages"
+                f" each, cannot resume with shard size {shard_size}"
+            )
+    else:
+        with open(manifest_path, "w") as f_out:
+            json.dump({"shard_size": shard_size}, f_out)
+
+
+def _get_pending_shards(
+    collection_iter: Iterator[Dict[str, str]],
+    output_path: str,
+    shard_size: int,
+) -> Iterator[Tuple[int, List[Dict[str, str]]]]:
+    """Yields shards of the collection that are not completed yet.
+
+    Args:
+        collection_iter: Iterator of dictionaries with passage ID ("docno")
+          and text.
+        output_path: Path to the index directory.
+        shard_size: Number of passages per shard.
+
+    Yields:
+        Shard number and passages of the shard.
+    """
+    shard_id = 0
+    while True:
+        passages = list(islice(collection_iter, shard_size))
+        if not passages:
+            return
+        if os.path.exists(f"{_get_shard_path(output_path, shard_id)}.ids"):
+            print(f"Skipping completed shard {shard_id}")
+        else:
+            yield shard_id, passages
+        shard_id += 1
+
+
+def _report(
+    result: Tuple[int, int, float, int], stats: Dict[int, List[float]]
+) -> None:
+    """Prints the throughput of an encoded shard and adds it to the stats.
+
+    Args:
+        result: Result of `encode_shard`.
+        stats: Number of passages and encoding time per worker process.
+    """
+    shard_id, count, seconds, pid = result
+    print(
+        f"Encoded shard {shard_id} ({count} passages) in worker {pid}: "
+        f"{count / max(seconds, 1e-9):.1f} passages/sec"
+    )
+    worker_stats = stats.setdefault(pid, [0, 0.0])
+    worker_stats[0] += count
+    worker_stats[1] += max(seconds, 1e-9)
+
+
+def _combine_shards(output_path: str) -> DenseIndex:
+    """Writes the passage IDs and metadata of the dense index.
+
+    Args:
+        output_path: Path to the index directory with completed shards.
+
+    Returns:
+        The dense index.
+    """
+    shard_sizes = []
+    dim = None
+    with open(os.path.join(output_path, "doc_ids.txt"), "w") as f_out:
+        while os.path.exists(
+            f"{_get_shard_path(output_path, len(shard_sizes))}.ids"
+        ):
+            shard_path = _get_shard_path(output_path, len(shard_sizes))
+            with open(f"{shard_path}.ids") as f_in:
+                doc_ids = f_in.read()
+            f_out.write(doc_ids)
+            shard_sizes.append(doc_ids.count("\n"))
+            if dim is None and os.path.exists(shard_path):
+                dim = np.load(shard_path, mmap_mode="r").shape[1]
+    with open(os.path.join(output_path, "meta.json"), "w") as f_out:
+        json.dump({"dim": dim, "shard_sizes": shard_sizes}, f_out)
+    return DenseIndex(output_path)
+
+
+def parse_cmdline_arguments() -> argparse.Namespace:
+    """Defines accepted arguments and returns the parsed values.
+
+    Returns:
+        Object with a property for each argument.
+    """
+    parser = argparse.ArgumentParser(prog="corpus_encoding.py")
+    parser.add_argument(
+        "--index_path",
+        type=str,
+        default=DEFAULT_INDEX_PATH,
+        help="Path to the dense index. Defaults to " f"{DEFAULT_INDEX_PATH}.",
+    )
+    parser.add_argument(
+        "--year",
+        type=str,
+        default="2021",
+        choices=["2020", "2021"],
+        help="Year of the collection. Defaults to 2021.",
+    )
+    parser.add_argument(
+        "--collections",
+        default="/data/collections/",
+        help="Path to the directory containing trecweb files.",
+    )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of worker processes. Defaults to the number of CPUs.",
+    )
+    parser.add_argument(
+        "--threads_per_worker",
+        type=int,
+        default=1,
+        help="Number of torch threads per worker. Defaults to 1.",
+    )
+    parser.add_argument(
+        "--shard_size",
+        type=int,
+        default=DEFAULT_SHARD_SIZE,
+        help=f"Passages per shard. Defaults to {DEFAULT_SHARD_SIZE}.",
+    )
+    parser.add_argument(
+        "--tokens_per_batch",
+        type=int,
+        default=DEFAULT_TOKENS_PER_BATCH,
+        help="Maximum number of padded tokens per batch. Defaults to "
+        f"{DEFAULT_TOKENS_PER_BATCH}.",
+    )
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> None:
+    from treccast.retriever.ance_dense_retriever import get_collection_iter
+
+    encode_corpus(
+        get_collection_iter(args.year, args.collections),
+        args.index_path,
+        num_workers=args.num_workers,
+        shard_size=args.shard_size,
+        tokens_per_batch=args.tokens_per_batch,
+        threads_per_worker=args.threads_per_worker,
+    )
+
+
+if __name__ == "__main__":
+    args = parse_cmdline_arguments()
+    main(args)
@@ -0,0 +1,550 @@
+"""Memory-mapped sharded dense index with optional ANN structures.
+
+Passage embeddings are stored as float16 NumPy shards that are memory-mapped
+at search time, so the index does not need to fit in memory. Exhaustive
+(flat) search streams over the shards; approximate search uses a FAISS
+IVF-PQ or HNSW structure built on top of the shards, optionally reranking
+the approximate candidates with exact inner products.
+
+IVF-PQ stores m bytes per passage, and its inverted lists are memory-mapped.
+HNSW cannot be memory-mapped: it keeps float16 copies of the embeddings (as
+large as the shards) plus its graph (about 8 * M bytes per passage) resident,
+so it needs more memory than all shards together.
+
+Index directory layout:
+    meta.json      Embedding dimension and number of embeddings per shard.
+    doc_ids.txt    Passage IDs, one per line, in shard order.
+    shard_{i}.npy  Float16 embeddings of shard i.
+    {ann}.faiss    FAISS structures built with `build_ann`.
+
+Usage:
+    $ python -m treccast.retriever.dense_index --build --ann ivfpq hnsw
+    $ python -m treccast.retriever.dense_index --benchmark --ann ivfpq hnsw
+"""
+
+import argparse
+import json
+import os
+import time
+from enum import Enum
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+try:
+    import faiss
+except ImportError:  # pragma: no cover
+    faiss = None
+
+DEFAULT_INDEX_PATH = "data/retrieval/ance/dense_index"
+
+# Number of embeddings per shard (~100MB of float16 ANCE embeddings).
+DEFAULT_SHARD_SIZE = 65536
+
+# Number of embeddings scored at once in exhaustive search.
+_SEARCH_CHUNK_SIZE = 65536
+
+# Number of passages encoded at once when building the index.
+_ENCODING_BATCH_SIZE = 256
+
+# Default parameters of ANN structures. nprobe and efSearch trade recall for
+# latency at search time; the rest are fixed when the structure is built.
+DEFAULT_ANN_PARAMS = {
+    "ivfpq": {"nlist": 16384, "m": 96, "nbits": 8, "nprobe": 64},
+    "hnsw": {"M": 32, "efConstruction": 200, "efSearch": 256},
+}
+
+# Maximum number of embeddings used to train IVF-PQ.
+_MAX_TRAINING_SIZE = 500000
+
+
+class AnnType(Enum):
+    FLAT = "flat"
+    IVFPQ = "ivfpq"
+    HNSW = "hnsw"
+
+
+class DenseIndex:
+    def __init__(self, index_path: str = DEFAULT_INDEX_PATH):
+        """Opens a dense index with memory-mapped shards.
+
+        Args:
+            index_path (optional): Path to the index directory. Defaults to
+              "data/retrieval/ance/dense_index".
+        """
+        self._index_path = index_path
+        with open(os.path.join(index_path, "meta.json")) as f_in:
+            meta = json.load(f_in)
+        self.dim = meta["dim"]
+        self._shards = [
+            np.load(os.path.join(index_path, f"shard_{i}.npy"), mmap_mode="r")
+            for i in range(len(meta["shard_sizes"]))
+        ]
+        self._offsets = np.cumsum([0] + meta["shard_sizes"])
+        with open(os.path.join(index_path, "doc_ids.txt")) as f_in:
+            self.doc_ids = f_in.read().splitlines()
+        self._ann_indices: Dict[AnnType, Any] = {}
+
+    def __len__(self) -> int:
+        return int(self._offsets[-1])
+
+    @staticmethod
+    def build(
+        index_path: str,
+        batches: Iterable[Tuple[List[str], np.ndarray]],
+        shard_size: int = DEFAULT_SHARD_SIZE,
+    ) -> "DenseIndex":
+        """Writes embeddings to float16 shards and opens the index.
+
+        Args:
+            index_path: Path to the index directory.
+            batches: Batches of passage IDs and their embeddings.
+            shard_size (optional): Number of embeddings per shard. Defaults to
+              65536.
+
+        Returns:
+            The dense index.
+        """
+        os.makedirs(index_path, exist_ok=True)
+        shard_sizes: List[int] = []
+        dim = None
+        shard, filled = None, 0
+        with open(os.path.join(index_path, "doc_ids.txt"), "w") as f_ids:
+            for doc_ids, embeddings in batches:
+                f_ids.writelines(f"{doc_id}\n" for doc_id in doc_ids)
+                dim = embeddings.shape[1]
+                start = 0
+                while start < len(embeddings):
+                    if shard is None:
+                        shard = open_memmap(
+                            os.path.join(
+                                index_path, f"shard_{len(shard_sizes)}.npy"
+                            ),
+                            mode="w+",
+                            dtype=np.float16,
+                            shape=(shard_size, dim),
+                        )
+                        filled = 0
+                    count = min(len(embeddings) - start, shard_size - filled)
+                    shard[filled : filled + count] = embeddings[
+                        start : start + count
+                    ]
+                    filled += count
+                    start += count
+                    if filled == shard_size:
+                        shard.flush()
+                        shard_sizes.append(filled)
+                        shard = None
+        if shard is not None:
+            del shard
+            _truncate_shard(
+                os.path.join(index_path, f"shard_{len(shard_sizes)}.npy"),
+                filled,
+            )
+            shard_sizes.append(filled)
+        with open(os.path.join(index_path, "meta.json"), "w") as f_out:
+            json.dump({"dim": dim, "shard_sizes": shard_sizes}, f_out)
+        return DenseIndex(index_path)
+
+    def get_embeddings(self, positions: np.ndarray) -> np.ndarray:
+        """Returns the embeddings at given positions of the index.
+
+        Args:
+            positions: Positions of embeddings.
+
+        Returns:
+            Float32 matrix with one embedding per position.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        embeddings = np.zeros((len(positions), self.dim), dtype=np.float32)
+        shard_ids = np.searchsorted(self._offsets, positions, side="right") - 1
+        for shard_id in np.unique(shard_ids):
+            mask = shard_ids == shard_id
+            embeddings[mask] = self._shards[shard_id][
+                positions[mask] - self._offsets[shard_id]
+            ]
+        return embeddings
+
+    def build_ann(self, ann_type: AnnType, params: Dict[str, int] = None):
+        """Builds an ANN structure over the shards and saves it.
+
+        Args:
+            ann_type: Type of ANN structure (IVF-PQ or HNSW).
+            params (optional): Build and search parameters. Defaults to
+              DEFAULT_ANN_PARAMS of the ANN type.
+        """
+        _check_faiss()
+        params = {
+            **DEFAULT_ANN_PARAMS.get(ann_type.value, {}),
+            **(params or {}),
+        }
+        if ann_type == AnnType.IVFPQ:
+            index = faiss.index_factory(
+                self.dim,
+                f"IVF{params['nlist']},PQ{params['m']}x{params['nbits']}",
+                faiss.METRIC_INNER_PRODUCT,
+            )
+            sample = np.random.default_rng(0).choice(
+                len(self), min(len(self), _MAX_TRAINING_SIZE), replace=False
+            )
+            index.train(self.get_embeddings(np.sort(sample)))
+        elif ann_type == AnnType.HNSW:
+            # Float16 storage, as float32 (IndexHNSWFlat) doubles its size.
+            index = faiss.index_factory(
+                self.dim,
+                f"HNSW{params['M']},SQfp16",
+                faiss.METRIC_INNER_PRODUCT,
+            )
+            index.hnsw.efConstruction = params["efConstruction"]
+        else:
+            raise ValueError(f"No ANN structure to build for {ann_type}")
+
+        for shard in self._shards:
+            for start in range(0, len(shard), _SEARCH_CHUNK_SIZE):
+                index.add(
+                    np.asarray(
+                        shard[start : start + _SEARCH_CHUNK_SIZE],
+                        dtype=np.float32,
+                    )
+                )
+        faiss.write_index(index, self._get_ann_path(ann_type))
+        self._ann_indices[ann_type] = index
+
+    def search(
+        self,
+        query_embeddings: np.ndarray,
+        k: int = 1000,
+        ann_type: AnnType = AnnType.FLAT,
+        params: Dict[str, int] = None,
+        rerank: bool = True,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Searches the index for passages with highest inner products.
+
+        Args:
+            query_embeddings: Matrix with one embedding per query.
+            k (optional): Number of passages per query. Defaults to 1000.
+            ann_type (optional): ANN structure used. Defaults to exhaustive
+              search.
+            params (optional): Search parameters (nprobe for IVF-PQ, efSearch
+              for HNSW). Defaults to DEFAULT_ANN_PARAMS of the ANN type.
+            rerank (optional): Whether to rescore approximate candidates with
+              exact inner products. Defaults to True.
+
+        Returns:
+            Tuple of score and position matrices of shape (queries, k),
+            ordered by descending score. Positions are -1 (with score -inf)
+            where fewer than k passages are found.
+        """
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        if ann_type == AnnType.FLAT:
+            return self._search_exhaustive(query_embeddings, k)
+
+        index = self._get_ann_index(ann_type, params)
+        scores, positions = index.search(query_embeddings, k)
+        if rerank:
+            scores = np.full(positions.shape, -np.inf, dtype=np.float32)
+            found = positions >= 0
+            embeddings = self.get_embeddings(positions[found])
+            scores[found] = np.einsum(
+                "ij,ij->i",
+                embeddings,
+                np.repeat(query_embeddings, found.sum(axis=1), axis=0),
+            )
+            order = np.argsort(-scores, axis=1, kind="stable")
+            scores = np.take_along_axis(scores, order, axis=1)
+            positions = np.take_along_axis(positions, order, axis=1)
+        return scores, positions
+
+    def get_doc_ids(self, positions: np.ndarray) -> List[List[str]]:
+        """Returns passage IDs of search results.
+
+        Args:
+            positions: Position matrix returned by `search`.
+
+        Returns:
+            Passage IDs per query; missing results (-1) are left out.
+        """
+        return [
+            [self.doc_ids[position] for position in row if position >= 0]
+            for row in positions.tolist()
+        ]
+
+    def _search_exhaustive(
+        self, query_embeddings: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Scores all passages chunk by chunk, keeping the top-k per query.
+
+        Args:
+            query_embeddings: Float32 matrix with one embedding per query.
+            k: Number of passages per query.
+
+        Returns:
+            Tuple of score and position matrices of shape (queries, k).
+        """
+        num_queries = len(query_embeddings)
+        top_scores = np.full((num_queries, k), -np.inf, dtype=np.float32)
+        top_positions = np.full((num_queries, k), -1, dtype=np.int64)
+        for shard, offset in zip(self._shards, self._offsets):
+            for start in range(0, len(shard), _SEARCH_CHUNK_SIZE):
+                chunk = np.asarray(
+                    shard[start : start + _SEARCH_CHUNK_SIZE], dtype=np.float32
+                )
+                scores = np.concatenate(
+                    [top_scores, query_embeddings @ chunk.T], axis=1
+                )
+                positions = np.concatenate(
+                    [
+                        top_positions,
+                        np.broadcast_to(
+                            np.arange(
+                                offset + start, offset + start + len(chunk)
+                            ),
+                            (num_queries, len(chunk)),
+                        ),
+                    ],
+                    axis=1,
+                )
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                top_scores = np.take_along_axis(scores, top, axis=1)
+                top_positions = np.take_along_axis(positions, top, axis=1)
+
+        # Ties are broken by position, as in FAISS flat indices.
+        order = np.lexsort((top_positions, -top_scores), axis=1)
+        return (
+            np.take_along_axis(top_scores, order, axis=1),
+            np.take_along_axis(top_positions, order, axis=1),
+        )
+
+    def _get_ann_path(self, ann_type: AnnType) -> str:
+        return os.path.join(self._index_path, f"{ann_type.value}.faiss")
+
+    def _get_ann_index(
+        self, ann_type: AnnType, params: Dict[str, int] = None
+    ) -> Any:
+        """Loads an ANN structure (once) and sets its search parameters.
+
+        Args:
+            ann_type: Type of ANN structure.
+            params (optional): Search parameters. Defaults to
+              DEFAULT_ANN_PARAMS of the ANN type.
+
+        Returns:
+            FAISS index.
+        """
+        _check_faiss()
+        if ann_type not in self._ann_indices:
+            self._ann_indices[ann_type] = faiss.read_index(
+                self._get_ann_path(ann_type), faiss.IO_FLAG_MMAP
+            )
+        index = self._ann_indices[ann_type]
+        params = {
+            **DEFAULT_ANN_PARAMS.get(ann_type.value, {}),
+            **(params or {}),
+        }
+        if ann_type == AnnType.IVFPQ:
+            faiss.extract_index_ivf(index).nprobe = params["nprobe"]
+        else:
+            index.hnsw.efSearch = params["efSearch"]
+        return index
+
+
+def _check_faiss() -> None:
+    if faiss is None:
+        raise ImportError(
+            "ANN structures require faiss (conda install -c pytorch faiss-cpu)"
+        )
+
+
+def _truncate_shard(path: str, size: int) -> None:
+    """Rewrites the last, partially filled shard with its actual size.
+
+    Args:
+        path: Path to the shard file.
+        size: Number of filled rows.
+    """
+    shard = np.load(path, mmap_mode="r")
+    truncated = open_memmap(
+        f"{path}.tmp",
+        mode="w+",
+        dtype=shard.dtype,
+        shape=(size, shard.shape[1]),
+    )
+    truncated[:] = shard[:size]
+    truncated.flush()
+    del shard, truncated
+    os.replace(f"{path}.tmp", path)
+
+
+def recall_at_k(
+    index: DenseIndex,
+    query_embeddings: np.ndarray,
+    ann_type: AnnType,
+    k: int = 1000,
+    params: Dict[str, int] = None,
+    rerank: bool = True,
+) -> Dict[str, float]:
+    """Measures recall@k and latency of ANN search against exhaustive search.
+
+    Args:
+        index: Dense index.
+        query_embeddings: Matrix with one embedding per query.
+        ann_type: ANN structure evaluated.
+        k (optional): Cutoff. Defaults to 1000.
+        params (optional): Search parameters of the ANN structure.
+        rerank (optional): Whether to rerank approximate candidates. Defaults
+          to True.
+
+    Returns:
+        Dictionary with mean recall@k and mean per-query latency (in ms) of
+        exhaustive and approximate search.
+    """
+    num_queries = max(len(query_embeddings), 1)
+    start = time.perf_counter()
+    _, exact = index.search(query_embeddings, k)
+    exact_ms = (time.perf_counter() - start) * 1000 / num_queries
+    start = time.perf_counter()
+    _, approximate = index.search(
+        query_embeddings, k, ann_type=ann_type, params=params, rerank=rerank
+    )
+    approximate_ms = (time.perf_counter() - start) * 1000 / num_queries
+
+    recalls = []
+    for exact_row, approximate_row in zip(exact, approximate):
+        relevant = set(exact_row[exact_row >= 0].tolist())
+        if relevant:
+            retrieved = relevant.intersection(approximate_row.tolist())
+            recalls.append(len(retrieved) / len(relevant))
+    return {
+        f"recall@{k}": float(np.mean(recalls)) if recalls else 1.0,
+        "exhaustive_ms": exact_ms,
+        f"{ann_type.value}_ms": approximate_ms,
+    }
+
+
+def encode_collection(
+    encoder: Any,
+    collection_iter: Iterator[Dict[str, str]],
+    batch_size: int = _ENCODING_BATCH_SIZE,
+) -> Iterator[Tuple[List[str], np.ndarray]]:
+    """Encodes the passages of a collection in batches.
+
+    Args:
+        encoder: Encoder with an `encode_passages` method.
+        collection_iter: Iterator of dictionaries with passage ID ("docno")
+          and text.
+        batch_size (optional): Number of passages per batch. Defaults to 256.
+
+    Yields:
+        Batches of passage IDs and their embeddings.
+    """
+    while True:
+        batch = list(islice(collection_iter, batch_size))
+        if not batch:
+            return
+        yield (
+            [passage["docno"] for passage in batch],
+            encoder.encode_passages([passage["text"] for passage in batch]),
+        )
+
+
+def parse_cmdline_arguments() -> argparse.Namespace:
+    """Defines accepted arguments and returns the parsed values.
+
+    Returns:
+        Object with a property for each argument.
+    """
+    parser = argparse.ArgumentParser(prog="dense_index.py")
+    parser.add_argument(
+        "--index_path",
+        type=str,
+        default=DEFAULT_INDEX_PATH,
+        help="Path to the dense index. Defaults to " f"{DEFAULT_INDEX_PATH}.",
+    )
+    parser.add_argument(
+        "--build",
+        action="store_true",
+        help="If true, encodes the collection and builds the index.",
+    )
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="If true, reports recall@k of ANN structures against exhaustive "
+        "search for the raw utterances of the year.",
+    )
+    parser.add_argument(
+        "--ann",
+        nargs="*",
+        default=[],
+        choices=[ann_type.value for ann_type in AnnType],
+        help="ANN structures to build or benchmark.",
+    )
+    parser.add_argument(
+        "--year",
+        type=str,
+        default="2021",
+        choices=["2020", "2021"],
+        help="Year of the collection and topics. Defaults to 2021.",
+    )
+    parser.add_argument(
+        "--collections",
+        default="/data/collections/",
+        help="Path to the directory containing trecweb files.",
+    )
+    parser.add_argument(
+        "--shard_size",
+        type=int,
+        default=DEFAULT_SHARD_SIZE,
+        help=f"Embeddings per shard. Defaults to {DEFAULT_SHARD_SIZE}.",
+    )
+    parser.add_argument(
+        "--params",
+        type=json.loads,
+        default={},
+        help="ANN parameters as JSON, e.g., '{\"nprobe\": 128}'.",
+    )
+    parser.add_argument(
+        "-k", type=int, default=1000, help="Cutoff. Defaults to 1000."
+    )
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> None:
+    from treccast.core.topic import Topic
+    from treccast.retriever.ance_dense_retriever import get_collection_iter
+    from treccast.retriever.ance_encoder import ANCEEncoder
+
+    encoder = ANCEEncoder()
+    if args.build:
+        DenseIndex.build(
+            args.index_path,
+            encode_collection(
+                encoder, get_collection_iter(args.year, args.collections)
+            ),
+            shard_size=args.shard_size,
+        )
+    index = DenseIndex(args.index_path)
+    ann_types = [AnnType(ann) for ann in args.ann if ann != "flat"]
+    if args.build:
+        for ann_type in ann_types:
+            index.build_ann(ann_type, args.params)
+    if args.benchmark:
+        query_embeddings = encoder.encode_queries(
+            [
+                query.question
+                for query in Topic.load_queries_from_file(args.year)
+            ]
+        )
+        for ann_type in ann_types:
+            print(
+                ann_type.value,
+                recall_at_k(
+                    index, query_embeddings, ann_type, args.k, args.params
+                ),
+            )
+
+
+if __name__ == "__main__":
+    args = parse_cmdline_arguments()
+    main(args)
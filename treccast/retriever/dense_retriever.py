@@ -0,0 +1,94 @@
+"""Dense retrieval over a memory-mapped sharded dense index."""
+
+from typing import Any, Dict, List
+
+from treccast.core.base import Query, ScoredDocument
+from treccast.core.ranking import Ranking
+from treccast.core.util.passage_loader import PassageLoader
+from treccast.retriever.dense_index import AnnType, DenseIndex
+from treccast.retriever.retriever import Retriever
+
+
+class DenseRetriever(Retriever):
+    def __init__(
+        self,
+        index: DenseIndex,
+        encoder: Any,
+        passage_loader: PassageLoader,
+        ann_type: AnnType = AnnType.FLAT,
+        ann_params: Dict[str, int] = None,
+    ) -> None:
+        """Initializes dense retrieval over a dense index.
+
+        Args:
+            index: Dense index with passage embeddings.
+            encoder: Query encoder with an `encode_queries` method (e.g.,
+              ANCEEncoder).
+            passage_loader: Passage loader for the contents of passages.
+            ann_type (optional): ANN structure used for search. Defaults to
+              exhaustive search.
+            ann_params (optional): Search parameters of the ANN structure.
+              Defaults to None.
+        """
+        self._index = index
+        self._encoder = encoder
+        self._passage_loader = passage_loader
+        self._ann_type = ann_type
+        self._ann_params = ann_params
+
+    def retrieve(self, query: Query, num_results: int = 1000) -> Ranking:
+        """Performs retrieval.
+
+        Args:
+            query: Input query.
+            num_results (optional): Number of documents to return (defaults
+              to 1000).
+
+        Returns:
+            Document ranking.
+        """
+        return self.batch_retrieve([query], num_results=num_results)[0]
+
+    def batch_retrieve(
+        self, queries: List[Query], num_results: int = 1000
+    ) -> List[Ranking]:
+        """Performs retrieval for a list of queries.
+
+        Queries are encoded and searched together, and passage contents are
+        loaded with a single mget request; passages not found in the passage
+        index are left out of the rankings.
+
+        Args:
+            queries: List of input queries.
+            num_results (optional): Number of documents to return per query
+              (defaults to 1000).
+
+        Returns:
+            List of rankings corresponding to the list of input queries.
+        """
+        if not queries:
+            return []
+        scores, positions = self._index.search(
+            self._encoder.encode_queries([query.question for query in queries]),
+            num_results,
+            ann_type=self._ann_type,
+            params=self._ann_params,
+        )
+        doc_ids = self._index.get_doc_ids(positions)
+        contents = iter(
+            self._passage_loader.mget([d for ids in doc_ids for d in ids])
+        )
+
+        rankings = []
+        for query, query_doc_ids, query_scores in zip(queries, doc_ids, scores):
+            ranking = Ranking(query.query_id)
+            for doc_id, score in zip(query_doc_ids, query_scores.tolist()):
+                content = next(contents)
+                if content is not None:
+                    ranking.add_doc(
+                        ScoredDocument(
+                            doc_id=doc_id, score=score, content=content
+                        )
+                    )
+            rankings.append(ranking)
+        return rankings
@@ -145,13 +145,13 @@ class T5Rewriter(Rewriter):
             return query
 
         # Construct input text
-        history_questions = [q.question for q, _ in context.history]
+        history_questions = [q.question for q, _ in context.last_turns()]
         input_text = self._tokenizer.tokenize(
             self.separator.join(history_questions)
         )
         if use_canonical_response == 1:
             canonical_response = " ".join(
-                doc.content for doc in context.history[-1][1]
+                doc.content for doc in context.last_responses(1)[0]
             )
             split_canonical_response = self._tokenizer.tokenize(
                 canonical_response
@@ -173,17 +173,11 @@ class T5Rewriter(Rewriter):
                 ]
             input_text += [self.separator] + split_canonical_response
         elif use_canonical_response == 3:
-            canonical_response = " ".join(
-                doc.content for doc in context.history[-1][1]
+            # Most recent response first.
+            canonical_response = "".join(
+                " ".join(doc.content for doc in documents)
+                for documents in reversed(context.last_responses(3))
             )
-            if len(context.history) > 1:
-                canonical_response += " ".join(
-                    doc.content for doc in context.history[-2][1]
-                )
-                if len(context.history) > 2:
-                    canonical_response += " ".join(
-                        doc.content for doc in context.history[-3][1]
-                    )
             input_text += [self.separator] + self._tokenizer.tokenize(
                 canonical_response
             )
@@ -259,8 +253,10 @@ def rewrite_queries_with_fine_tuned_model(
             if use_previous_rewritten_utterance and context is not None:
                 if use_canonical_response == 1:
                     context.history = [
-                        (rewrites[-(len(context.history) - idx)], history[1])
-                        for idx, history in enumerate(context.history)
+                        (rewrites[-(len(context) - idx)], documents)
+                        for idx, (_, documents) in enumerate(
+                            context.last_turns()
+                        )
                     ]
             rewrite = rewriter.rewrite_query(
                 query=query,